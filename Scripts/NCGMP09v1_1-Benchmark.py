@@ -0,0 +1,678 @@
+# NCGMP09v1_1-Benchmark.py
+#   Synthetic-data benchmarks for the modules used by
+#   NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#   Does not need arcpy, so it runs on any machine with Python 2.6 or later.
+#
+#   Takes arguments: <benchmark> [<nRows> <nRows> ...]
+#     run with no arguments to list the available benchmarks
+#
+#   Timings are wall-clock seconds, best of 3 runs.
+
+import sys, os, time, random, tempfile, multiprocessing
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from NCGMP09v1_1_Definition import tableDict
+from NCGMP09v1_1_RefIndex import ReferenceIndex, ReferenceColumns, findDuplicateIDs
+from NCGMP09v1_1_RowReader import SqliteReader
+from NCGMP09v1_1_Inventory import inventoryTable, inventoryTables, badStrings, ColumnNeeds, columnKinds
+from NCGMP09v1_1_Report import ReportSection
+
+def bestTime(func, *args):
+    best = None
+    for i in range(3):
+        startTime = time.time()
+        func(*args)
+        elapsedTime = time.time() - startTime
+        if best is None or elapsedTime < best:
+            best = elapsedTime
+    return best
+
+def writeCores():
+    # worker timings mean little without the number of cores they ran on
+    print('CPU cores: %d' % multiprocessing.cpu_count())
+
+def writeRow(cols, widths):
+    line = ''
+    for col, width in zip(cols, widths):
+        line = line + str(col).rjust(width)
+    print(line)
+
+######## refindex: referential-integrity checks in checkContent ########
+
+def syntheticReferences(nRows):
+    # ContactsAndFaults-like table with _IDs, glossary refs and source refs,
+    #   plus Glossary, DataSources and ExtendedAttributes tables that are
+    #   small relative to it, each with a few deliberate errors
+    rand = random.Random(nRows)
+    nTerms = 500
+    glossaryTerms = ['term%d' % i for i in range(nTerms)]
+    dataSourcesIDs = ['DAS%d' % i for i in range(200)]
+    all_IDs = []
+    glossaryRefs = []
+    sourceRefs = []
+    for i in range(nRows):
+        all_IDs.append(['CAF%d' % i, 'ContactsAndFaults'])
+        glossaryRefs.append(['term%d' % rand.randint(0, nTerms + 5), 'Type', 'ContactsAndFaults'])
+        sourceRefs.append(['DAS%d' % rand.randint(0, 205), 'DataSourceID', 'ContactsAndFaults'])
+    all_IDs.append(['CAF1', 'MapUnitPolys'])
+    extendedAttribIDs = []
+    for i in range(max(nRows // 10, 1)):
+        extendedAttribIDs.append('CAF%d' % rand.randint(0, nRows + 10))
+    return all_IDs, glossaryRefs, sourceRefs, glossaryTerms, dataSourcesIDs, extendedAttribIDs
+
+def listChecks(all_IDs, glossaryRefs, sourceRefs, glossaryTerms, dataSourcesIDs, extendedAttribIDs):
+    # the list-membership checks that checkContent used to do
+    all_IDs.sort()
+    dups = 0
+    for n in range(1, len(all_IDs)):
+        if all_IDs[n - 1][0] == all_IDs[n][0]:
+            dups = dups + 1
+    all_IDs0 = [str(id[0]) for id in all_IDs]
+    unreferenced = [id for id in extendedAttribIDs if id not in all_IDs0]
+    sourceRefs.sort()
+    lastID = ''
+    missingSources = []
+    for id in sourceRefs:
+        if id[0] != lastID:
+            lastID = id[0]
+            if id[0] not in dataSourcesIDs:
+                missingSources.append(id)
+    allSourceRefIDs = [ref[0] for ref in sourceRefs]
+    unusedSources = [id for id in dataSourcesIDs if id not in allSourceRefIDs]
+    glossaryRefs.sort()
+    lastTerm = ''
+    missingTerms = []
+    for term in glossaryRefs:
+        if term[0] != lastTerm:
+            lastTerm = term[0]
+            if term[0] not in glossaryTerms:
+                missingTerms.append(term)
+    refs = [str(ref[0]) for ref in glossaryRefs]
+    unusedTerms = [term for term in glossaryTerms if term not in refs]
+    return dups, unreferenced, missingSources, unusedSources, missingTerms, unusedTerms
+
+def indexChecks(all_IDs, glossaryRefs, sourceRefs, glossaryTerms, dataSourcesIDs, extendedAttribIDs):
+    # the same checks through NCGMP09v1_1_RefIndex
+    dups = len(findDuplicateIDs(all_IDs))
+    all_IDs0 = set([str(id[0]) for id in all_IDs])
+    unreferenced = [id for id in extendedAttribIDs if id not in all_IDs0]
+    sourceIndex = ReferenceIndex(sourceRefs)
+    missingSources = sourceIndex.missingFrom(set(dataSourcesIDs))
+    unusedSources = sourceIndex.unreferenced(dataSourcesIDs)
+    glossaryIndex = ReferenceIndex(glossaryRefs, (None, '', 'None'))
+    missingTerms = glossaryIndex.missingFrom(set(glossaryTerms))
+    unusedTerms = glossaryIndex.unreferenced(glossaryTerms, str)
+    return dups, unreferenced, missingSources, unusedSources, missingTerms, unusedTerms
+
+def benchRefIndex(sizes):
+    # list-based checks are skipped above 50000 rows; they take hours at 10^6
+    widths = (10, 14, 14, 10)
+    writeRow(('rows', 'lists (s)', 'index (s)', 'speedup'), widths)
+    for nRows in sizes:
+        data = syntheticReferences(nRows)
+        indexTime = bestTime(indexChecks, *data)
+        if nRows <= 50000:
+            listTime = bestTime(listChecks, *data)
+            a = listChecks(*syntheticReferences(nRows))
+            b = indexChecks(*syntheticReferences(nRows))
+            if a[0] != b[0] or len(a[1]) != len(b[1]) or len(a[4]) != len(b[4]) or len(a[5]) != len(b[5]):
+                print('  results differ at '+str(nRows)+' rows!')
+            writeRow((nRows, '%.3f' % listTime, '%.3f' % indexTime, '%.0fx' % (listTime / max(indexTime, 1e-6))), widths)
+        else:
+            writeRow((nRows, '--', '%.3f' % indexTime, '--'), widths)
+
+######## rowreader: projected batch reads vs whole-row getValue ########
+
+def syntheticSqliteTable(nRows, tableName='ContactsAndFaults', dbPath=None, defName='ContactsAndFaults'):
+    # SQLite stand-in for a feature class: OBJECTID, a SHAPE blob and the
+    #   tableDict fields of defName. Returns the database path
+    import sqlite3
+    rand = random.Random(nRows)
+    if dbPath is None:
+        handle, dbPath = tempfile.mkstemp('.sqlite')
+        os.close(handle)
+    connection = sqlite3.connect(dbPath)
+    fieldDefs = [[tableName + '_ID'] + tableDict[defName][0][1:]] + tableDict[defName][1:]
+    colDefs = ['OBJECTID INTEGER PRIMARY KEY', 'SHAPE BLOB']
+    for fDef in fieldDefs:
+        colDefs.append('"%s" %s%s' % (fDef[0], {'String': 'TEXT', 'SmallInteger': 'SMALLINT'}.get(fDef[1], 'REAL'),
+                                      {'NoNulls': ' NOT NULL'}.get(fDef[2], '')))
+    connection.execute('CREATE TABLE %s (%s)' % (tableName, ','.join(colDefs)))
+    shape = b'\x00' * 400
+    values = ['contact', 'fault', 'certain', 'approximate ', ' ']
+    rows = []
+    for i in range(nRows):
+        row = [i + 1, shape]
+        for fDef in fieldDefs:
+            if fDef[1] == 'String':
+                row.append(rand.choice(values))
+            else:
+                row.append(rand.random())
+        rows.append(row)
+    connection.executemany('INSERT INTO %s VALUES (%s)' % (tableName, ','.join(['?'] * len(colDefs))), rows)
+    connection.commit()
+    connection.close()
+    return dbPath
+
+class LegacyRow(object):
+    # stands in for an unprojected arcpy.SearchCursor row
+    def __init__(self, names, values):
+        self.values = dict(zip(names, values))
+    def getValue(self, name):
+        return self.values[name]
+
+def legacyScan(reader, table):
+    # every column (SHAPE included), getValue as often as inventoryValues called it
+    fields = reader.listFields(table)
+    names = [field.name for field in fields]
+    glossFields = [f for f in names if f in ('Type', 'ExistenceConfidence', 'IdentityConfidence')]
+    sourceFields = [f for f in names if f.find('Source') >= 0 and f.find('_ID') < 0]
+    stringFields = [f.name for f in fields if f.type == 'String' and not f.isNullable]
+    n = 0
+    for row in reader.rows(table, names):
+        row = LegacyRow(names, row)
+        row.getValue(table + '_ID')
+        for field in glossFields:
+            if row.getValue(field) != '' and row.getValue(field) != None:
+                str(row.getValue(field))
+        for field in sourceFields:
+            row.getValue(field)
+        row.getValue('OBJECTID')
+        for field in stringFields:
+            row.getValue(field)[-1:] == ' '
+        n = n + 1
+    return n
+
+def projectedScan(reader, table):
+    # only the columns the checks use, as tuples in batches
+    fields = reader.listFields(table)
+    names = [field.name for field in fields]
+    columns = ['OBJECTID', table + '_ID', 'Type', 'ExistenceConfidence', 'IdentityConfidence']
+    columns = columns + [f for f in names if f.find('Source') >= 0 and f.find('_ID') < 0]
+    columns = columns + [f.name for f in fields if f.type == 'String' and not f.isNullable and f.name not in columns]
+    n = 0
+    for batch in reader.readBatches(table, columns):
+        for row in batch:
+            for value in row:
+                value
+        n = n + len(batch)
+    return n
+
+def benchRowReader(sizes):
+    widths = (10, 18, 18, 10)
+    writeRow(('rows', 'all cols rows/s', 'projected rows/s', 'speedup'), widths)
+    for nRows in sizes:
+        dbPath = syntheticSqliteTable(nRows)
+        try:
+            reader = SqliteReader(dbPath)
+            legacyTime = bestTime(legacyScan, reader, 'ContactsAndFaults')
+            projectedTime = bestTime(projectedScan, reader, 'ContactsAndFaults')
+            reader.connection.close()
+        finally:
+            os.remove(dbPath)
+        writeRow((nRows, '%.0f' % (nRows / legacyTime), '%.0f' % (nRows / projectedTime),
+                  '%.1fx' % (legacyTime / projectedTime)), widths)
+
+######## jobs: tables scanned by a pool of worker processes ########
+
+def benchJobs(sizes):
+    # 32 feature classes of nRows rows each, scanned with 1, 4 and 16 workers
+    nTables = 32
+    workerCounts = (1, 4, 16)
+    widths = (10, 10) + (16,) * len(workerCounts)
+    writeCores()
+    writeRow(['rows/fc', 'tables'] + ['%d job(s) (s)' % n for n in workerCounts], widths)
+    for nRows in sizes:
+        handle, dbPath = tempfile.mkstemp('.sqlite')
+        os.close(handle)
+        try:
+            jobs = []
+            for i in range(nTables):
+                table = 'ContactsAndFaults%d' % i
+                syntheticSqliteTable(nRows, table, dbPath)
+                jobs.append([dbPath + '/' + table, table])
+            reader = SqliteReader(dbPath)
+            times = []
+            for nWorkers in workerCounts:
+                startTime = time.time()
+                inventoryTables(reader, jobs, nWorkers)
+                times.append('%.2f' % (time.time() - startTime))
+            reader.connection.close()
+        finally:
+            os.remove(dbPath)
+        writeRow([nRows, nTables] + times, widths)
+
+######## chunks: one large table scanned in OBJECTID ranges ########
+
+def benchChunks(sizes):
+    # one feature class of nRows rows, whole or in 8 OBJECTID ranges on 4 workers
+    widths = (10, 12, 16, 10)
+    writeCores()
+    writeRow(('rows', 'whole (s)', '8 chunks/4 (s)', 'same'), widths)
+    for nRows in sizes:
+        dbPath = syntheticSqliteTable(nRows)
+        try:
+            reader = SqliteReader(dbPath)
+            job = [[dbPath + '/ContactsAndFaults', 'ContactsAndFaults']]
+            startTime = time.time()
+            whole = inventoryTables(reader, job)[0]
+            wholeTime = time.time() - startTime
+            startTime = time.time()
+            chunked = inventoryTables(reader, job, 4, nRows // 8 + 1)[0]
+            chunkTime = time.time() - startTime
+            reader.connection.close()
+        finally:
+            os.remove(dbPath)
+        same = whole.ids == chunked.ids and whole.badNulls == chunked.badNulls and whole.glossaryRefs == chunked.glossaryRefs
+        writeRow((nRows, '%.2f' % wholeTime, '%.2f' % chunkTime, same), widths)
+
+######## incremental: re-validation with saved inventories ########
+
+def benchIncremental(sizes):
+    # 8 tables of nRows rows: first run, rerun with nothing changed, and
+    #   rerun after one row of one table was edited
+    import sqlite3
+    from NCGMP09v1_1_Cache import incrementalInventory
+    widths = (10, 12, 14, 14)
+    writeRow(('rows/table', 'cold (s)', 'unchanged (s)', '1 edit (s)'), widths)
+    for nRows in sizes:
+        handle, dbPath = tempfile.mkstemp('.sqlite')
+        os.close(handle)
+        cachePath = dbPath + '.cache'
+        try:
+            jobs = []
+            for i in range(8):
+                table = 'ContactsAndFaults%d' % i
+                syntheticSqliteTable(nRows, table, dbPath)
+                jobs.append([dbPath + '/' + table, table])
+            reader = SqliteReader(dbPath)
+            times = []
+            for step in ('cold', 'unchanged', 'edit'):
+                if step == 'edit':
+                    connection = sqlite3.connect(dbPath)
+                    connection.execute("UPDATE ContactsAndFaults3 SET Type = 'fault' WHERE OBJECTID = 2")
+                    connection.commit()
+                    connection.close()
+                    os.utime(dbPath, (time.time() + 1, time.time() + 1))
+                startTime = time.time()
+                incrementalInventory(reader, dbPath, jobs, cachePath)
+                times.append('%.2f' % (time.time() - startTime))
+            reader.connection.close()
+        finally:
+            os.remove(dbPath)
+            if os.path.exists(cachePath):
+                os.remove(cachePath)
+        writeRow([nRows] + times, widths)
+
+######## session: many databases in one ValidationSession ########
+
+def syntheticSqliteDatabase(dbPath, nRows):
+    # SQLite stand-in for a small geodatabase
+    for table, n in (('DataSources', 20), ('Glossary', 50), ('DescriptionOfMapUnits', 30),
+                     ('ContactsAndFaults', nRows), ('MapUnitPolys', nRows)):
+        syntheticSqliteTable(n, table, dbPath, table)
+    return dbPath
+
+def quiet(msg, severity=0):
+    pass
+
+def benchSession(sizes):
+    # validate 10 databases of nRows-row feature classes, one process per
+    #   database as the script is run, and all in one ValidationSession.
+    #   A new process here pays only for Python and these modules; under
+    #   ArcGIS it also pays the several seconds of import arcpy
+    import subprocess
+    from NCGMP09v1_1_Validation import ValidationSession
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    command = ('import sys; sys.path.insert(0, %r); '
+               'from NCGMP09v1_1_Validation import ValidationSession; '
+               'from NCGMP09v1_1_RowReader import SqliteReader; '
+               'ValidationSession(SqliteReader, messageFunc=lambda msg, severity=0: None).validate(sys.argv[1])') % scriptDir
+    widths = (10, 14, 14, 14)
+    writeRow(('rows', 'process (s)', 'first (s)', 'later (s)'), widths)
+    for nRows in sizes:
+        outDir = tempfile.mkdtemp()
+        try:
+            dbPaths = [syntheticSqliteDatabase(os.path.join(outDir, 'quad%d.sqlite' % i), nRows) for i in range(10)]
+            startTime = time.time()
+            for dbPath in dbPaths:
+                subprocess.call([sys.executable, '-c', command, dbPath])
+            processTime = (time.time() - startTime) / len(dbPaths)
+            session = ValidationSession(SqliteReader, messageFunc=quiet)
+            times = []
+            for dbPath in dbPaths:
+                startTime = time.time()
+                result = session.validate(dbPath)
+                times.append(time.time() - startTime)
+                if not result.completed:
+                    print('  validation of '+dbPath+' failed')
+            writeRow((nRows, '%.3f' % processTime, '%.3f' % times[0], '%.3f' % (sum(times[1:]) / (len(times) - 1))), widths)
+        finally:
+            for name in os.listdir(outDir):
+                os.remove(os.path.join(outDir, name))
+            os.rmdir(outDir)
+
+######## strings: pseudonull and leading/trailing space checks ########
+
+def syntheticStringBatches(nRows, badRate, nFields=5, batchSize=10000):
+    # batches of (OBJECTID, nFields strings); a fraction badRate of the
+    #   values have a space problem and 1 in 100 is None
+    rand = random.Random(nRows)
+    good = ['contact', 'fault', 'certain', 'approximate', 'concealed', 'Ka', 'Tv']
+    bad = [' ', 'fault ', ' certain', '  ']
+    batches = []
+    for first in range(0, nRows, batchSize):
+        batch = []
+        for oid in range(first + 1, min(first + batchSize, nRows) + 1):
+            row = [oid]
+            for i in range(nFields):
+                x = rand.random()
+                if x < 0.01:
+                    row.append(None)
+                elif x < 0.01 + badRate:
+                    row.append(rand.choice(bad))
+                else:
+                    row.append(rand.choice(good))
+            batch.append(tuple(row))
+        batches.append(batch)
+    return batches
+
+def legacyStringScan(batches, stringCols):
+    # row by row, as inventoryValues did; a None ends the row's check
+    found = []
+    for batch in batches:
+        for row in batch:
+            try:
+                badFields = []
+                for field, col in stringCols:
+                    if row[col][-1:] == ' ':
+                        badFields.append(field)
+                if badFields:
+                    found.append([row[0], badFields])
+            except TypeError:
+                pass
+    return found
+
+def rowBatchScan(batches, stringCols):
+    # a batch at a time, row by row, every value of a row checked
+    found = []
+    for batch in batches:
+        for row in batch:
+            problems = None
+            for field, col in stringCols:
+                value = row[col]
+                try:
+                    if value and (value[-1] == ' ' or value[0] == ' '):
+                        if problems is None:
+                            problems = []
+                        problems.append(field)
+                except TypeError:
+                    pass
+            if problems:
+                found.append([row[0], problems])
+    return found
+
+def numpyPositions(column):
+    values = numpy.array(column, dtype=object)
+    present = numpy.nonzero(numpy.not_equal(values, None))[0]
+    text = values[present].astype('U')
+    return present[numpy.char.endswith(text, ' ') | numpy.char.startswith(text, ' ')].tolist()
+
+def numpyStringScan(batches, stringCols):
+    # a column at a time, as badStrings, with the check made by numpy
+    found = []
+    for batch in batches:
+        problems = {}
+        for field, col in stringCols:
+            for i in numpyPositions([row[col] for row in batch]):
+                problems.setdefault(i, []).append(field)
+        rows = list(problems.keys())
+        rows.sort()
+        for i in rows:
+            found.append([batch[i][0], problems[i]])
+    return found
+
+def columnStringScan(batches, stringCols):
+    # as inventoryTable does it, a column at a time
+    found = []
+    for batch in batches:
+        for row, problems in badStrings(batch, stringCols):
+            found.append([row[0], problems])
+    return found
+
+def benchStrings(sizes):
+    # rows/s for 5 non-nullable String fields. The row-by-row check of
+    #   inventoryValues misses leading spaces and stops at the first None in
+    #   a row, so it finds fewer rows. badStrings checks a batch a column at
+    #   a time, each distinct value once; checking every value of every row
+    #   ('by row') and checking the columns with numpy are shown for comparison.
+    #   On clean data the column check is the fastest; where 1 value in 50
+    #   is bad, building the problem lists takes it below the old check
+    widths = (10, 10, 12, 12, 12, 12, 10, 10)
+    writeRow(('rows', 'bad rate', 'old rows/s', 'by row', 'columns', 'numpy', 'found old', 'found now'), widths)
+    stringCols = [('Field%d' % i, i + 1) for i in range(5)]
+    for nRows in sizes:
+        for badRate in (0.00001, 0.001, 0.02):
+            batches = syntheticStringBatches(nRows, badRate)
+            rates = []
+            for func in (legacyStringScan, rowBatchScan, columnStringScan, numpyStringScan):
+                if func is numpyStringScan and numpy is None:
+                    rates.append('--')
+                else:
+                    rates.append('%.0f' % (nRows / bestTime(func, batches, stringCols)))
+            found = columnStringScan(batches, stringCols)
+            if rowBatchScan(batches, stringCols) != [[oid, [field for field, problem in problems]] for oid, problems in found]:
+                print('  row and column results differ!')
+            writeRow([nRows, badRate] + rates + [len(legacyStringScan(batches, stringCols)), len(found)], widths)
+
+######## report: duplicate counting and section spilling ########
+
+def reportLines(nLines):
+    # pseudonull-like lines, half of them repeats
+    i = 0
+    while i < nLines:
+        yield '    Table MapUnitPolys,row OBJECTID=%d, field IdentityConfidence' % (i % (nLines // 2 + 1))
+        i = i + 1
+
+def listReport(nLines, outPath):
+    # every line kept until the end, then sorted and counted
+    errors = list(reportLines(nLines))
+    errors.sort()
+    outfl = open(outPath, 'w')
+    lastLine = None
+    n = 0
+    for line in errors + [None]:
+        if line == lastLine:
+            n = n + 1
+        else:
+            if n:
+                outfl.write(lastLine + ('--' + str(n + 1) + ' duplicates\n' if n > 1 else '\n'))
+            lastLine = line
+            n = 1
+    outfl.close()
+
+def sectionReport(nLines, outPath):
+    section = ReportSection('heading', 'no errors')
+    for line in reportLines(nLines):
+        section.add(line)
+    section.finish()
+    outfl = open(outPath, 'w')
+    section.write(outfl)
+    outfl.close()
+    section.close()
+
+def _peakMemory(func, nLines, outPath, queue):
+    import resource
+    startRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    startTime = time.time()
+    func(nLines, outPath)
+    queue.put((time.time() - startTime, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - startRss))
+
+def benchReport(sizes):
+    # seconds and growth of peak resident memory (MB) of a fresh process, for
+    #   one section; needs the resource module, so not on Windows
+    import multiprocessing
+    widths = (10, 12, 12, 14, 14)
+    writeRow(('lines', 'list (s)', 'list (MB)', 'section (s)', 'section (MB)'), widths)
+    for nLines in sizes:
+        cols = [nLines]
+        for func in (listReport, sectionReport):
+            handle, outPath = tempfile.mkstemp('.txt')
+            os.close(handle)
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_peakMemory, args=(func, nLines, outPath, queue))
+            process.start()
+            seconds, maxRss = queue.get()
+            process.join()
+            os.remove(outPath)
+            if sys.platform == 'darwin':
+                maxRss = maxRss // 1024
+            cols.extend(['%.2f' % seconds, '%.0f' % (maxRss / 1024.0)])
+        writeRow(cols, widths)
+
+######## columns: memory of the database-wide reference collections ########
+
+def syntheticTableRefs(nRows, tableRows=100000):
+    # per-table reference lists as inventoryTable collects them, one table
+    #   of up to tableRows rows at a time: _IDs, 3 glossary fields, a
+    #   DataSources field and MapUnit, each value a fresh string as str()
+    #   of a cursor value would be
+    rand = random.Random(nRows)
+    first = 0
+    while first < nRows:
+        n = min(tableRows, nRows - first)
+        table = 'Table%d' % (first // tableRows)
+        ids = ['ID%d' % i for i in range(first, first + n)]
+        glossaryRefs = {}
+        for field in ('Type', 'ExistenceConfidence', 'IdentityConfidence'):
+            glossaryRefs[field] = ['term%d' % rand.randint(0, 505) for i in range(n)]
+        sourceRefs = {'DataSourceID': ['DAS%d' % rand.randint(0, 205) for i in range(n)]}
+        mapUnits = ['MU%d' % rand.randint(0, 60) for i in range(n)]
+        yield table, ids, glossaryRefs, sourceRefs, mapUnits
+        first = first + n
+
+def referenceChecks(all_IDs, glossaryRefs, sourceRefs, mapUnitRefs):
+    findDuplicateIDs(all_IDs)
+    ReferenceIndex(glossaryRefs, (None, '', 'None')).missingFrom(set(['term%d' % i for i in range(500)]))
+    ReferenceIndex(sourceRefs).missingFrom(set(['DAS%d' % i for i in range(200)]))
+    ReferenceIndex(mapUnitRefs).missingFrom(set(['MU%d' % i for i in range(50)]))
+
+def listReferences(nRows):
+    # lists of [value, field, table], as mergeInventory used to build them
+    all_IDs = []
+    glossaryRefs = []
+    sourceRefs = []
+    mapUnitRefs = []
+    for table, ids, glossary, sources, mapUnits in syntheticTableRefs(nRows):
+        for id in ids:
+            all_IDs.append([id, table])
+        for field in glossary:
+            for value in glossary[field]:
+                glossaryRefs.append([value, field, table])
+        for field in sources:
+            for value in sources[field]:
+                sourceRefs.append([value, field, table])
+        for mu in mapUnits:
+            mapUnitRefs.append([mu, table])
+    referenceChecks(all_IDs, glossaryRefs, sourceRefs, mapUnitRefs)
+
+def columnReferences(nRows, maxBytes=None):
+    all_IDs = ReferenceColumns(maxBytes)
+    glossaryRefs = ReferenceColumns(maxBytes)
+    sourceRefs = ReferenceColumns(maxBytes)
+    mapUnitRefs = ReferenceColumns(maxBytes)
+    for table, ids, glossary, sources, mapUnits in syntheticTableRefs(nRows):
+        all_IDs.extend(ids, table)
+        for field in glossary:
+            glossaryRefs.extend(glossary[field], field, table)
+        for field in sources:
+            sourceRefs.extend(sources[field], field, table)
+        mapUnitRefs.extend(mapUnits, table)
+    referenceChecks(all_IDs, glossaryRefs, sourceRefs, mapUnitRefs)
+    for refs in (all_IDs, glossaryRefs, sourceRefs, mapUnitRefs):
+        refs.close()
+
+def spilledReferences(nRows):
+    # as columnReferences, spilling each collection to disk beyond 16 MB
+    columnReferences(nRows, 16 * 1024 * 1024)
+
+def _peakReferenceMemory(func, nRows, queue):
+    import resource
+    startRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    startTime = time.time()
+    func(nRows)
+    queue.put((time.time() - startTime, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - startRss))
+
+def benchColumns(sizes):
+    # seconds and growth of peak resident memory (MB) of a fresh process that
+    #   collects the references of nRows rows and checks them: as lists, as
+    #   ReferenceColumns, and as ReferenceColumns that spill to disk; needs
+    #   the resource module, so not on Windows
+    import multiprocessing
+    widths = (10, 12, 12, 14, 14, 14, 14)
+    writeRow(('rows', 'lists (s)', 'lists (MB)', 'columns (s)', 'columns (MB)', 'spilled (s)', 'spilled (MB)'), widths)
+    for nRows in sizes:
+        cols = [nRows]
+        for func in (listReferences, columnReferences, spilledReferences):
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_peakReferenceMemory, args=(func, nRows, queue))
+            process.start()
+            seconds, maxRss = queue.get()
+            process.join()
+            if sys.platform == 'darwin':
+                maxRss = maxRss // 1024
+            cols.extend(['%.2f' % seconds, '%.0f' % (maxRss / 1024.0)])
+        writeRow(cols, widths)
+
+######## domains: numeric value domains checked while inventorying ########
+
+def benchDomains(sizes):
+    # one OrientationDataPoints table of nRows rows inventoried with and
+    #   without the domain checks (Azimuth, Inclination, PlotAtScale,
+    #   LocationConfidenceMeters, OrientationConfidenceDegrees)
+    widths = (10, 14, 14, 10, 10)
+    writeRow(('rows', 'without (s)', 'with (s)', 'cost', 'outside'), widths)
+    without = ColumnNeeds([kind for kind in columnKinds if kind != 'domains'])
+    withDomains = ColumnNeeds()
+    for nRows in sizes:
+        dbPath = syntheticSqliteTable(nRows, 'OrientationDataPoints', defName='OrientationDataPoints')
+        try:
+            reader = SqliteReader(dbPath)
+            path = dbPath + '/OrientationDataPoints'
+            withoutTime = bestTime(inventoryTable, reader, path, 'OrientationDataPoints', None, False, None, without)
+            withTime = bestTime(inventoryTable, reader, path, 'OrientationDataPoints', None, False, None, withDomains)
+            nOutside = len(inventoryTable(reader, path, 'OrientationDataPoints', needs=withDomains).domainErrors)
+            reader.connection.close()
+        finally:
+            os.remove(dbPath)
+        writeRow((nRows, '%.2f' % withoutTime, '%.2f' % withTime,
+                  '%.0f%%' % (100 * (withTime - withoutTime) / withoutTime), nOutside), widths)
+
+#########################################
+
+benchmarks = {
+    'refindex': (benchRefIndex, [1000, 5000, 20000, 50000, 200000, 1000000]),
+    'rowreader': (benchRowReader, [10000, 100000, 1000000]),
+    'jobs': (benchJobs, [10000, 100000]),
+    'chunks': (benchChunks, [100000, 1000000]),
+    'incremental': (benchIncremental, [10000, 100000]),
+    'session': (benchSession, [100, 10000]),
+    'strings': (benchStrings, [100000, 1000000]),
+    'report': (benchReport, [100000, 1000000, 5000000]),
+    'columns': (benchColumns, [100000, 1000000, 3000000]),
+    'domains': (benchDomains, [100000, 1000000]),
+    }
+
+if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+    print('Usage: NCGMP09v1_1-Benchmark.py <benchmark> [<nRows> ...]')
+    names = list(benchmarks.keys())
+    names.sort()
+    print('  benchmarks: '+', '.join(names))
+else:
+    benchFunc, sizes = benchmarks[sys.argv[1]]
+    if len(sys.argv) > 2:
+        sizes = [int(arg) for arg in sys.argv[2:]]
+    benchFunc(sizes)
@@ -0,0 +1,47 @@
+# NCGMP09v1_1-CreateBatch.py
+#   Python script to create many empty NCGMP09 databases, as
+#   NCGMP09v1_1-CreateDatabase-Arc10.0.py does for one, in a pool of
+#   worker processes, for example one per quadrangle of a project.
+#   Needs ArcGIS 10 or higher for .gdb and .mdb databases.
+#
+#   Takes two arguments: <outputDir> <manifest>
+#     <manifest> is a text file naming one database per line, with
+#     tab-separated <geodatabaseName> <coordSystem> <OptionalElements>
+#     <#XSections>; all but the name may be left off.
+#     Writes <geodatabaseName>-create.json beside each database, and a
+#     summary index, creation-summary.txt, with one tab-separated line per
+#     database: status, template, seconds to build the template and to
+#     copy it, and the error, if there was one.
+#   Databases of the same configuration are copies of one template, built
+#     once (see NCGMP09v1_1_CreateBatch.py).
+#   Option --workers N uses N worker processes (default 2).
+#   Option --template-cache DIR keeps templates in DIR (default
+#     $NCGMP09_TEMPLATE_CACHE or ~/.ncgmp09/templates).
+#   Exits with status 1 if any database was not created.
+
+import sys, optparse
+from NCGMP09v1_1_CreateBatch import BatchCreator, readManifest, addMsgAndPrint
+
+# guarded so that worker processes can import this script
+if __name__ == '__main__':
+    parser = optparse.OptionParser('%prog <outputDir> <manifest> [--workers N] [--template-cache DIR]')
+    parser.add_option('--workers',type='int',default=2,
+                      help='number of worker processes (default 2)')
+    parser.add_option('--template-cache',default=None,
+                      help='directory of cached templates')
+    (options,args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error('expected <outputDir> <manifest>')
+    outputDir = args[0]
+    try:
+        jobs = readManifest(args[1])
+    except (IOError, ValueError), e:
+        parser.error(str(e))
+    addMsgAndPrint('  Starting, '+str(len(jobs))+' databases...')
+    batch = BatchCreator(outputDir,options.workers,options.template_cache)
+    jobs = batch.run(jobs)
+    nOk = len([job for job in jobs if job.status == 'ok'])
+    addMsgAndPrint('  '+str(nOk)+' of '+str(len(jobs))+' databases created, see '+batch.summaryFile)
+    addMsgAndPrint('  DONE')
+    if nOk < len(jobs):
+        sys.exit(1)
@@ -9,6 +9,9 @@
 #     # accepted for <coordSystem>
 #     if geoDatabaseName ends in .gdb, a file geodatabase will be created
 #     if geoDatabaseName ends in .mdb, a personal geodatabase will be created
+#     if geoDatabaseName ends in .gpkg, a GeoPackage will be created, without
+#       arcpy (see NCGMP09v1_1_GeoPackage.py); coordSystem may then also be
+#       EPSG:<code>
 #	coordSystem is a filename for an ESRI coordinate system definition (look 
 #	in directory arcgis/Coordinate Systems). Use # to define coordinate system
 #     later
@@ -18,6 +21,36 @@
 #
 #   On my laptop, this takes many minutes to run and creates a 
 #      ~0.5GB file/directory
+#   ...the first time. The geodatabase is built as a template in a cache
+#     (see NCGMP09v1_1_Template.py) and copied; later runs with the same
+#     schema, optional elements, coordinate system and number of cross
+#     sections only copy the template, which takes seconds.
+#   Options, given before or after the arguments:
+#     --template-cache DIR   keep templates in DIR (default
+#                            $NCGMP09_TEMPLATE_CACHE or ~/.ncgmp09/templates)
+#     --no-template          build the geodatabase itself, without the cache
+#     --clear-templates      remove the cached templates, and do nothing else
+#                            if no arguments are given
+#     --benchmark            also time creation without the cache, with an
+#                            empty cache (cold) and with the template cached
+#                            (warm), in scratch geodatabases that are then
+#                            deleted
+#     --resume               finish a database an earlier run left part
+#                            done: operations in <geodatabaseName>-journal.txt
+#                            (kept beside the database until it is complete)
+#                            and ones that exist are not done again; implies
+#                            --no-template
+#     --dry-run              only list the operations that would create the
+#                            database, in batches, with their estimated seconds
+#   The database is created as a plan of operations (NCGMP09v1_1_Plan.py):
+#     fields are added in the largest batches the backend can take, an
+#     operation that fails on a lock is tried again, and any other failure
+#     stops the run. What was done is written to <geodatabaseName>-create.json
+#     beside the database: "complete" is true only if every operation was
+#     done; if it is not, the script exits with status 1. If the database
+#     exists already, and --resume is not given, nothing is done and the
+#     script exits with status 1, leaving the database and its
+#     -create.json as they were.
 #
 # To use this:
 #   	1) run script, e.g.
@@ -34,26 +67,29 @@
 #	6) Load data. Edit as needed
 #
 #  NOTE: CAN ALSO BE RUN AS TOOLBOX SCRIPT FROM ARCCATALOG
+#
+#  main() tells a Progress (NCGMP09v1_1_Progress.py) of each operation it
+#  carries out; run as a script, the operations done, operations per second
+#  and the time left are reported as messages every few seconds.
 
-import arcpy, sys, os
+import sys, os, time, shutil, optparse
+try:
+    import arcpy
+except ImportError:
+    # only GeoPackages can be created
+    arcpy = None
 from NCGMP09v1_1_Definition import tableDict
+from NCGMP09v1_1_Progress import Progress, messageListener
+from NCGMP09v1_1_Template import TemplateCache, templateKey
+from NCGMP09v1_1_Plan import ArcpyBackend, Journal, PlanResult, PlanRunner, planDatabase, describePlan, writeReadme, creatorVersion
+from NCGMP09v1_1_GeoPackage import GeoPackageBackend
 
-versionString = 'NCGMP09v1.1-CreateDatabase-Arc10.0.py, version of 23 February 2012'
+versionString = creatorVersion
 
 default = '#'
 
 #cartoReps = False # False if cartographic representations will not be used
 
-transDict =     { 'String': 'TEXT',
-			'Single': 'FLOAT',
-			'Double': 'DOUBLE',
-			'NoNulls':'NON_NULLABLE',
-			'NullsOK':'NULLABLE',
-			'Date'  : 'DATE',
-			'Integer' : 'LONG',
-			'SmallInteger' : 'SHORT',
-			'Blob' : 'BLOB'}
-
 usage = """Usage:
    systemprompt> ncgmp09_create.py <directory> <geodatabaseName> <coordSystem>
                 <OptionalElements> <#XSections>
@@ -62,12 +98,16 @@ usage = """Usage:
    <geodatabaseName> is name of gdb to be created, with extension
       .gdb causes a file geodatabase to be created
       .mdb causes a personal geodatabase to be created
+      .gpkg causes a GeoPackage to be created (arcpy not needed)
    <coordSystem> is a fully-specified ArcGIS coordinate system
    <OptionalElements> is either # or a semicolon-delimited string specifying
       which non-required elements should be created (e.g.,
       OrientationPoints;CartographicLines;RepurposedSymbols )
    <#XSections> is an integer (0, 1, 2, ...) specifying the intended number of
       cross-sections
+   Options: --template-cache DIR, --no-template, --clear-templates, --benchmark,
+      --dry-run, --resume
+      (see the head of this script)
 
   Then, in ArcCatalog:
   * If you use the CorrelationOfMapUnits feature data set, note that you will 
@@ -87,6 +127,9 @@ usage = """Usage:
 def addMsgAndPrint(msg, severity=0): 
     # prints msg to screen and adds msg to the geoprocessor (in case this is run as a tool) 
     #print msg 
+    if arcpy is None:
+        print(msg)
+        return
     try: 
         for string in msg.split('\n'): 
             # Add appropriate geoprocessing message 
@@ -99,203 +142,197 @@ def addMsgAndPrint(msg, severity=0):
     except: 
         pass 
 
-def createFeatureClass(thisDB,featureDataSet,featureClass,shapeType,fieldDefs):
-    addMsgAndPrint('    Creating feature class '+featureClass+'...')
-    try:
-        arcpy.env.workspace = thisDB        
-	if featureDataSet == '':
-            arcpy.CreateFeatureclass_management(thisDB,featureClass,shapeType)
-            thisFC = thisDB + '/' + featureClass
-	else:
-            arcpy.CreateFeatureclass_management(featureDataSet,featureClass,shapeType)
-            thisFC = thisDB+'/'+featureDataSet+'/'+featureClass
-            
-        for fDef in fieldDefs:
-            try:
-                if fDef[1] == 'String':
-                    arcpy.AddField_management(thisFC,fDef[0],transDict[fDef[1]],'#','#',fDef[3],'#',transDict[fDef[2]])
-                else:
-                    arcpy.AddField_management(thisFC,fDef[0],transDict[fDef[1]],'#','#','#','#',transDict[fDef[2]])
-            except:
-                addMsgAndPrint('Failed to add field '+fDef[0]+' to feature class '+featureClass)
-                addMsgAndPrint(arcpy.GetMessages(2))
-    except:
-        addMsgAndPrint(arcpy.GetMessages())
-        addMsgAndPrint('Failed to create feature class '+ featureClass +' in dataset '+featureDataSet)
-        
-        
-def main(thisDB,coordSystem,nCrossSections):
-	# create feature dataset GeologicMap #
-	addMsgAndPrint('  Creating feature dataset GeologicMap...')
-	try:
-		arcpy.CreateFeatureDataset_management(thisDB,'GeologicMap')
-	except:
-		addMsgAndPrint(arcpy.GetMessages(2))
-	if coordSystem <> '#':
-		try:
-		    arcpy.DefineProjection_management(thisDB+'/GeologicMap',coordSystem)
-		except:
-		    addMsgAndPrint(arcpy.GetMessages(2)) 
-	
-	# create feature classes in GeologicMap
-	# poly feature classes
-	featureClasses = ['MapUnitPolys']
-	for fc in ['OverlayPolys']:
-            if fc in OptionalElements:
-                featureClasses.append(fc)
-	for featureClass in featureClasses:
-            fieldDefs = tableDict[featureClass]
-            createFeatureClass(thisDB,'GeologicMap',featureClass,'POLYGON',fieldDefs)
-                
-	# line feature classes
-	featureClasses = ['ContactsAndFaults']
-	for fc in ['OtherLines']:
-            if fc in OptionalElements:
-                featureClasses.append(fc)
-	for featureClass in featureClasses:
-            fieldDefs = tableDict[featureClass]
-            createFeatureClass(thisDB,'GeologicMap',featureClass,'POLYLINE',fieldDefs)
-            
-        # create topology
-        addMsgAndPrint('  Creating topology GeologicMapTopology...')
-        arcpy.CreateTopology_management('GeologicMap','GeologicMapTopology')
+def makeBackend(outputDir,thisDB,coordSystem):
+    if thisDB[-5:].lower() == '.gpkg':
+        return GeoPackageBackend(outputDir+'/'+thisDB,coordSystem)
+    return ArcpyBackend(outputDir,thisDB,coordSystem,arcpy)
 
+def main(outputDir,thisDB,coordSystem,nCrossSections,progress=None,resume=False):
+    # create database thisDB in outputDir and everything in it, as planned
+    #   by planDatabase, or if resume finish what an earlier run started;
+    #   returns the PlanResult
+    plan = planDatabase(thisDB,OptionalElements,coordSystem)
+    runner = PlanRunner(makeBackend(outputDir,thisDB,coordSystem),progress,addMsgAndPrint)
+    journal = Journal(outputDir+'/'+thisDB+'-journal.txt')
+    return runner.run(plan,outputDir+'/'+thisDB,journal,resume)
 
-	# create feature dataset StationData #
-	hasStationData = False
-        for fc in ['OrientationDataPoints','StationPoints','SamplePoints']:
-            if fc in OptionalElements:
-                hasStationData = True
-                break
-        addMsgAndPrint('  continue...')
-	if hasStationData:
-            addMsgAndPrint('  Creating feature dataset StationData...')
-            try:
-                    arcpy.CreateFeatureDataset_management(thisDB,'StationData')
-            except:
-                    addMsgAndPrint(arcpy.GetMessages(2))
-            if coordSystem <> '#':
-                    try:
-                        arcpy.DefineProjection_management(thisDB+'/StationData',coordSystem)
-                    except:
-                        addMsgAndPrint(arcpy.GetMessages(2))
-                        
-            # create feature classes in StationData  
-            # point feature classes
-            featureClasses = []
-            for fc in ['OrientationDataPoints','StationPoints','SamplePoints']:
-                if fc in OptionalElements:
-                    featureClasses.append(fc)
-            for featureClass in featureClasses:	
-                fieldDefs = tableDict[featureClass]
-                createFeatureClass(thisDB,'StationData',featureClass,'POINT',fieldDefs)
-            
+def buildDatabase(outputDir,thisDB,coordSystem,nCrossSections,progress=None,resume=False):
+    if resume:
+        addMsgAndPrint('  Resuming creation of '+thisDB+'...')
+    else:
+        addMsgAndPrint('  Creating '+thisDB+'...')
+    result = main(outputDir,thisDB,coordSystem,nCrossSections,progress,resume)
+    addMsgAndPrint('  '+str(result))
+    return result
 
-	# create feature classes outside of GeologicMap and StationData
-	# polygon feature classes
-        fieldDefs = tableDict['DataSourcePolys']
-        createFeatureClass(thisDB,'', 'DataSourcePolys','POLYGON',fieldDefs)
-	
-        # polyline feature classes
-        if 'CartographicLines' in OptionalElements:
-            fieldDefs = tableDict['CartographicLines']
-            createFeatureClass(thisDB,'','CartographicLines','POLYLINE',fieldDefs)	
-	
-	# create tables #
-	tables = ['DescriptionOfMapUnits','DataSources','Glossary','SysInfo']
-	for tb in ['StandardLithology','ExtendedAttributes','GeologicEvents']:
-            if tb in OptionalElements:
-                tables.append(tb)
-	for table in tables:
-            addMsgAndPrint('  Creating table '+table+'...')
+def createFromTemplate(outputDir,thisDB,coordSystem,nCrossSections,cache,progress=None):
+    # create geodatabase thisDB in outputDir as a copy of the cached template
+    #   for these inputs, building the template first if there is none;
+    #   returns the PlanResult of the build, or of no operations if the
+    #   template was cached
+    extension = thisDB[-4:].lower()
+    key = templateKey(tableDict,OptionalElements,coordSystem,nCrossSections,extension,versionString)
+    template = cache.get(key,extension)
+    if template is None:
+        addMsgAndPrint('  Building template geodatabase '+key+'...')
+        results = []
+        def build(templateDir,templateName):
+            results.append(buildDatabase(templateDir,templateName,coordSystem,nCrossSections,progress))
+            # let go of the template, so it can be renamed into the cache
+            arcpy.env.workspace = ''
             try:
-                arcpy.CreateTable_management(thisDB,table)
-                fieldDefs = tableDict[table]
-                for fDef in fieldDefs:
-                    try:
-                        if fDef[1] == 'String':
-                            arcpy.AddField_management(thisDB+'/'+table,fDef[0],transDict[fDef[1]],'#','#',fDef[3],'#',transDict[fDef[2]])
-                        else:
-                            arcpy.AddField_management(thisDB+'/'+table,fDef[0],transDict[fDef[1]],'#','#','#','#',transDict[fDef[2]])
-                    except:
-                        addMsgAndPrint('Failed to add field '+fDef[0]+' to table '+table)
-                        addMsgAndPrint(arcpy.GetMessages(2))		    
+                arcpy.ClearWorkspaceCache_management()
             except:
-                addMsgAndPrint(arcpy.GetMessages())
+                pass
+            return results[0].complete()
+        template = cache.build(key,extension,build)
+        if template is None:
+            addMsgAndPrint('Failed to build template geodatabase '+key)
+            return results[0]
+        result = results[0]
+    else:
+        addMsgAndPrint('  Using template geodatabase '+key)
+        result = PlanResult(outputDir+'/'+thisDB,'template',[])
+    result.database = outputDir+'/'+thisDB
+    result.template = key
+    addMsgAndPrint('  Copying template to '+thisDB+'...')
+    try:
+        cache.clone(template,outputDir,thisDB)
+    except (IOError, OSError), e:
+        addMsgAndPrint('Failed to copy template to '+outputDir+'/'+thisDB+': '+str(e))
+        result.failed = ['copy template',str(e)]
+        return result
+    arcpy.RefreshCatalog(outputDir+'/'+thisDB)
+    return result
 
-        # create relationships
-        # create relationship StationSampleLink
-        if arcpy.Exists('StationData/StationPoints') and arcpy.Exists('StationData/SamplePoints'):
-            addMsgAndPrint('  Creating relationship StationSampleLink...')
-            arcpy.CreateRelationshipClass_management('StationData/StationPoints', 'StationData/SamplePoints', 'StationData/StationSampleLink', "SIMPLE", "Sample",
-                "Station", "NONE", "ONE_TO_MANY", "NONE", "StationPoints_ID", "StationID")
-                       
+def dryRun(outputDir,thisDB,coordSystem,nCrossSections,cache,useTemplate):
+    # report what would be done, and how long it would take
+    if useTemplate:
+        extension = thisDB[-4:].lower()
+        key = templateKey(tableDict,OptionalElements,coordSystem,nCrossSections,extension,versionString)
+        if cache.get(key,extension) is not None:
+            addMsgAndPrint('  Would copy template geodatabase '+key+' to '+thisDB)
+            return
+        addMsgAndPrint('  Would build template geodatabase '+key+' and copy it to '+thisDB+':')
+    else:
+        addMsgAndPrint('  Would create '+thisDB+':')
+    plan = planDatabase(thisDB,OptionalElements,coordSystem)
+    for line in describePlan(plan,makeBackend(outputDir,thisDB,coordSystem)):
+        addMsgAndPrint(line)
 
-def createDatabase(outputDir,thisDB):
-    addMsgAndPrint('  Creating geodatabase '+thisDB+'...')		
-    try:
-        if thisDB[-4:] == '.mdb':
-            arcpy.CreatePersonalGDB_management(outputDir,thisDB)
-        if thisDB[-4:] == '.gdb':
-            arcpy.CreateFileGDB_management(outputDir,thisDB)
-        return True
-    except:
-        addMsgAndPrint('Failed to create geodatabase '+outputDir+'/'+thisDB)
-        addMsgAndPrint(arcpy.GetMessages(2))
-        return False
+def benchmark(outputDir,thisDB,coordSystem,nCrossSections,cache):
+    # seconds to create a geodatabase like thisDB without the template cache,
+    #   with no template cached (cold) and with the template cached (warm)
+    extension = thisDB[-4:].lower()
+    key = templateKey(tableDict,OptionalElements,coordSystem,nCrossSections,extension,versionString)
+    cache.clear(key)
+    times = []
+    for run in ['uncached','cold','warm']:
+        scratchDB = thisDB[:-4]+'-'+run+extension
+        startTime = time.time()
+        if run == 'uncached':
+            buildDatabase(outputDir,scratchDB,coordSystem,nCrossSections)
+        else:
+            createFromTemplate(outputDir,scratchDB,coordSystem,nCrossSections,cache)
+        times.append([run,time.time()-startTime])
+        scratchPath = outputDir+'/'+scratchDB
+        if os.path.isdir(scratchPath):
+            shutil.rmtree(scratchPath,True)
+        elif os.path.exists(scratchPath):
+            os.remove(scratchPath)
+    addMsgAndPrint('  Seconds to create '+thisDB+':')
+    for run, seconds in times:
+        addMsgAndPrint('    %-10s %8.1f' % (run, seconds))
 
 #########################################
     
 addMsgAndPrint(versionString)
 
-if len(sys.argv) >= 6:
+parser = optparse.OptionParser(add_help_option=False)
+parser.add_option('--template-cache',default=None)
+parser.add_option('--no-template',action='store_true',default=False)
+parser.add_option('--clear-templates',action='store_true',default=False)
+parser.add_option('--benchmark',action='store_true',default=False)
+parser.add_option('--dry-run',action='store_true',default=False)
+parser.add_option('--resume',action='store_true',default=False)
+(options, args) = parser.parse_args()
+cache = TemplateCache(options.template_cache)
+if options.clear_templates:
+    addMsgAndPrint('  Removed '+str(cache.clear())+' templates from '+cache.cacheDir)
+
+result = None
+if len(args) >= 5:
     addMsgAndPrint('Starting script')
 
     try:
-        outputDir = sys.argv[1]
+        outputDir = args[0]
         if outputDir == '#':
             outputDir = os.getcwd()
         outputDir = outputDir.replace('\\','/')
 
-        thisDB = sys.argv[2]
+        thisDB = args[1]
         # test for extension; if not given, default to file geodatabase
-        if not thisDB[-4:].lower() in ('.gdb','.mdb'):
+        if not os.path.splitext(thisDB)[1].lower() in ('.gdb','.mdb','.gpkg'):
             thisDB = thisDB+'.gdb'
 
-        coordSystem = sys.argv[3]
+        coordSystem = args[2]
 
-        if sys.argv[4] == '#':
+        if args[3] == '#':
             OptionalElements = []
         else:
-            OptionalElements = sys.argv[4].split(';')
+            OptionalElements = args[3].split(';')
         
-        nCrossSections = int(sys.argv[5])
+        nCrossSections = int(args[4])
 
         try:
-            if sys.argv[6] == 'true':
+            if args[5] == 'true':
                 cartoReps = True
             else:
                 cartoReps = False
         except:
             cartoReps = False
             
-        # create personal gdb in output directory and run main routine
-        if createDatabase(outputDir,thisDB):
-            thisDB = outputDir+'/'+thisDB
-            arcpy.RefreshCatalog(thisDB)
-            main(thisDB,coordSystem,nCrossSections)
+        progress = Progress([messageListener(addMsgAndPrint,('rows','done'))],5.0)
+        isGeoPackage = thisDB[-5:].lower() == '.gpkg'
+        if options.dry_run:
+            dryRun(outputDir,thisDB,coordSystem,nCrossSections,cache,not (isGeoPackage or options.no_template))
+        elif os.path.exists(outputDir+'/'+thisDB) and not options.resume:
+            # the run would fail before doing anything, and the -create.json
+            #   beside the database is about the database that is there
+            addMsgAndPrint(outputDir+'/'+thisDB+' already exists; use --resume to finish it')
+        elif isGeoPackage:
+            # well under a second, so no template
+            result = buildDatabase(outputDir,thisDB,coordSystem,nCrossSections,progress,options.resume)
+        elif arcpy is None:
+            addMsgAndPrint('arcpy is not available; only a GeoPackage (.gpkg) can be created')
+        else:
+            if options.benchmark:
+                benchmark(outputDir,thisDB,coordSystem,nCrossSections,cache)
+            # create personal gdb in output directory and run main routine,
+            #   or copy the cached template; a resumed run finishes the
+            #   geodatabase itself
+            if options.no_template or options.resume:
+                result = buildDatabase(outputDir,thisDB,coordSystem,nCrossSections,progress,options.resume)
+            else:
+                result = createFromTemplate(outputDir,thisDB,coordSystem,nCrossSections,cache,progress)
+        thisDB = outputDir+'/'+thisDB
+
+        if result is not None:
+            # what was done, for whatever runs this script
+            result.write(thisDB+'-create.json')
     
         # try to write a readme within the .gdb
-        if thisDB[-4:] == '.gdb':
+        if thisDB[-4:] == '.gdb' and result is not None and result.complete():
             try:
                 arcpy.env.workspace = ''
-                versionFile = open(thisDB+'/00readme.txt','w')
-                versionFile.write('Geodatabase created by '+versionString+'\n')
-                versionFile.close()
+                writeReadme(thisDB)
             except:
                 addMsgAndPrint('Failed to write '+thisDB+'/00readme.txt')
 
     except:
 	addMsgAndPrint('Failed.')
-else:
+elif not options.clear_templates:
     addMsgAndPrint(usage)
+
+if len(args) >= 5 and not options.dry_run and (result is None or not result.complete()):
+    sys.exit(1)
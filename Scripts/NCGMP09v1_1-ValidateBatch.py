@@ -0,0 +1,61 @@
+# NCGMP09v1_1-ValidateBatch.py
+#   Python script to check many geodatabases for conformance with the
+#   NCGMP09 geodatabase schema, as NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#   does for one, in a pool of worker processes.
+#   Assumes ArcGIS 10 or higher.
+#
+#   Takes two arguments: <source> <outputWorkspace>
+#     <source> is a directory of geodatabases (*.gdb, *.mdb) or a manifest,
+#     a text file naming one geodatabase per line.
+#     Writes <geodatabaseName>-conformance.txt for each geodatabase as soon
+#     as it has been checked, and a summary index, validation-summary.txt,
+#     with one tab-separated line per geodatabase: status, attempts,
+#     seconds, numbers of schema and content errors, report file, and
+#     the error that stopped the validation, if one did.
+#   Option --workers N validates N geodatabases at a time (default 2).
+#   Option --timeout S stops any geodatabase that takes more than S seconds.
+#   Option --retries R retries each failed geodatabase R times (default 1),
+#     alone, in a new worker process.
+#   Options --incremental, --findings, --timing and --rules are passed on to each validation,
+#     see NCGMP09v1_1-ValidateDatabase-Arc10.0.py. Each findings file names
+#     its geodatabase, so the .jsonl files of a batch can be concatenated.
+#   See NCGMP09v1_1_Batch.py for how workers are run.
+
+import optparse
+from NCGMP09v1_1_Batch import BatchValidator, listDatabases
+from NCGMP09v1_1_Validation import addMsgAndPrint
+from NCGMP09v1_1_Rules import parseRules, ruleNames
+
+# guarded so that worker processes can import this script
+if __name__ == '__main__':
+    parser = optparse.OptionParser('%prog <source> <outputWorkspace> [--workers N] [--timeout S] [--retries R] [--incremental] [--findings jsonl|sqlite] [--timing] [--rules R1,R2,...]')
+    parser.add_option('--workers',type='int',default=2,
+                      help='number of geodatabases validated at a time (default 2)')
+    parser.add_option('--timeout',type='float',default=None,
+                      help='seconds after which a validation is stopped (default no limit)')
+    parser.add_option('--retries',type='int',default=1,
+                      help='isolated retries of a failed validation (default 1)')
+    parser.add_option('--incremental',action='store_true',default=False,
+                      help='reuse saved inventories of tables unchanged since the last --incremental run')
+    parser.add_option('--findings',type='choice',choices=['jsonl','sqlite'],default=None,
+                      help='also write findings of each geodatabase to <name>-findings.jsonl or .sqlite')
+    parser.add_option('--timing',action='store_true',default=False,
+                      help='write timings of each geodatabase to <name>-timing.json')
+    parser.add_option('--rules',default='',
+                      help='comma-separated rules to check, of '+', '.join(ruleNames)+' (default all)')
+    (options,args) = parser.parse_args()
+    try:
+        rules = parseRules(options.rules)
+    except ValueError, e:
+        parser.error(str(e))
+    source = args[0]
+    outputWorkspace = args[1]
+    databases = listDatabases(source)
+    addMsgAndPrint('  Starting, '+str(len(databases))+' geodatabases...')
+    batch = BatchValidator(outputWorkspace,options.workers,options.timeout,options.retries,
+                           {'incremental':options.incremental,'findings':options.findings,
+                            'timing':options.timing,'rules':rules})
+    jobs = batch.run(databases)
+    nOk = len([job for job in jobs if job.status == 'ok'])
+    addMsgAndPrint('  '+str(nOk)+' of '+str(len(jobs))+' geodatabases validated, see '+batch.summaryFile)
+    addMsgAndPrint('  DONE')
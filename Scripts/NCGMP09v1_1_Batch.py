@@ -0,0 +1,234 @@
+# NCGMP09v1_1_Batch.py
+#   Validation of many geodatabases in a pool of warm worker processes,
+#   for NCGMP09v1_1-ValidateBatch.py
+#
+#   Each worker process imports arcpy and the schema once, builds one
+#   ValidationSession (see NCGMP09v1_1_Validation.py) and then validates
+#   geodatabases one at a time as the supervisor hands them out. Each
+#   worker writes the conformance report of a database as soon as it is
+#   done, and the supervisor adds a line for it to the summary index,
+#   <outputWorkspace>/validation-summary.txt, so both can be read while
+#   the batch is still running.
+#
+#   A job fails if validate() raises an exception, if its worker process
+#   dies (as arcpy may on a corrupt geodatabase), or if it runs longer
+#   than the timeout, in which case its worker is killed. A dead or
+#   killed worker is replaced by a fresh one, so the rest of the batch
+#   carries on. Once the pool has worked through the batch, each failed
+#   job is retried alone, in a new worker process of its own.
+
+import os, time, traceback, multiprocessing
+from Queue import Empty
+
+from NCGMP09v1_1_Validation import ValidationSession, addMsgAndPrint
+from NCGMP09v1_1_Inventory import setWorkerExecutable
+
+summaryName = 'validation-summary.txt'
+summaryFields = ('database','status','attempts','seconds','schema errors','content errors','report','error')
+
+def listDatabases(source):
+    # the geodatabases in directory source, or those named one per line in
+    #   manifest file source. Manifest paths may be relative to the manifest;
+    #   blank lines and lines starting with # are skipped
+    if os.path.isdir(source) and not source.rstrip('/\\')[-4:].lower() in ('.gdb','.mdb'):
+        names = os.listdir(source)
+        names.sort()
+        return [os.path.join(source, name) for name in names if name[-4:].lower() in ('.gdb','.mdb')]
+    databases = []
+    manifest = open(source)
+    try:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                databases.append(os.path.join(os.path.dirname(os.path.abspath(source)), line))
+    finally:
+        manifest.close()
+    return databases
+
+class BatchJob(object):
+    # one database of the batch
+
+    def __init__(self, database):
+        self.database = database
+        self.status = 'waiting'   # then ok, incomplete, failed, crashed or timed out
+        self.attempts = 0
+        self.seconds = 0.0
+        self.result = None        # ValidationResult of the last attempt, if it returned
+        self.error = ''           # traceback or reason for the last failure
+
+    def failed(self):
+        return self.status in ('failed', 'crashed', 'timed out')
+
+def _workerLoop(taskQueue, resultQueue, sessionOptions):
+    # runs in a worker process: one warm session for all of its jobs
+    session = ValidationSession(**sessionOptions)
+    if session.openReader is None:
+        # import arcpy now, not in the first job
+        session.getReader(None)
+    while True:
+        task = taskQueue.get()
+        if task is None:
+            break
+        index, database, outputWorkspace = task
+        try:
+            resultQueue.put([index, session.validate(database, outputWorkspace), None])
+        except:
+            resultQueue.put([index, None, traceback.format_exc()])
+
+class _Worker(object):
+    # a worker process and the job it is working on
+
+    def __init__(self, resultQueue, sessionOptions):
+        self.taskQueue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_workerLoop, args=(self.taskQueue, resultQueue, sessionOptions))
+        self.process.start()
+        self.index = None
+        self.startTime = None
+
+    def start(self, index, database, outputWorkspace):
+        self.index = index
+        self.startTime = time.time()
+        self.taskQueue.put([index, database, outputWorkspace])
+
+    def stop(self):
+        if self.process.is_alive():
+            self.taskQueue.put(None)
+        self.process.join()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+class BatchValidator(object):
+
+    def __init__(self, outputWorkspace, nWorkers=2, timeout=None, retries=1, sessionOptions=None, messageFunc=addMsgAndPrint):
+        self.outputWorkspace = outputWorkspace
+        self.nWorkers = nWorkers
+        self.timeout = timeout           # seconds one database may take; None for no limit
+        self.retries = retries           # isolated retries of each failed job
+        self.sessionOptions = sessionOptions or {}
+        self.addMsgAndPrint = messageFunc
+        self.summaryFile = os.path.join(outputWorkspace, summaryName)
+
+    def run(self, databases):
+        # validate databases, returning a BatchJob for each, in the same order
+        setWorkerExecutable()
+        jobs = [BatchJob(database) for database in databases]
+        if not os.path.isdir(self.outputWorkspace):
+            os.makedirs(self.outputWorkspace)
+        summary = open(self.summaryFile, 'w')
+        try:
+            summary.write('\t'.join(summaryFields)+'\n')
+            summary.flush()
+            failed = self.runPool(jobs, range(len(jobs)), self.nWorkers, summary, self.retries > 0)
+            for attempt in range(self.retries):
+                stillFailed = []
+                for index in failed:
+                    self.addMsgAndPrint('  retrying '+jobs[index].database+' alone')
+                    stillFailed.extend(self.runPool(jobs, [index], 1, summary, attempt < self.retries - 1))
+                failed = stillFailed
+        finally:
+            summary.close()
+        return jobs
+
+    def runPool(self, jobs, indices, nWorkers, summary, willRetry):
+        # run jobs[i] for i in indices on nWorkers fresh workers; returns the
+        #   indices of jobs that failed. Finished jobs go into the summary,
+        #   failed ones only if willRetry is False
+        waiting = list(indices)
+        failed = []
+        resultQueue = multiprocessing.Queue()
+        workers = []
+        for n in range(min(nWorkers, len(waiting))):
+            workers.append(_Worker(resultQueue, self.sessionOptions))
+        try:
+            while waiting or [worker for worker in workers if worker.index is not None]:
+                for worker in workers:
+                    if worker.index is None and waiting:
+                        index = waiting.pop(0)
+                        jobs[index].attempts = jobs[index].attempts + 1
+                        worker.start(index, jobs[index].database, self.outputWorkspace)
+                try:
+                    index, result, error = resultQueue.get(True, 0.5)
+                except Empty:
+                    pass
+                else:
+                    # results of workers killed meanwhile are dropped
+                    for worker in workers:
+                        if worker.index == index:
+                            self.finishJob(jobs[index], time.time() - worker.startTime, result, error)
+                            worker.index = None
+                            if jobs[index].failed():
+                                failed.append(index)
+                            if not (jobs[index].failed() and willRetry):
+                                self.writeSummary(summary, jobs[index])
+                # replace workers that died or ran out of time
+                for i in range(len(workers)):
+                    worker = workers[i]
+                    if worker.index is None:
+                        continue
+                    elapsed = time.time() - worker.startTime
+                    if not worker.process.is_alive():
+                        job = jobs[worker.index]
+                        job.status = 'crashed'
+                        job.error = 'worker process exited with code '+str(worker.process.exitcode)
+                    elif self.timeout and elapsed > self.timeout:
+                        job = jobs[worker.index]
+                        job.status = 'timed out'
+                        job.error = 'stopped after '+str(self.timeout)+' seconds'
+                    else:
+                        continue
+                    worker.kill()
+                    job.seconds = elapsed
+                    job.result = None
+                    self.addMsgAndPrint('  '+job.database+': '+job.error)
+                    failed.append(worker.index)
+                    if not willRetry:
+                        self.writeSummary(summary, job)
+                    worker.index = None
+                    if waiting:
+                        workers[i] = _Worker(resultQueue, self.sessionOptions)
+        finally:
+            for worker in workers:
+                if worker.index is None:
+                    worker.stop()
+                else:
+                    worker.kill()
+        return failed
+
+    def finishJob(self, job, seconds, result, error):
+        job.seconds = seconds
+        job.result = result
+        if error:
+            job.status = 'failed'
+            job.error = error
+            self.addMsgAndPrint('  '+job.database+' failed:\n'+error)
+        elif result.completed and result.readErrors:
+            # the report is of only part of the rows
+            job.status = 'incomplete'
+            job.error = result.readErrors[0]
+            self.addMsgAndPrint('  '+job.database+': rows of '+str(len(result.readErrors))+' tables could not be read')
+        elif result.completed:
+            job.status = 'ok'
+            job.error = ''
+            self.addMsgAndPrint('  '+job.database+': '+str(result.errorCount())+' errors, '+"%.1f" % seconds+' sec')
+        else:
+            # bad input; validate() has said why, and trying again won't help
+            job.status = 'incomplete'
+            job.error = ''
+            self.addMsgAndPrint('  '+job.database+' was not validated')
+
+    def writeSummary(self, summary, job):
+        schemaErrors = contentErrors = report = ''
+        if job.result is not None and job.result.completed:
+            schemaErrors = str(len(job.result.schemaErrors))
+            contentErrors = str(job.result.errorCount() - len(job.result.schemaErrors))
+            report = job.result.outFile
+        # last line of a traceback names the exception
+        error = ''
+        if job.error:
+            error = job.error.strip().split('\n')[-1].replace('\t', ' ')
+        summary.write('\t'.join([job.database, job.status, str(job.attempts), "%.1f" % job.seconds,
+                                 schemaErrors, contentErrors, report, error])+'\n')
+        summary.flush()
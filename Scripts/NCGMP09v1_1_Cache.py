@@ -0,0 +1,147 @@
+# NCGMP09v1_1_Cache.py
+#   Incremental re-validation for NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#
+#   The inventory of every table (see NCGMP09v1_1_Inventory.py) is saved in
+#   a sidecar file next to the conformance report, with a fingerprint of
+#   the table:
+#     schema    field names, types, lengths and nullability
+#     nrows     row count
+#     maxOID    largest OBJECTID
+#     content   md5 of the columns the inventory reads, one for each
+#               OBJECTID range the table was read in, taken while scanning
+#   On the next run a table with an unchanged fingerprint reuses its saved
+#   inventory and only changed tables are scanned again. The cross-table
+#   checks in checkContent always run, over all inventories.
+#
+#   Fingerprints are compared cheapest first. If no file of the
+#   geodatabase has changed since the last run, nothing is read at all.
+#   Otherwise schema, row count and largest OBJECTID, which need no row
+#   reads, are compared, and a change in any of them sends the table
+#   straight to a rescan. If they are the same, the referenced columns
+#   are read and hashed, which costs much less than inventorying them.
+#
+#   Nothing is written to the geodatabase; SysInfo is left as it is.
+#
+#   The cache holds inventories of every column. A run that reads fewer
+#   columns (needs, see NCGMP09v1_1_Rules.py) still takes unchanged tables
+#   from the cache, but scans changed tables for only the columns it needs
+#   and leaves the cache as it was.
+
+import os
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from NCGMP09v1_1_Inventory import ColumnPlan, contentDigest, inventoryTables
+
+# changes whenever TableInventory or the fingerprint changes, so old caches are ignored
+cacheVersion = 7
+
+def workspaceSignature(workspace):
+    # (name, size, mtime) of each file of a file geodatabase, or of the
+    #   database file itself. Lock files come and go with readers and are
+    #   left out
+    signature = []
+    if os.path.isdir(workspace):
+        names = os.listdir(workspace)
+        names.sort()
+        for name in names:
+            if not name.endswith('.lock'):
+                st = os.stat(os.path.join(workspace, name))
+                signature.append((name, st.st_size, st.st_mtime))
+    else:
+        st = os.stat(workspace)
+        signature.append((os.path.basename(workspace), st.st_size, st.st_mtime))
+    return signature
+
+def tableFingerprint(reader, tablePath):
+    # fingerprint without the content hash, and the field list it was made from
+    fields = reader.listFields(tablePath)
+    bounds = reader.oidRange(tablePath)
+    maxOID = None
+    if bounds:
+        maxOID = bounds[1]
+    fingerprint = {'schema': [(f.name, f.type, f.length, f.isNullable) for f in fields],
+                   'nrows': reader.getCount(tablePath),
+                   'maxOID': maxOID,
+                   'content': None}
+    return fingerprint, fields
+
+def sameWithoutContent(fingerprint1, fingerprint2):
+    for key in ('schema', 'nrows', 'maxOID'):
+        if fingerprint1[key] != fingerprint2[key]:
+            return False
+    return True
+
+def loadCache(cachePath):
+    # {'version':, 'workspace': signature, 'tables': {tablePath: [fingerprint, inventory]}}
+    #   or None if there is no usable cache
+    try:
+        cacheFile = open(cachePath, 'rb')
+        try:
+            cache = pickle.load(cacheFile)
+        finally:
+            cacheFile.close()
+    except:
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != cacheVersion:
+        return None
+    return cache
+
+def saveCache(cachePath, workspace, jobs, fingerprints, inventories):
+    tables = {}
+    for job, fingerprint, inv in zip(jobs, fingerprints, inventories):
+        if inv.complete:
+            tables[job[0]] = [fingerprint, inv]
+    cacheFile = open(cachePath, 'wb')
+    try:
+        pickle.dump({'version': cacheVersion,
+                     'workspace': workspaceSignature(workspace),
+                     'tables': tables}, cacheFile, 2)
+    finally:
+        cacheFile.close()
+
+def incrementalInventory(reader, workspace, jobs, cachePath, nWorkers=1, chunkRows=0, progress=None, needs=None):
+    # inventoryTables(reader, jobs, nWorkers, chunkRows, progress, needs), reusing the
+    #   inventories saved in cachePath for tables that have not changed,
+    #   then, if needs is every column, saving the new inventories there.
+    #   Returns (inventories in job order, names of the tables scanned)
+    allNeeded = needs is None or needs.isAll()
+    cache = loadCache(cachePath)
+    saved = {}
+    if cache:
+        saved = cache['tables']
+    inventories = [None] * len(jobs)
+    fingerprints = [None] * len(jobs)
+    listing = workspaceSignature(workspace)
+    unchangedWorkspace = cache and cache['workspace'] == listing
+    toScan = []
+    for i in range(len(jobs)):
+        tablePath, table = jobs[i]
+        if unchangedWorkspace and tablePath in saved:
+            fingerprints[i], inventories[i] = saved[tablePath]
+            continue
+        fingerprints[i], fields = tableFingerprint(reader, tablePath)
+        if tablePath in saved:
+            oldFingerprint, oldInventory = saved[tablePath]
+            if oldFingerprint['content'] and sameWithoutContent(fingerprints[i], oldFingerprint):
+                # hashed in the OBJECTID ranges the saved hashes were taken in
+                ranges = [oidRange for oidRange, digest in oldFingerprint['content']]
+                fingerprints[i]['content'] = contentDigest(reader, tablePath, ColumnPlan(fields, table).columns, ranges)
+                if fingerprints[i]['content'] == oldFingerprint['content']:
+                    inventories[i] = oldInventory
+                    continue
+        toScan.append(i)
+    scanned = inventoryTables(reader, [jobs[i] for i in toScan], nWorkers, chunkRows, allNeeded, progress, needs)
+    if not allNeeded:
+        # not a full inventory, so not saved
+        for i, inv in zip(toScan, scanned):
+            inventories[i] = inv
+        return inventories, [jobs[i][1] for i in toScan]
+    for i, inv in zip(toScan, scanned):
+        fingerprints[i]['content'] = inv.contentHash
+        inventories[i] = inv
+    if toScan or not unchangedWorkspace or len(saved) != len(jobs):
+        saveCache(cachePath, workspace, jobs, fingerprints, inventories)
+    return inventories, [jobs[i][1] for i in toScan]
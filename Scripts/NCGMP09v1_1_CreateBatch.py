@@ -0,0 +1,256 @@
+# NCGMP09v1_1_CreateBatch.py
+#   Creation of many empty NCGMP09 databases in a pool of worker
+#   processes, for NCGMP09v1_1-CreateBatch.py
+#
+#   A manifest names the databases, one per line, with tab-separated
+#     <geodatabaseName> <coordSystem> <OptionalElements> <#XSections>
+#   as NCGMP09v1_1-CreateDatabase-Arc10.0.py takes them; coordSystem,
+#   OptionalElements and #XSections may be left off or # (#XSections # is 0). Blank
+#   lines and lines starting with # are skipped, and a coordSystem .prj
+#   file may be named relative to the manifest. No database may be named
+#   twice.
+#
+#   Databases with the same schema, optional elements, coordinate system,
+#   number of cross sections and kind (.gdb, .mdb or .gpkg) are the same,
+#   so the batch builds one template for each such configuration, in the
+#   template cache of NCGMP09v1_1_Template.py, and copies it for each of
+#   them. Templates are keyed as the CreateDatabase script keys them, so
+#   the two share their cache. The pool first builds the templates that
+#   are not cached yet, as many at a time as there are workers, and then
+#   makes the copies. Each worker process imports arcpy once, when it
+#   builds its first geodatabase.
+#
+#   Each database gets <name>-create.json and, if it is a file geodatabase,
+#   00readme.txt, as from the CreateDatabase script, and a line in the
+#   summary index,
+#   <outputDir>/creation-summary.txt, tab-separated: status, template
+#   key, seconds to build the template (shared by all its databases, 0 if
+#   it was cached), seconds to copy it, and the error, if there was one.
+
+import os, copy, time, traceback, multiprocessing
+
+from NCGMP09v1_1_Definition import tableDict
+from NCGMP09v1_1_Template import TemplateCache, templateKey
+from NCGMP09v1_1_Plan import ArcpyBackend, PlanResult, PlanRunner, planDatabase, writeReadme, creatorVersion
+from NCGMP09v1_1_GeoPackage import GeoPackageBackend
+from NCGMP09v1_1_Inventory import setWorkerExecutable
+
+summaryName = 'creation-summary.txt'
+summaryFields = ('database','status','template','build seconds','copy seconds','error')
+extensions = ('.gdb','.mdb','.gpkg')
+
+def addMsgAndPrint(msg, severity=0):
+    # prints msg to screen and adds msg to the geoprocessor (in case this is run as a tool)
+    try:
+        import arcpy
+    except ImportError:
+        print(msg)
+        return
+    try:
+        for string in msg.split('\n'):
+            if severity == 0:
+                arcpy.AddMessage(string)
+            elif severity == 1:
+                arcpy.AddWarning(string)
+            elif severity == 2:
+                arcpy.AddError(string)
+    except:
+        pass
+
+class CreateJob(object):
+    # one database of the batch
+
+    def __init__(self, name, coordSystem='#', optionalElements=None, nCrossSections=0):
+        if not os.path.splitext(name)[1].lower() in extensions:
+            name = name+'.gdb'
+        self.name = name
+        self.coordSystem = coordSystem
+        self.optionalElements = optionalElements or []
+        self.nCrossSections = nCrossSections
+        self.extension = os.path.splitext(name)[1].lower()
+        self.key = templateKey(tableDict, self.optionalElements, coordSystem, nCrossSections, self.extension, creatorVersion)
+        self.status = 'waiting'     # then ok or failed
+        self.buildSeconds = 0.0     # of its template, if this batch built it
+        self.copySeconds = 0.0
+        self.result = None          # PlanResult of the template build, if there was one
+        self.error = ''
+
+def readManifest(path):
+    # a CreateJob for each database named in manifest path
+    jobs = []
+    names = set()
+    manifestDir = os.path.dirname(os.path.abspath(path))
+    manifest = open(path)
+    try:
+        lineNumber = 0
+        for line in manifest:
+            lineNumber = lineNumber + 1
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in line.split('\t')]
+            fields = fields + ['', '#', '#', '#'][len(fields):]
+            coordSystem = fields[1]
+            if coordSystem != '#' and not os.path.isabs(coordSystem) and os.path.isfile(os.path.join(manifestDir, coordSystem)):
+                coordSystem = os.path.join(manifestDir, coordSystem)
+            optionalElements = []
+            if fields[2] != '#':
+                optionalElements = fields[2].split(';')
+            if fields[3] == '#':
+                fields[3] = '0'
+            try:
+                nCrossSections = int(fields[3])
+            except ValueError:
+                raise ValueError(path+', line '+str(lineNumber)+': #XSections must be an integer, not '+fields[3])
+            job = CreateJob(fields[0], coordSystem, optionalElements, nCrossSections)
+            if job.name in names:
+                raise ValueError(path+', line '+str(lineNumber)+': '+job.name+' is named twice')
+            names.add(job.name)
+            jobs.append(job)
+    finally:
+        manifest.close()
+    return jobs
+
+def _buildTemplate(task):
+    # runs in a worker process: build the template for key
+    cacheDir, key, extension, optionalElements, coordSystem = task
+    startTime = time.time()
+    results = []
+    def build(templateDir, templateName):
+        if extension == '.gpkg':
+            backend = GeoPackageBackend(os.path.join(templateDir, templateName), coordSystem)
+        else:
+            backend = ArcpyBackend(templateDir, templateName, coordSystem)
+            if backend.arcpy is None:
+                raise ImportError('arcpy is not available; only GeoPackages (.gpkg) can be created')
+        plan = planDatabase(templateName, optionalElements, coordSystem)
+        results.append(PlanRunner(backend).run(plan, os.path.join(templateDir, templateName)))
+        if extension != '.gpkg':
+            # let go of the template, so it can be renamed into the cache
+            backend.arcpy.env.workspace = ''
+            try:
+                backend.arcpy.ClearWorkspaceCache_management()
+            except:
+                pass
+        return results[0].complete()
+    try:
+        template = TemplateCache(cacheDir).build(key, extension, build)
+    except:
+        return [key, None, time.time() - startTime, traceback.format_exc()]
+    if template is None:
+        return [key, results[0], time.time() - startTime, 'failed at '+results[0].failed[0]+': '+results[0].failed[1]]
+    return [key, results[0], time.time() - startTime, '']
+
+def _cloneDatabase(task):
+    # runs in a worker process: copy the template to the database
+    index, cacheDir, key, extension, outputDir, name = task
+    startTime = time.time()
+    cache = TemplateCache(cacheDir)
+    try:
+        path = cache.clone(cache.get(key, extension), outputDir, name)
+    except (IOError, OSError), e:
+        return [index, time.time() - startTime, str(e)]
+    if extension == '.gdb':
+        try:
+            writeReadme(path)
+        except (IOError, OSError):
+            # as in the CreateDatabase script, the database is made without it
+            pass
+    return [index, time.time() - startTime, '']
+
+class BatchCreator(object):
+
+    def __init__(self, outputDir, nWorkers=2, cacheDir=None, messageFunc=addMsgAndPrint):
+        self.outputDir = outputDir
+        self.nWorkers = nWorkers
+        self.cache = TemplateCache(cacheDir)
+        self.addMsgAndPrint = messageFunc
+        self.summaryFile = os.path.join(outputDir, summaryName)
+
+    def run(self, jobs):
+        # create the databases of jobs; returns jobs
+        setWorkerExecutable()
+        if not os.path.isdir(self.outputDir):
+            os.makedirs(self.outputDir)
+        builds = []
+        configurations = {}
+        for job in jobs:
+            if job.key in configurations:
+                configurations[job.key].append(job)
+                continue
+            configurations[job.key] = [job]
+            if self.cache.get(job.key, job.extension) is None:
+                builds.append([self.cache.cacheDir, job.key, job.extension, job.optionalElements, job.coordSystem])
+        self.addMsgAndPrint('  '+str(len(jobs))+' databases of '+str(len(configurations))+' configurations, '+
+                            str(len(builds))+' templates to build')
+        pool = multiprocessing.Pool(max(1, min(self.nWorkers, len(jobs))))
+        try:
+            for key, result, seconds, error in pool.imap_unordered(_buildTemplate, builds, 1):
+                if error:
+                    self.addMsgAndPrint('  Failed to build template '+key+':\n'+error)
+                else:
+                    self.addMsgAndPrint('  Built template '+key+' in %.1f sec' % seconds)
+                for job in configurations[key]:
+                    job.buildSeconds = seconds
+                    job.result = result
+                    if error:
+                        job.status = 'failed'
+                        job.error = error
+                        self.finishJob(job, 'build template')
+            clones = []
+            for i in range(len(jobs)):
+                job = jobs[i]
+                if job.status == 'waiting':
+                    clones.append([i, self.cache.cacheDir, job.key, job.extension, self.outputDir, job.name])
+            for index, seconds, error in pool.imap_unordered(_cloneDatabase, clones, 1):
+                job = jobs[index]
+                job.copySeconds = seconds
+                if error:
+                    job.status = 'failed'
+                    job.error = error
+                else:
+                    job.status = 'ok'
+                self.finishJob(job)
+        finally:
+            pool.close()
+            pool.join()
+        summary = open(self.summaryFile, 'w')
+        try:
+            summary.write('\t'.join(summaryFields)+'\n')
+            for job in jobs:
+                self.writeSummary(summary, job)
+        finally:
+            summary.close()
+        return jobs
+
+    def finishJob(self, job, stage='copy template'):
+        # report job, and write its -create.json; stage is what it failed at,
+        #   if it failed with no PlanResult to say so
+        path = os.path.join(self.outputDir, job.name)
+        if job.result is None:
+            result = PlanResult(path, 'template', [])
+        else:
+            # the build of a template is shared by its databases
+            result = copy.copy(job.result)
+        result.database = path
+        result.template = job.key
+        result.seconds = job.buildSeconds + job.copySeconds
+        if job.status == 'failed' and result.failed is None:
+            # last line of a traceback names the exception
+            result.failed = [stage, job.error.strip().split('\n')[-1]]
+        if job.status == 'ok' and job.result is None:
+            self.addMsgAndPrint('  '+job.name+': template cached, %.1f sec to copy' % job.copySeconds)
+        elif job.status == 'ok':
+            self.addMsgAndPrint('  '+job.name+': %.1f sec to build template, %.1f sec to copy' % (job.buildSeconds, job.copySeconds))
+        else:
+            self.addMsgAndPrint('  '+job.name+' failed: '+job.error.strip().split('\n')[-1])
+        if os.path.exists(path) or job.status == 'failed':
+            result.write(path+'-create.json')
+
+    def writeSummary(self, summary, job):
+        # last line of a traceback names the exception
+        error = ''
+        if job.error:
+            error = job.error.strip().split('\n')[-1].replace('\t', ' ')
+        summary.write('\t'.join([job.name, job.status, job.key, '%.1f' % job.buildSeconds,
+                                 '%.1f' % job.copySeconds, error])+'\n')
@@ -0,0 +1,105 @@
+# NCGMP09v1_1_Domains.py
+#   Value domains of NCGMP09v1_1_Definition.py, checked as tables are
+#   inventoried (see NCGMP09v1_1_Inventory.py)
+#
+#   Numeric domains are taken from rangeDomainDict (Azimuth 0 to 360,
+#   Inclination -90 to 90) and from the 'Positive real number.' entries of
+#   unrepresentableDomainDict:
+#     positive   greater than 0: PlotAtScale, AgePlusError, AgeMinusError
+#     nonzero    positive, or negative for unknown: LocationConfidenceMeters,
+#                OrientationConfidenceDegrees
+#   Age, which may be zero or negative, and Value take any number. A domain
+#   applies to every numeric field of its name, in any table, so the
+#   points of StationData, ContactsAndFaults and the like are all checked.
+#
+#   A DomainCheck tests a whole batch of rows at a time, one list
+#   comprehension per column, and returns only the rows outside its
+#   domain, so checking costs little next to reading the rows. Nulls are
+#   left to the schema checks.
+#
+#   The fields of enumeratedValueDomainFieldList take their values from
+#   Glossary, DataSources or DescriptionOfMapUnits. Most are checked as
+#   references already; the others (termDomainFields in
+#   NCGMP09v1_1_Inventory.py) are compared with Glossary by the validator.
+
+from NCGMP09v1_1_Definition import rangeDomainDict, unrepresentableDomainDict
+
+numericTypes = ('Double','Single','Integer','SmallInteger')
+
+class DomainCheck(object):
+    # fields, and the domain their values should be in, in words. Each
+    #   subclass has outside(batch, cols): [OBJECTID, value] of each row of
+    #   batch outside the domain, where cols are the column numbers of
+    #   fields and OBJECTID is column 0
+
+    def __init__(self, name, fields, description):
+        self.name = name
+        self.field = fields[0]      # field the report names
+        self.fields = fields
+        self.description = description
+
+class RangeDomain(DomainCheck):
+
+    def __init__(self, field, low, high, units):
+        DomainCheck.__init__(self, field, (field,), 'from '+low+' to '+high+' '+units)
+        self.low = float(low)
+        self.high = float(high)
+
+    def outside(self, batch, cols):
+        col = cols[0]
+        low = self.low
+        high = self.high
+        return [[row[0], row[col]] for row in batch if row[col] is not None and not low <= row[col] <= high]
+
+class PositiveDomain(DomainCheck):
+
+    def __init__(self, field):
+        DomainCheck.__init__(self, field, (field,), 'a positive number')
+
+    def outside(self, batch, cols):
+        col = cols[0]
+        return [[row[0], row[col]] for row in batch if row[col] is not None and not row[col] > 0]
+
+class NonzeroDomain(DomainCheck):
+
+    def __init__(self, field):
+        DomainCheck.__init__(self, field, (field,), 'a positive number, or negative if unknown')
+
+    def outside(self, batch, cols):
+        col = cols[0]
+        return [[row[0], row[col]] for row in batch if row[col] is not None and not (row[col] > 0 or row[col] < 0)]
+
+def _numericDomains():
+    domains = {}
+    for field in rangeDomainDict:
+        low, high, units = rangeDomainDict[field]
+        domains[field] = RangeDomain(field, low, high, units)
+    for field in unrepresentableDomainDict:
+        text = unrepresentableDomainDict[field]
+        if not text.startswith('Positive real number.'):
+            continue
+        if text.find('Negative number indicates value is unknown') >= 0:
+            domains[field] = NonzeroDomain(field)
+        elif text.find('Zero or negative value') < 0:
+            domains[field] = PositiveDomain(field)
+    return domains
+
+# field name -> DomainCheck
+numericDomains = _numericDomains()
+
+def domainChecks(fieldInfos):
+    # the DomainChecks that apply to a table with fields fieldInfos
+    numericFields = [field.name for field in fieldInfos if field.type in numericTypes]
+    checks = []
+    for field in numericFields:
+        if field in numericDomains:
+            checks.append(numericDomains[field])
+    return checks
+
+def isNumber(value):
+    # True for a number, or text that reads as one
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
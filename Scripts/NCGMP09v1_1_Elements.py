@@ -0,0 +1,43 @@
+# NCGMP09v1_1_Elements.py
+#   The feature datasets, feature classes, topology, tables and
+#   relationships of a new NCGMP09 geodatabase, in the order
+#   NCGMP09v1_1-CreateDatabase-Arc10.0.py creates them
+#
+#   databaseElements(optionalElements) gives [kind, name, dataset, shapeType]
+#   for each element:
+#     kind       'dataset', 'featureClass', 'topology', 'table' or 'relationship'
+#     name       name of the element
+#     dataset    feature dataset it is in, or '' for one at the top level
+#     shapeType  POLYGON, POLYLINE or POINT for a feature class, else None
+#   Field definitions are those of tableDict (NCGMP09v1_1_Definition.py).
+#
+#   Does not import arcpy.
+
+stationDataClasses = ('OrientationDataPoints','StationPoints','SamplePoints')
+optionalTables = ('StandardLithology','ExtendedAttributes','GeologicEvents')
+
+def databaseElements(optionalElements):
+    elements = [['dataset','GeologicMap','',None],
+                ['featureClass','MapUnitPolys','GeologicMap','POLYGON']]
+    if 'OverlayPolys' in optionalElements:
+        elements.append(['featureClass','OverlayPolys','GeologicMap','POLYGON'])
+    elements.append(['featureClass','ContactsAndFaults','GeologicMap','POLYLINE'])
+    if 'OtherLines' in optionalElements:
+        elements.append(['featureClass','OtherLines','GeologicMap','POLYLINE'])
+    elements.append(['topology','GeologicMapTopology','GeologicMap',None])
+    points = [fc for fc in stationDataClasses if fc in optionalElements]
+    if points:
+        elements.append(['dataset','StationData','',None])
+        for fc in points:
+            elements.append(['featureClass',fc,'StationData','POINT'])
+    elements.append(['featureClass','DataSourcePolys','','POLYGON'])
+    if 'CartographicLines' in optionalElements:
+        elements.append(['featureClass','CartographicLines','','POLYLINE'])
+    for table in ['DescriptionOfMapUnits','DataSources','Glossary','SysInfo']:
+        elements.append(['table',table,'',None])
+    for table in optionalTables:
+        if table in optionalElements:
+            elements.append(['table',table,'',None])
+    if 'StationPoints' in points and 'SamplePoints' in points:
+        elements.append(['relationship','StationSampleLink','StationData',None])
+    return elements
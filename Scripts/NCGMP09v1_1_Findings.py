@@ -0,0 +1,186 @@
+# NCGMP09v1_1_Findings.py
+#   Machine-readable findings of NCGMP09v1_1_Validation.py, written
+#   alongside the text conformance report
+#
+#   A FindingsWriter is given one record for each problem as the checks
+#   find it, and one record for each table and feature class as the
+#   geodatabase is inventoried, and writes them out as it goes rather than
+#   holding them until the end. Every record names its geodatabase, so the
+#   files of many validations can be concatenated (JSON Lines) or attached
+#   and unioned (SQLite) to count findings across geodatabases.
+#
+#   A finding has
+#     database   path of the geodatabase
+#     category   schemaErrors, schemaExtensions, or the CONTENT ERRORS
+#                section the finding is listed under, by the names used
+#                in ValidationResult.contentErrors
+#     severity   error or warning; see severities below
+#     table      table or feature class the finding belongs to
+#     field      field the finding belongs to
+#     objectid   OBJECTID of the row the finding belongs to
+#     value      the offending value: missing term, duplicated _ID, ...
+#     message    the finding in words; for most categories, the line of
+#                the text report
+#     suggestions  for a missing Glossary term or MapUnit, the closest
+#                terms or units that are there (see NCGMP09v1_1_Suggest.py);
+#                a list in JSON Lines, JSON text in SQLite
+#   table, field, objectid, value and suggestions are None where they
+#   don't apply.
+#   A finding is recorded only for report lines that name a problem, so
+#   units found everywhere in the map/DMU/CMU/cross section table are not
+#   recorded.
+#
+#   A table record has database, table, dataset (the feature dataset of a
+#   feature class, None for a table), nrows, seconds (time taken to read
+#   it) and fields, a list of [name, type, length, required, isNullable].
+#
+#   JsonLinesFindings writes <gdb>-findings.jsonl, one JSON object per
+#   line, with record = 'finding' or 'table'. SqliteFindings writes
+#   <gdb>-findings.sqlite, with tables findings, tables and fields.
+
+import os, json, sqlite3
+
+findingFields = ('database','category','severity','table','field','objectid','value','message','suggestions')
+tableFields = ('database','table','dataset','nrows','seconds')
+fieldFields = ('database','table','name','type','length','required','isNullable')
+
+# severity of the findings of each category. Missing fields, reported as
+#   'Error: did not find field ...', are errors whatever their category
+severities = {'readErrors': 'error',
+              'schemaErrors': 'error',
+              'schemaExtensions': 'warning',
+              'duplicateIDs': 'error',
+              'unreferencedIds': 'error',
+              'missingSourceIDs': 'error',
+              'unusedDataSources': 'warning',
+              'missingDmuMapUnits': 'error',
+              'missingStandardLithMapUnits': 'error',
+              'unreferencedDmuMapUnits': 'warning',
+              'unreferencedStandardLithMapUnits': 'warning',
+              'equivalenceErrors': 'warning',
+              'missingGlossaryTerms': 'error',
+              'unusedGlossaryTerms': 'warning',
+              'unusedGeologicEvents': 'warning',
+              'hKeyErrors': 'error',
+              'domainErrors': 'error',
+              'allBadNulls': 'error'}
+
+# rows sent to SQLite at a time
+blockSize = 1000
+
+class FindingsWriter(object):
+    # records of one validation; subclasses write them, with
+    #   writeFinding(values) and writeTable(values, fieldRows)
+
+    suffix = ''
+
+    def __init__(self, path, database):
+        self.path = path
+        self.database = database
+        self.nFindings = 0
+
+    def addFinding(self, category, message, table=None, field=None, objectid=None, value=None, severity=None, suggestions=None):
+        if severity is None:
+            severity = severities.get(category, 'error')
+        self.nFindings = self.nFindings + 1
+        self.writeFinding([self.database, category, severity, table, field, objectid, value, message, suggestions])
+
+    def addTable(self, table, dataset, nrows, seconds, fields):
+        # fields is a list of FieldInfo
+        fieldRows = []
+        for field in fields:
+            fieldRows.append([field.name, field.type, field.length, field.required, field.isNullable])
+        self.writeTable([self.database, table, dataset, nrows, seconds], fieldRows)
+
+    def close(self):
+        pass
+
+class JsonLinesFindings(FindingsWriter):
+
+    suffix = '-findings.jsonl'
+
+    def __init__(self, path, database):
+        FindingsWriter.__init__(self, path, database)
+        self.outfl = open(path, 'w')
+
+    def writeRecord(self, record):
+        # default=str for dates and other values json can't write
+        self.outfl.write(json.dumps(record, sort_keys=True, default=str)+'\n')
+
+    def writeFinding(self, values):
+        record = dict(zip(findingFields, values))
+        record['record'] = 'finding'
+        self.writeRecord(record)
+
+    def writeTable(self, values, fieldRows):
+        record = dict(zip(tableFields, values))
+        record['record'] = 'table'
+        record['fields'] = fieldRows
+        self.writeRecord(record)
+
+    def close(self):
+        if self.outfl is not None:
+            self.outfl.close()
+            self.outfl = None
+
+def _columns(fields):
+    # "table" is an SQL keyword
+    return ','.join(['"'+field+'"' for field in fields])
+
+class SqliteFindings(FindingsWriter):
+
+    suffix = '-findings.sqlite'
+
+    def __init__(self, path, database):
+        FindingsWriter.__init__(self, path, database)
+        if os.path.exists(path):
+            os.remove(path)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE findings ('+_columns(findingFields)+')')
+        self.connection.execute('CREATE TABLE tables ('+_columns(tableFields)+')')
+        self.connection.execute('CREATE TABLE fields ('+_columns(fieldFields)+')')
+        self.findingRows = []
+        self.insertFinding = 'INSERT INTO findings ('+_columns(findingFields)+') VALUES ('+','.join(['?']*len(findingFields))+')'
+
+    def writeFinding(self, values):
+        self.findingRows.append(values)
+        if len(self.findingRows) >= blockSize:
+            self.flush()
+
+    def writeTable(self, values, fieldRows):
+        self.connection.execute('INSERT INTO tables ('+_columns(tableFields)+') VALUES ('+','.join(['?']*len(tableFields))+')', values)
+        self.connection.executemany('INSERT INTO fields ('+_columns(fieldFields)+') VALUES ('+','.join(['?']*len(fieldFields))+')',
+                                    [values[0:2] + row for row in fieldRows])
+        self.connection.commit()
+
+    def flush(self):
+        # a block at a time, committed so the file can be read while validation runs
+        if self.findingRows:
+            self.connection.executemany(self.insertFinding, [[_sqlValue(value) for value in row] for row in self.findingRows])
+            self.connection.commit()
+            self.findingRows = []
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.execute('CREATE INDEX findingsCategory ON findings (category)')
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+def _sqlValue(value):
+    # values sqlite3 can't store are written as text, lists as JSON
+    if value is None or isinstance(value, (int, long, float, basestring)):
+        return value
+    if isinstance(value, list):
+        return json.dumps(value, default=str)
+    return str(value)
+
+findingsFormats = {'jsonl': JsonLinesFindings,
+                   'sqlite': SqliteFindings}
+
+def openFindings(format, outputWorkspace, database):
+    # writer of format ('jsonl' or 'sqlite') for <outputWorkspace>/<database name><suffix>
+    writerClass = findingsFormats[format]
+    path = os.path.join(outputWorkspace, os.path.basename(database)+writerClass.suffix)
+    return writerClass(path, database)
@@ -0,0 +1,259 @@
+# NCGMP09v1_1_GeoPackage.py
+#   GeoPackage backend of NCGMP09v1_1-CreateDatabase-Arc10.0.py: an empty
+#   NCGMP09 database as an OGC GeoPackage (SQLite), without arcpy, so
+#   databases can be made and tested on machines without ArcGIS
+#
+#   createGeoPackage(path, optionalElements, coordSystem) creates the
+#   feature classes and tables that the arcpy backend would create for
+#   optionalElements (see NCGMP09v1_1_Elements.py), with the fields of
+#   tableDict. Field types map as transDict does for arcpy:
+#     String        TEXT(length), or TEXT for memo fields
+#     Single        REAL
+#     Double        DOUBLE
+#     Integer       INTEGER
+#     SmallInteger  INTEGER
+#     Date          DATETIME
+#     Blob          BLOB
+#   and NoNulls fields are NOT NULL. Each feature class and table has an
+#   OBJECTID INTEGER PRIMARY KEY, and each feature class a SHAPE column of
+#   type MULTIPOLYGON, MULTILINESTRING or POINT, registered in
+#   gpkg_geometry_columns with the spatial reference of coordSystem:
+#     #                  the undefined Cartesian SRS, srs_id -1
+#     EPSG:n, or n       srs_id n (its definition is 'undefined' unless n
+#                        is 4326)
+#     a .prj file, or    the WKT, as srs_id n if it has AUTHORITY["EPSG","n"],
+#     WKT text           otherwise as user-defined srs_id 100000
+#   A GeoPackage has no feature datasets, so the feature dataset of each
+#   feature class is given in its gpkg_contents description, and no
+#   topologies or relationship classes, so GeologicMapTopology and
+#   StationSampleLink are not made.
+#
+#   GeoPackageBackend carries out the plan of NCGMP09v1_1_Plan.py: each
+#   feature class or table and all its fields in one CREATE TABLE
+#   statement, and all the statements in one transaction; if any fails,
+#   nothing is left behind. createGeoPackage returns the PlanResult, in
+#   which GeologicMapTopology, StationSampleLink and the feature datasets
+#   are unsupported. A run that dies leaves an empty GeoPackage, which a
+#   resumed run (see NCGMP09v1_1_Plan.py) opens and fills.
+#
+#   Does not import arcpy.
+
+import os, re, sqlite3
+
+from NCGMP09v1_1_Definition import tableDict, memoLength
+from NCGMP09v1_1_Plan import Backend, PlanRunner, planDatabase
+
+sqlTypes = {'String': 'TEXT',
+            'Single': 'REAL',
+            'Double': 'DOUBLE',
+            'Date': 'DATETIME',
+            'Integer': 'INTEGER',
+            'SmallInteger': 'INTEGER',
+            'Blob': 'BLOB'}
+sqlNulls = {'NoNulls': ' NOT NULL',
+            'NullsOK': ''}
+geometryTypes = {'POLYGON': 'MULTIPOLYGON',
+                 'POLYLINE': 'MULTILINESTRING',
+                 'POINT': 'POINT'}
+
+# 'GPKG', and version 1.2
+applicationId = 0x47504B47
+userVersion = 10200
+userSrsId = 100000
+
+metadataTables = ["""CREATE TABLE gpkg_spatial_ref_sys (
+  srs_name TEXT NOT NULL,
+  srs_id INTEGER NOT NULL PRIMARY KEY,
+  organization TEXT NOT NULL,
+  organization_coordsys_id INTEGER NOT NULL,
+  definition TEXT NOT NULL,
+  description TEXT)""",
+                  """CREATE TABLE gpkg_contents (
+  table_name TEXT NOT NULL PRIMARY KEY,
+  data_type TEXT NOT NULL,
+  identifier TEXT UNIQUE,
+  description TEXT DEFAULT '',
+  last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+  min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+  srs_id INTEGER,
+  CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id))""",
+                  """CREATE TABLE gpkg_geometry_columns (
+  table_name TEXT NOT NULL,
+  column_name TEXT NOT NULL,
+  geometry_type_name TEXT NOT NULL,
+  srs_id INTEGER NOT NULL,
+  z TINYINT NOT NULL,
+  m TINYINT NOT NULL,
+  CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+  CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+  CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id))"""]
+
+wgs84 = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+         'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+         'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+         'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]')
+# srs_name, srs_id, organization, organization_coordsys_id, definition, description
+requiredSrs = [['Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', 'undefined cartesian coordinate reference system'],
+               ['Undefined geographic SRS', 0, 'NONE', 0, 'undefined', 'undefined geographic coordinate reference system'],
+               ['WGS 84 geodetic', 4326, 'EPSG', 4326, wgs84, 'longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid']]
+
+epsgCode = re.compile('^(EPSG:)?([0-9]+)$', re.IGNORECASE)
+wktName = re.compile('^[A-Z]+\\["([^"]*)"')
+wktAuthority = re.compile('AUTHORITY\\["EPSG","?([0-9]+)"?\\]\\]\\s*$', re.IGNORECASE)
+
+def spatialReference(coordSystem):
+    # [srs_name, srs_id, organization, organization_coordsys_id, definition,
+    #   description] of coordSystem, as for gpkg_spatial_ref_sys
+    if coordSystem in (None, '', '#'):
+        return requiredSrs[0]
+    match = epsgCode.match(coordSystem.strip())
+    if match:
+        srsId = int(match.group(2))
+        for srs in requiredSrs:
+            if srs[1] == srsId:
+                return srs
+        return ['EPSG:'+str(srsId), srsId, 'EPSG', srsId, 'undefined', None]
+    wkt = coordSystem
+    if os.path.isfile(coordSystem):
+        prjFile = open(coordSystem)
+        wkt = prjFile.read().strip()
+        prjFile.close()
+    name = 'user-defined'
+    match = wktName.match(wkt)
+    if match:
+        name = match.group(1)
+    match = wktAuthority.search(wkt)
+    if match:
+        srsId = int(match.group(1))
+        return [name, srsId, 'EPSG', srsId, wkt, None]
+    return [name, userSrsId, 'NONE', userSrsId, wkt, None]
+
+def columnDefinition(fDef):
+    name, fieldType, nulls, length = fDef[0:4]
+    sqlType = sqlTypes[fieldType]
+    if fieldType == 'String' and length < memoLength:
+        sqlType = sqlType+'('+str(length)+')'
+    return '"'+name+'" '+sqlType+sqlNulls[nulls]
+
+def tableStatement(name, shapeType=None, fieldDefs=None):
+    # CREATE TABLE for feature class or table name, with fieldDefs or,
+    #   if not given, the fields of tableDict
+    if fieldDefs is None:
+        fieldDefs = tableDict[name]
+    columns = ['"OBJECTID" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL']
+    if shapeType is not None:
+        columns.append('"SHAPE" '+geometryTypes[shapeType])
+    for fDef in fieldDefs:
+        columns.append(columnDefinition(fDef))
+    return 'CREATE TABLE "'+name+'" (\n  '+',\n  '.join(columns)+')'
+
+class GeoPackageBackend(Backend):
+    # carries out a plan of NCGMP09v1_1_Plan.py in one transaction
+
+    name = 'GeoPackage'
+    # seconds for any batch: each is a few statements
+    batchCost = 0.002
+    unsupported = ('createDataset', 'defineProjection', 'createTopology', 'createRelationship')
+    transactional = True
+
+    def __init__(self, path, coordSystem='#'):
+        self.path = path
+        self.srs = spatialReference(coordSystem)
+        self.connection = None
+        self.created = False
+
+    def supports(self, operation):
+        return operation.kind not in self.unsupported
+
+    def batchKey(self, operation):
+        # a feature class or table and its fields are one CREATE TABLE
+        if operation.kind in ('createFeatureClass', 'createTable', 'addField'):
+            return operation.element
+        return None
+
+    def estimate(self, batch):
+        return self.batchCost
+
+    def exists(self, operation):
+        if operation.kind == 'createDatabase':
+            table = 'gpkg_contents'
+        else:
+            table = operation.element
+        if not self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchall():
+            return False
+        if operation.kind == 'addField':
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info("'+table+'")')]
+            return operation.fieldDef[0] in columns
+        return True
+
+    def begin(self, resume=False):
+        # on resume, an existing GeoPackage is opened
+        if os.path.exists(self.path) and not resume:
+            raise IOError(self.path+' already exists')
+        self.created = not os.path.exists(self.path)
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        self.connection.execute('PRAGMA application_id = %d' % applicationId)
+        self.connection.execute('PRAGMA user_version = %d' % userVersion)
+        self.connection.execute('BEGIN')
+
+    def apply(self, batch):
+        connection = self.connection
+        operation = batch[0]
+        srs = self.srs
+        if operation.kind == 'createDatabase':
+            for statement in metadataTables:
+                connection.execute(statement)
+            insertSrs = 'INSERT INTO gpkg_spatial_ref_sys VALUES (?,?,?,?,?,?)'
+            connection.executemany(insertSrs, requiredSrs)
+            if srs not in requiredSrs:
+                connection.execute(insertSrs, srs)
+        elif operation.kind in ('createFeatureClass', 'createTable'):
+            name = operation.element
+            fieldDefs = [op.fieldDef for op in batch[1:]]
+            connection.execute(tableStatement(name, operation.shapeType, fieldDefs))
+            if operation.kind == 'createFeatureClass':
+                description = ''
+                if operation.dataset:
+                    description = 'feature dataset '+operation.dataset
+                connection.execute('INSERT INTO gpkg_contents (table_name, data_type, identifier, description, srs_id) VALUES (?,?,?,?,?)',
+                                   (name, 'features', name, description, srs[1]))
+                connection.execute('INSERT INTO gpkg_geometry_columns VALUES (?,?,?,?,?,?)',
+                                   (name, 'SHAPE', geometryTypes[operation.shapeType], srs[1], 0, 0))
+            else:
+                connection.execute('INSERT INTO gpkg_contents (table_name, data_type, identifier) VALUES (?,?,?)',
+                                   (name, 'attributes', name))
+        else:
+            # fields are created with their table
+            raise ValueError(operation.name()+' is not part of a CREATE TABLE')
+
+    def commit(self):
+        self.connection.execute('COMMIT')
+        self.connection.close()
+        self.connection = None
+
+    def abort(self):
+        # nothing is left behind
+        if self.connection is not None:
+            if not self.created:
+                try:
+                    self.connection.execute('ROLLBACK')
+                except sqlite3.Error:
+                    # no transaction was begun
+                    pass
+            self.connection.close()
+            self.connection = None
+            if self.created:
+                os.remove(self.path)
+
+    def isTransient(self, error):
+        text = str(error)
+        return isinstance(error, sqlite3.OperationalError) and (text.find('locked') >= 0 or text.find('busy') >= 0)
+
+def createGeoPackage(path, optionalElements, coordSystem='#', nCrossSections=0, progress=None, messageFunc=None):
+    # create GeoPackage path with the elements for optionalElements; it
+    #   must not exist already. Returns the PlanResult
+    if os.path.exists(path):
+        raise IOError(path+' already exists')
+    plan = planDatabase(os.path.basename(path), optionalElements, coordSystem)
+    runner = PlanRunner(GeoPackageBackend(path, coordSystem), progress, messageFunc)
+    return runner.run(plan, path)
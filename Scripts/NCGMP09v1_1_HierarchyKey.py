@@ -0,0 +1,150 @@
+# NCGMP09v1_1_HierarchyKey.py
+#   Structure of the HierarchyKeys of DescriptionOfMapUnits, checked by
+#   NCGMP09v1_1_Validation.py
+#
+#   HierarchyKeys such as 001-002-003 place each DMU entry in a tree: the
+#   parent of 001-002-003 is 001-002, its siblings are the other children
+#   of 001-002, and they are numbered in order. HierarchyIndex sorts the
+#   keys as tuples of their fragments, which puts each key right after
+#   its parent and every key of a subtree together, and walks them once
+#   with a stack of the keys above the current one, as a walk of a trie
+#   would. So the whole check takes O(n log n) for n entries:
+#
+#     format          fragments not all the length of the first fragment
+#                     of the first key, or not all digits
+#     duplicate       more than one entry with the same key
+#     missing parent  001-002-003 with no 001-002 (reported once for each
+#                     missing key)
+#     sibling gap     001-004 following 001-002, with no 001-003, or
+#                     children that don't start at 1 (001-002 the first
+#                     child of 001, or 002 the first key); not checked
+#                     beneath a missing parent
+#     heading         an entry with no MapUnit (a heading) that has no
+#                     entries beneath it, or that is beneath a map unit.
+#                     Entries whose ParagraphStyle contains 'headnote' are
+#                     notes, not headings
+#     ParagraphStyle  a style ending in a number (Heading2, DMUUnit3) whose
+#                     number is not the depth of the key (the number of
+#                     its fragments); a 'heading' style on a map unit; a
+#                     'unit' style on an entry with no MapUnit
+#
+#   Does not import arcpy.
+
+import re
+
+styleDepth = re.compile('([0-9]+)$')
+
+class HierarchyEntry(object):
+    # one DMU entry, or a missing parent, in the walk
+
+    def __init__(self, parts, oid=None, key=None, mapUnit=None, style=None):
+        self.parts = parts
+        self.oid = oid
+        self.key = key
+        self.mapUnit = mapUnit
+        self.style = style
+        self.missing = oid is None      # a parent that no entry has
+        self.lastChild = None           # number of the last child seen, 0 before
+        if not self.missing:            #   the first; None beneath a missing parent
+            self.lastChild = 0
+        self.lastChildKey = None
+        self.nChildren = 0
+
+    def isUnit(self):
+        return self.mapUnit not in (None, '', 'None')
+
+    def isHeading(self):
+        return not self.missing and not self.isUnit() and str(self.style).lower().find('headnote') < 0
+
+def fragmentNumber(part):
+    if part.isdigit():
+        return int(part)
+    return None
+
+class HierarchyIndex(object):
+
+    def __init__(self, rows):
+        # rows are [OBJECTID, HierarchyKey, MapUnit, ParagraphStyle], in OBJECTID order
+        self.rows = rows
+        self.problems = []      # [OBJECTID, key, problem], problem None for a format error
+        self.partLength = None
+
+    def problem(self, entry, text):
+        self.problems.append([entry.oid, entry.key, text])
+
+    def check(self):
+        entries = []
+        for oid, key, mapUnit, style in self.rows:
+            if key in (None, ''):
+                self.problems.append([oid, '', 'no HierarchyKey'])
+                continue
+            key = str(key)
+            parts = tuple(key.split('-'))
+            entry = HierarchyEntry(parts, oid, key, mapUnit, style)
+            if self.partLength is None:
+                self.partLength = len(parts[0])
+            for part in parts:
+                if len(part) != self.partLength or not part.isdigit():
+                    self.problem(entry, None)
+                    break
+            self.checkStyle(entry)
+            entries.append(entry)
+        entries.sort(key=lambda entry: (entry.parts, entry.oid))
+        root = HierarchyEntry(())
+        root.missing = False
+        root.lastChild = 0
+        stack = [root]
+        for entry in entries:
+            if entry.parts == stack[-1].parts:
+                self.problem(entry, 'duplicate of the entry at OBJECTID='+str(stack[-1].oid))
+                continue
+            while entry.parts[0:len(stack[-1].parts)] != stack[-1].parts:
+                self.close(stack.pop())
+            # parents that no entry has, so their children are reported once
+            while len(stack[-1].parts) < len(entry.parts) - 1:
+                parent = HierarchyEntry(entry.parts[0:len(stack[-1].parts) + 1])
+                self.problem(entry, 'parent '+'-'.join(parent.parts)+' is missing')
+                self.addChild(stack[-1], parent)
+                stack.append(parent)
+            self.addChild(stack[-1], entry)
+            if entry.isHeading():
+                for above in stack[1:]:
+                    if above.isUnit():
+                        self.problem(entry, 'heading beneath map unit '+str(above.mapUnit))
+                        break
+            stack.append(entry)
+        while len(stack) > 1:
+            self.close(stack.pop())
+        return self.problems
+
+    def addChild(self, parent, entry):
+        # entry is the next child of parent in sorted order. A missing entry
+        #   has been reported as missing, and not again for the gap it leaves
+        number = fragmentNumber(entry.parts[-1])
+        if number is not None and parent.lastChild is not None and number > parent.lastChild + 1 and not entry.missing:
+            if parent.lastChildKey is None:
+                self.problem(entry, 'gap in sibling order, first child is not numbered 1')
+            else:
+                self.problem(entry, 'gap in sibling order after '+parent.lastChildKey)
+        if number is not None:
+            parent.lastChild = number
+        parent.lastChildKey = '-'.join(entry.parts)
+        parent.nChildren = parent.nChildren + 1
+
+    def close(self, entry):
+        # entry and everything beneath it have been seen
+        if entry.isHeading() and entry.nChildren == 0:
+            self.problem(entry, 'heading with no entries beneath it')
+
+    def checkStyle(self, entry):
+        if entry.style in (None, ''):
+            return
+        style = str(entry.style)
+        match = styleDepth.search(style)
+        if match and int(match.group(1)) != len(entry.parts):
+            self.problem(entry, 'ParagraphStyle '+style+' does not match depth '+str(len(entry.parts)))
+        lowerStyle = style.lower()
+        if lowerStyle.find('heading') >= 0 and entry.isUnit():
+            self.problem(entry, 'ParagraphStyle '+style+' on map unit '+str(entry.mapUnit))
+        if lowerStyle.find('unit') >= 0 and not entry.isUnit():
+            self.problem(entry, 'ParagraphStyle '+style+' on an entry with no MapUnit')
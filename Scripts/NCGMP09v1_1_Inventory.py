@@ -0,0 +1,461 @@
+# NCGMP09v1_1_Inventory.py
+#   Single-scan table inventory for NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#
+#   inventoryTable() opens a table once and collects everything the
+#   validator needs from it: row count, field descriptions, _ID values,
+#   references to Glossary, DataSources and DescriptionOfMapUnits,
+#   pseudonulls, and the columns that checkContent compares those
+#   references against (DataSources_ID, Glossary Term, ...).
+#
+#   The result is a TableInventory that holds no arcpy objects, so it can
+#   be returned from a worker process or cached. inventoryTables() scans a
+#   list of tables, optionally in a pool of worker processes, and returns
+#   the inventories in the order the tables were listed. Large tables can
+#   also be split into OBJECTID ranges that are scanned separately and
+#   merged back, in OBJECTID order, into one inventory per table.
+#   inventoryRows() makes the inventory of rows that the caller has read.
+#
+#   A ColumnNeeds limits the columns read to those some checks need (see
+#   NCGMP09v1_1_Rules.py); by default everything is read.
+
+import os, sys, time, hashlib
+
+from NCGMP09v1_1_Definition import tableDict, enumeratedValueDomainFieldList
+from NCGMP09v1_1_Domains import domainChecks
+
+# fields whose values must be defined in Glossary
+gFieldDefList = ('Type','TypeModifier','LocationMethod','Lithology','ProportionTerm','TimeScale',
+                 'Qualifier','Property','ExistenceConfidence','IdentityConfidence',
+                 'ScientificConfidence','ParagraphStyle','AgeUnits','GeneralLithology',
+                 'GeneralLithologyConfidence')
+
+# columns whose values checkContent compares with references from other tables
+contentFields = {'DataSources': ('DataSources_ID',),
+                 'Glossary': ('Term',),
+                 'DescriptionOfMapUnits': ('MapUnit','HierarchyKey','ParagraphStyle'),
+                 'StandardLithology': ('MapUnit',),
+                 'ExtendedAttributes': ('OwnerID','ValueLinkID'),
+                 'GeologicEvents': ('GeologicEvents_ID',)}
+
+# tables whose rows are also kept whole, as [OBJECTID, value, ...] of these
+#   contentFields, for checks that need the values of a row together;
+#   only when the first of them is needed
+rowFields = {'DescriptionOfMapUnits': ('HierarchyKey','MapUnit','ParagraphStyle')}
+
+# fields of enumerated domains that are not read as references to Glossary,
+#   DataSources or DescriptionOfMapUnits (PartType, PropertyValue). Their
+#   values are collected too, to be compared with Glossary
+termDomainFields = tuple([field for field in enumeratedValueDomainFieldList
+                          if field not in gFieldDefList and field != 'MapUnit' and field.find('Source') < 0])
+for table in tableDict:
+    for fDef in tableDict[table]:
+        if fDef[0] in termDomainFields:
+            contentFields[table] = contentFields.get(table, ()) + (fDef[0],)
+
+# kinds of column that are read from every table that has them:
+#   ids        the <table>_ID field
+#   glossary   fields of gFieldDefList
+#   sources    fields that point at DataSources
+#   mapUnits   MapUnit
+#   strings    non-nullable String fields, checked for pseudonulls
+#   domains    numeric fields with a domain (see NCGMP09v1_1_Domains.py)
+columnKinds = ('ids','glossary','sources','mapUnits','strings','domains')
+
+class ColumnNeeds(object):
+    # the columns inventoryTable reads: those of kinds, from every table,
+    #   and of each table the contentFields listed for it in values
+
+    def __init__(self, kinds=columnKinds, values=None):
+        self.kinds = tuple([kind for kind in columnKinds if kind in kinds])
+        if values is None:
+            values = contentFields
+        self.values = {}
+        for table in values:
+            self.values[table] = tuple([field for field in contentFields.get(table, ()) if field in values[table]])
+
+    def valueFields(self, table):
+        return self.values.get(table, ())
+
+    def readsTable(self, table):
+        # False if no column of table is needed
+        return len(self.kinds) > 0 or len(self.valueFields(table)) > 0
+
+    def key(self):
+        tables = list(self.values.keys())
+        tables.sort()
+        return (self.kinds, tuple([(table, self.values[table]) for table in tables]))
+
+    def isAll(self):
+        return self.key() == allColumns.key()
+
+allColumns = ColumnNeeds()
+
+class TableInventory(object):
+    # everything the validator needs from one table
+
+    def __init__(self, table):
+        self.table = table
+        self.nrows = 0
+        self.fields = []          # FieldInfo objects
+        self.ids = []             # values of the <table>_ID field
+        self.glossaryRefs = {}    # field -> list of str(value) references to Glossary
+        self.sourceRefs = {}      # field -> list of references to DataSources
+        self.mapUnits = []        # str(MapUnit), except ''
+        self.badNulls = []        # [OBJECTID, [[field, problem], ...]] for pseudonulls and leading or trailing spaces
+        self.domainErrors = []    # [OBJECTID, field, value, domain] for numeric values outside their domains
+        self.values = {}          # contentFields column -> list of non-null values
+        self.rows = []            # [OBJECTID, value, ...] of the rowFields of the table
+        self.messages = []        # problems met while reading, for the caller to report
+        self.seconds = 0.0        # time taken by the scan
+        self.contentHash = None   # [(oidRange, md5), ...], see inventoryTable(hashContent=True)
+        self.complete = True      # False if reading the rows failed
+        self.readError = None     # error that stopped the reading of the rows, if one did
+
+# what is wrong with a String value that starts or ends with a space
+pseudonull = 'pseudonull'
+trailingSpace = 'trailing space'
+leadingSpace = 'leading space'
+
+def spaceProblem(value):
+    if value.strip(' ') == '':
+        return pseudonull
+    if value[-1:] == ' ':
+        return trailingSpace
+    return leadingSpace
+
+def valueText(value):
+    # value for a message; str() fails on non-ASCII unicode in Python 2
+    try:
+        return str(value)
+    except UnicodeError:
+        return repr(value)
+
+def spaceProblems(column):
+    # [(position, problem), ...] for the values of column that start or end
+    #   with a space. Each distinct value is checked once; a None, or a value
+    #   that is not a string, only ends its own check. Where there are bad
+    #   values, list.index finds them in a list of flags
+    bad = {}
+    for value in set(column):
+        try:
+            if value and (value[-1] == ' ' or value[0] == ' '):
+                bad[value] = spaceProblem(value)
+        except TypeError:
+            pass
+    found = []
+    if bad:
+        isBad = [value in bad for value in column]
+        i = -1
+        try:
+            while True:
+                i = isBad.index(True, i + 1)
+                found.append((i, bad[column[i]]))
+        except ValueError:
+            pass
+    return found
+
+def badStrings(batch, stringCols):
+    # pseudonulls and leading or trailing spaces in a batch of rows.
+    #   stringCols is a list of (field, column number) of the non-nullable
+    #   String fields, the only ones checked.
+    #   Returns [row, [[field, problem], ...]] for each row with a problem,
+    #   in batch order, and the problems of a row in stringCols order. Each
+    #   column is taken out of the batch and checked whole; zip(*batch) would
+    #   make an iterator per row, and the garbage collection they set off
+    #   costs more than the check
+    problems = {}
+    for field, col in stringCols:
+        for i, problem in spaceProblems([row[col] for row in batch]):
+            if i in problems:
+                problems[i].append([field, problem])
+            else:
+                problems[i] = [[field, problem]]
+    rows = list(problems.keys())
+    rows.sort()
+    return [[batch[i], problems[i]] for i in rows]
+
+def batchBytes(batch):
+    # text of a batch of rows for hashing; the same rows give the same
+    #   text however they are divided into batches
+    return ''.join(map(repr, batch)).encode('utf-8')
+
+def contentDigest(reader, tablePath, columns, ranges=(None,)):
+    # [(oidRange, md5 of the values of columns in oidRange), ...] for each
+    #   of ranges, as inventoryTable(hashContent=True) gives them
+    digests = []
+    for oidRange in ranges:
+        hasher = hashlib.md5()
+        for batch in reader.readBatches(tablePath, columns, oidRange):
+            hasher.update(batchBytes(batch))
+        digests.append((oidRange, hasher.hexdigest()))
+    return digests
+
+class ColumnPlan(object):
+    # the columns of a table that inventoryTable reads, and what each is for:
+    #   fields that must have values defined in Glossary, fields that point
+    #   at DataSources (name cn 'Source'), MapUnit, the _ID field,
+    #   non-nullable String fields (checked for pseudonulls) and contentFields,
+    #   or only those of them in needs, a ColumnNeeds
+
+    def __init__(self, fieldInfos, table, needs=None):
+        if needs is None:
+            needs = allColumns
+        kinds = needs.kinds
+        self.fields = [field.name for field in fieldInfos]
+        self.oidField = 'OBJECTID'
+        self.nonNullStringFields = []
+        for field in fieldInfos:
+            if field.type == 'OID':
+                self.oidField = field.name
+            if field.type == 'String' and not field.isNullable and 'strings' in kinds:
+                self.nonNullStringFields.append(field.name)
+        self.idField = table+'_ID'
+        self.hasIdField = self.idField in self.fields and 'ids' in kinds
+        self.mapUnitExists = 'MapUnit' in self.fields and 'mapUnits' in kinds
+        self.glossFields = []
+        self.sourceFields = []
+        for field in self.fields:
+            if field in gFieldDefList and table != 'Glossary' and 'glossary' in kinds:
+                self.glossFields.append(field)
+            if field.find('Source') >= 0 and field.find('_ID') < 0 and table != 'DataSources' and 'sources' in kinds:
+                self.sourceFields.append(field)
+        self.valueFields = [field for field in needs.valueFields(table) if field in self.fields]
+        self.rowFields = ()
+        if table in rowFields and rowFields[table][0] in self.valueFields:
+            self.rowFields = rowFields[table]
+        self.domainChecks = []
+        if 'domains' in kinds:
+            self.domainChecks = domainChecks(fieldInfos)
+        self.columns = [self.oidField]
+        if self.hasIdField:
+            self.columns.append(self.idField)
+        if self.mapUnitExists and not 'MapUnit' in self.columns:
+            self.columns.append('MapUnit')
+        domainFields = []
+        for check in self.domainChecks:
+            domainFields.extend(check.fields)
+        for field in self.glossFields + self.sourceFields + self.nonNullStringFields + self.valueFields + domainFields + list(self.rowFields):
+            if field in self.fields and not field in self.columns:
+                self.columns.append(field)
+
+def inventoryTable(reader, tablePath, table, oidRange=None, hashContent=False, progress=None, needs=None):
+    # scan table once with reader (see NCGMP09v1_1_RowReader.py)
+    #   if oidRange = (first, last+1) is given, only those rows are scanned
+    #   if hashContent, inv.contentHash is set to contentDigest of the rows read,
+    #   hashed as they are scanned
+    #   progress (NCGMP09v1_1_Progress.py), if given, is told of each batch read
+    #   needs, a ColumnNeeds, limits the columns read; by default all are read
+    startTime = time.time()
+    fields = reader.listFields(tablePath)
+    plan = ColumnPlan(fields, table, needs)
+    # read only the planned columns, each value once
+    inv = inventoryRows(table, fields, plan, reader.readBatches(tablePath, plan.columns, oidRange),
+                        hashContent, progress)
+    if hashContent:
+        inv.contentHash = [(oidRange, inv.contentHash)]
+    inv.seconds = time.time() - startTime
+    return inv
+
+def inventoryRows(table, fields, plan, batches, hashContent=False, progress=None):
+    # the inventory of table from batches of rows of the columns of plan, a
+    #   ColumnPlan made from fields; for a caller that reads the rows itself.
+    #   If hashContent, inv.contentHash is the md5 of the rows
+    startTime = time.time()
+    inv = TableInventory(table)
+    inv.fields = fields
+    columns = plan.columns
+    if plan.hasIdField:
+        idCol = columns.index(plan.idField)
+    if plan.mapUnitExists:
+        muCol = columns.index('MapUnit')
+    glossCols = []
+    for field in plan.glossFields:
+        inv.glossaryRefs[field] = []
+        glossCols.append((field, inv.glossaryRefs[field], columns.index(field)))
+    sourceCols = []
+    for field in plan.sourceFields:
+        inv.sourceRefs[field] = []
+        sourceCols.append((inv.sourceRefs[field], columns.index(field)))
+    stringCols = [(field, columns.index(field)) for field in plan.nonNullStringFields]
+    valueCols = []
+    for field in plan.valueFields:
+        inv.values[field] = []
+        valueCols.append((inv.values[field], columns.index(field)))
+    domainCols = [(check, [columns.index(field) for field in check.fields]) for check in plan.domainChecks]
+    # None for a row field the table doesn't have
+    rowCols = [None] * len(plan.rowFields)
+    for i in range(len(plan.rowFields)):
+        if plan.rowFields[i] in columns:
+            rowCols[i] = columns.index(plan.rowFields[i])
+    if hashContent:
+        hasher = hashlib.md5()
+    # one copy of each distinct glossary reference and MapUnit text
+    shared = {}
+    try:
+        for batch in batches:
+            inv.nrows = inv.nrows + len(batch)
+            if progress is not None:
+                progress.rows(len(batch))
+            if hashContent:
+                hasher.update(batchBytes(batch))
+            for row in batch:
+                if plan.hasIdField:
+                    inv.ids.append(row[idCol])
+                for field, refs, col in glossCols:
+                    value = row[col]
+                    try:
+                        if value != '' and value != None:
+                            text = str(value)
+                            refs.append(shared.setdefault(text, text))
+                    except:
+                        inv.messages.append('Table '+table+', OBJECTID = '+str(row[0])+', field '+field+' caused an error')
+                        inv.messages.append('Field value is <'+valueText(value)+'>')
+                if plan.mapUnitExists:
+                    try:
+                        mu = str(row[muCol])
+                    except:
+                        inv.messages.append('Table '+table+', OBJECTID = '+str(row[0])+', field MapUnit caused an error')
+                        inv.messages.append('Field value is <'+valueText(row[muCol])+'>')
+                    else:
+                        if mu != '':
+                            inv.mapUnits.append(shared.setdefault(mu, mu))
+                for refs, col in sourceCols:
+                    refs.append(row[col])
+                for valueList, col in valueCols:
+                    if row[col] != None:
+                        valueList.append(row[col])
+                if rowCols:
+                    keptRow = [row[0]]
+                    for col in rowCols:
+                        if col is None:
+                            keptRow.append(None)
+                        else:
+                            keptRow.append(row[col])
+                    inv.rows.append(keptRow)
+            # check for pseudonulls and leading or trailing spaces
+            for row, problems in badStrings(batch, stringCols):
+                inv.badNulls.append([row[0], problems])
+            # and for numbers outside their domains, the whole batch at once
+            for check, cols in domainCols:
+                for oid, value in check.outside(batch, cols):
+                    inv.domainErrors.append([oid, check.field, value, check.description])
+    except Exception, e:
+        # the rows could not be read: a bad value only spoils its own check
+        inv.readError = valueText(e).strip() or e.__class__.__name__
+        inv.messages.append('failed to read rows of '+table+': '+inv.readError)
+        inv.complete = False
+    if hashContent:
+        inv.contentHash = hasher.hexdigest()
+    inv.seconds = time.time() - startTime
+    return inv
+
+def mergeTableInventories(parts):
+    # one inventory from the inventories of the OBJECTID ranges of a table,
+    #   given in OBJECTID order
+    inv = parts[0]
+    for part in parts[1:]:
+        inv.nrows = inv.nrows + part.nrows
+        inv.ids.extend(part.ids)
+        for field in part.glossaryRefs:
+            inv.glossaryRefs[field].extend(part.glossaryRefs[field])
+        for field in part.sourceRefs:
+            inv.sourceRefs[field].extend(part.sourceRefs[field])
+        for field in part.values:
+            inv.values[field].extend(part.values[field])
+        inv.mapUnits.extend(part.mapUnits)
+        inv.rows.extend(part.rows)
+        inv.badNulls.extend(part.badNulls)
+        inv.domainErrors.extend(part.domainErrors)
+        inv.messages.extend(part.messages)
+        inv.seconds = inv.seconds + part.seconds
+        if inv.contentHash is not None and part.contentHash is not None:
+            inv.contentHash = inv.contentHash + part.contentHash
+        else:
+            inv.contentHash = None
+        inv.complete = inv.complete and part.complete
+        if inv.readError is None:
+            inv.readError = part.readError
+    inv.badNulls.sort(key=lambda badNull: badNull[0])
+    inv.domainErrors.sort(key=lambda domainError: domainError[0])
+    return inv
+
+def oidChunks(bounds, chunkRows):
+    # OBJECTID ranges of about chunkRows rows covering bounds = (smallest, largest)
+    if bounds is None or chunkRows <= 0 or bounds[1] - bounds[0] < chunkRows:
+        return [None]
+    chunks = []
+    first = bounds[0]
+    while first <= bounds[1]:
+        chunks.append((first, min(first + chunkRows, bounds[1] + 1)))
+        first = first + chunkRows
+    return chunks
+
+# each worker process opens its own reader (see inventoryTables)
+_workerReader = None
+
+def _initWorker(readerSpec):
+    global _workerReader
+    readerClass, readerArgs = readerSpec
+    _workerReader = readerClass(*readerArgs)
+
+def _inventoryJob(job):
+    # (task number, inventory), as tasks finish in any order
+    return job[5], inventoryTable(_workerReader, job[0], job[1], job[2], job[4], None, job[6])
+
+def inventoryTables(reader, jobs, nWorkers=1, chunkRows=0, hashContent=False, progress=None, needs=None):
+    # jobs is a list of [tablePath, table]. Returns a list of TableInventory
+    #   in the order of jobs. With nWorkers > 1 tables are scanned in a pool
+    #   of processes, each with a reader built from reader.spec(). With
+    #   chunkRows > 0, tables whose OBJECTIDs span more than chunkRows are
+    #   scanned in OBJECTID ranges of chunkRows, which the pool works on
+    #   concurrently. hashContent is passed to inventoryTable; tables read
+    #   in OBJECTID ranges get a hash of each range. progress, if given, is told
+    #   how many rows there are to read and of each table and batch read.
+    #   needs, a ColumnNeeds, is passed to inventoryTable
+    tasks = []
+    for i in range(len(jobs)):
+        ranges = [None]
+        if chunkRows > 0:
+            ranges = oidChunks(reader.oidRange(jobs[i][0]), chunkRows)
+        for oidRange in ranges:
+            tasks.append([jobs[i][0], jobs[i][1], oidRange, i, hashContent, len(tasks), needs])
+    if progress is not None and progress.listening():
+        # counting rows costs a call per table, so only if anyone is listening
+        progress.expect(sum([reader.getCount(job[0]) for job in jobs]))
+    if nWorkers <= 1 or len(tasks) < 2:
+        parts = []
+        for task in tasks:
+            if progress is not None:
+                progress.table(task[1])
+            parts.append(inventoryTable(reader, task[0], task[1], task[2], task[4], progress, needs))
+    else:
+        parts = _poolMap(reader, tasks, nWorkers, progress)
+    # regroup the parts of each table, in task (OBJECTID) order
+    partsByJob = []
+    for job in jobs:
+        partsByJob.append([])
+    for task, part in zip(tasks, parts):
+        partsByJob[task[3]].append(part)
+    return [mergeTableInventories(jobParts) for jobParts in partsByJob]
+
+def setWorkerExecutable():
+    import multiprocessing
+    if sys.platform == 'win32' and os.path.basename(sys.executable).lower() not in ('python.exe', 'pythonw.exe'):
+        # running inside ArcMap or ArcCatalog: workers must be started with python.exe
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'python.exe'))
+
+def _poolMap(reader, tasks, nWorkers, progress=None):
+    import multiprocessing
+    setWorkerExecutable()
+    pool = multiprocessing.Pool(min(nWorkers, len(tasks)), _initWorker, (reader.spec(),))
+    try:
+        parts = [None] * len(tasks)
+        for i, part in pool.imap_unordered(_inventoryJob, tasks, 1):
+            parts[i] = part
+            if progress is not None:
+                progress.table(part.table)
+                progress.rows(part.nrows)
+    finally:
+        pool.close()
+        pool.join()
+    return parts
@@ -0,0 +1,525 @@
+# NCGMP09v1_1_Plan.py
+#   Creation of a new NCGMP09 database as a plan of operations, for
+#   NCGMP09v1_1-CreateDatabase-Arc10.0.py
+#
+#   planDatabase(name, optionalElements, coordSystem) lists, in order, the
+#   operations that make the database: the database itself, then for
+#   each element of databaseElements (NCGMP09v1_1_Elements.py) its
+#   creation and, for a feature class or table, one addField for each
+#   field of tableDict. Feature datasets come before what is in them, and
+#   the topology and relationship after the feature classes they join.
+#
+#   A backend carries out operations:
+#     ArcpyBackend        file (.gdb) or personal (.mdb) geodatabase
+#     GeoPackageBackend   GeoPackage, in NCGMP09v1_1_GeoPackage.py
+#   Each backend says which consecutive operations it can carry out in one
+#   call, by giving them the same batch key, and how long a batch takes.
+#   arcpy adds one field per AddField call, or the nullable fields of a
+#   table per AddFields call where arcpy has it (ArcGIS 10.6 and later;
+#   AddFields can't make a field non-nullable, so NoNulls fields are
+#   still added one at a time); a
+#   GeoPackage creates each table with all its fields in one CREATE TABLE
+#   statement, and runs every statement in one transaction.
+#
+#   A PlanRunner runs a plan a batch at a time. A batch that fails with an
+#   error the backend calls transient (a schema lock, a locked database)
+#   is tried again, up to retries times, after retryDelay seconds, doubled
+#   each time, unless some of its operations were done before it failed
+#   (an AddFields call that added some of its fields). Any other failure
+#   stops the run: nothing is created on top of a missing feature class
+#   or table. The PlanResult says what was done
+#   and what failed; complete is True only if every operation was done,
+#   and result.write(path) writes it as JSON. Operations a backend doesn't
+#   support (a GeoPackage has no topologies) are reported as such.
+#
+#   A run that dies part way can be resumed. Given a Journal, the runner
+#   writes the name of each operation to it as soon as its batch is done
+#   (a line with the signature of the plan comes first). A resumed run
+#   skips the operations in the journal, and asks the backend whether each
+#   of the operations after them exists already (arcpy.Exists, ListFields
+#   or the spatial reference of a dataset; sqlite_master or the columns of
+#   a table), in case the run died between an operation and its journal
+#   line, or left no journal. Operations from the first that doesn't exist
+#   on are carried out. A journal of another plan is not used. The journal
+#   is removed when the run is complete. A GeoPackage is made in one
+#   transaction, so a run that dies leaves nothing done and no journal is
+#   kept; a resumed run opens the GeoPackage left behind.
+#
+#   describePlan(plan, backend) gives the batches of a plan and their
+#   estimated seconds, for a dry run. writeReadme(path) writes the
+#   00readme.txt that names creatorVersion in a new file geodatabase.
+#
+#   Does not import arcpy until an ArcpyBackend is made.
+
+import os, time, json, hashlib
+
+from NCGMP09v1_1_Definition import tableDict
+from NCGMP09v1_1_Elements import databaseElements
+from NCGMP09v1_1_Progress import Progress
+
+# names the databases created, and keys their templates (NCGMP09v1_1_Template.py)
+creatorVersion = 'NCGMP09v1.1-CreateDatabase-Arc10.0.py, version of 23 February 2012'
+
+transDict =     { 'String': 'TEXT',
+                  'Single': 'FLOAT',
+                  'Double': 'DOUBLE',
+                  'NoNulls':'NON_NULLABLE',
+                  'NullsOK':'NULLABLE',
+                  'Date'  : 'DATE',
+                  'Integer' : 'LONG',
+                  'SmallInteger' : 'SHORT',
+                  'Blob' : 'BLOB'}
+
+# kind of operation made for each kind of element
+elementOperations = {'dataset': 'createDataset',
+                     'featureClass': 'createFeatureClass',
+                     'topology': 'createTopology',
+                     'table': 'createTable',
+                     'relationship': 'createRelationship'}
+
+class Operation(object):
+
+    def __init__(self, kind, element, dataset='', shapeType=None, fieldDef=None):
+        self.kind = kind            # createDatabase, createDataset, defineProjection, createFeatureClass,
+                                    #   createTable, addField, createTopology or createRelationship
+        self.element = element      # database, dataset, feature class, table, topology or relationship
+        self.dataset = dataset      # feature dataset the element is in, or ''
+        self.shapeType = shapeType  # POLYGON, POLYLINE or POINT, for createFeatureClass
+        self.fieldDef = fieldDef    # [name, type, nulls, length] of tableDict, for addField
+
+    def path(self):
+        # of the element, within the database
+        if self.dataset:
+            return self.dataset+'/'+self.element
+        return self.element
+
+    def name(self):
+        # unique within a plan
+        if self.kind == 'addField':
+            return self.kind+' '+self.path()+'.'+self.fieldDef[0]
+        return self.kind+' '+self.path()
+
+    def __str__(self):
+        return self.name()
+
+def planDatabase(name, optionalElements, coordSystem='#'):
+    # the operations that create database name with optionalElements
+    plan = [Operation('createDatabase', name)]
+    for kind, element, dataset, shapeType in databaseElements(optionalElements):
+        plan.append(Operation(elementOperations[kind], element, dataset, shapeType))
+        if kind == 'dataset' and coordSystem != '#':
+            plan.append(Operation('defineProjection', element))
+        if kind in ('featureClass', 'table'):
+            for fDef in tableDict[element]:
+                plan.append(Operation('addField', element, dataset, fieldDef=fDef))
+    return plan
+
+class Backend(object):
+    # carries out the operations of a plan; subclasses do the work, in
+    #   apply(batch), which carries out the operations of batch or raises
+
+    name = ''
+    # seconds each kind of operation is expected to take
+    costs = {}
+    # True if a run that fails leaves nothing done
+    transactional = False
+
+    def supports(self, operation):
+        return True
+
+    def batchKey(self, operation):
+        # consecutive operations with the same key, other than None, may
+        #   be carried out in one batch
+        return None
+
+    def estimate(self, batch):
+        # seconds batch is expected to take
+        return sum([self.costs.get(operation.kind, 0.0) for operation in batch])
+
+    def exists(self, operation):
+        # True if operation has been carried out already
+        return False
+
+    def begin(self, resume=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def abort(self):
+        # the run failed
+        pass
+
+    def isTransient(self, error):
+        # True if trying again may succeed
+        return False
+
+class ArcpyBackend(Backend):
+
+    name = 'arcpy'
+    # on a laptop, about
+    costs = {'createDatabase': 3.0,
+             'createDataset': 2.0,
+             'defineProjection': 1.0,
+             'createFeatureClass': 3.0,
+             'createTable': 1.5,
+             'addField': 1.0,
+             'addFields': 1.0,          # an AddFields call, plus
+             'addFieldsField': 0.3,     #   this for each field it adds
+             'createTopology': 2.0,
+             'createRelationship': 2.0}
+    # arcpy error codes that are worth another try: 000464, cannot get
+    #   exclusive schema lock
+    transientErrors = ('ERROR 000464',)
+
+    def __init__(self, outputDir, database, coordSystem='#', arcpyModule=None):
+        # arcpyModule, if given, is used instead of importing arcpy; with
+        #   no arcpy, plans can only be described
+        if arcpyModule is None:
+            try:
+                import arcpy as arcpyModule
+            except ImportError:
+                arcpyModule = None
+        self.arcpy = arcpyModule
+        self.outputDir = outputDir
+        self.database = database
+        self.path = outputDir+'/'+database
+        self.coordSystem = coordSystem
+        self.hasAddFields = arcpyModule is not None and hasattr(arcpyModule, 'AddFields_management')
+
+    def batchKey(self, operation):
+        # NoNulls fields are left to AddField, which can make them NON_NULLABLE
+        if operation.kind == 'addField' and self.hasAddFields and operation.fieldDef[2] != 'NoNulls':
+            return operation.path()
+        return None
+
+    def estimate(self, batch):
+        if batch[0].kind == 'addField' and len(batch) > 1:
+            # one AddFields call
+            return self.costs['addFields'] + len(batch) * self.costs['addFieldsField']
+        return Backend.estimate(self, batch)
+
+    def fieldSpec(self, fDef):
+        # [name, type, precision, scale, length, alias, nullable] for AddField
+        length = '#'
+        if fDef[1] == 'String':
+            length = fDef[3]
+        return [fDef[0], transDict[fDef[1]], '#', '#', length, '#', transDict[fDef[2]]]
+
+    def apply(self, batch):
+        arcpy = self.arcpy
+        operation = batch[0]
+        path = self.path+'/'+operation.path()
+        if operation.kind == 'createDatabase':
+            if self.database[-4:].lower() == '.mdb':
+                arcpy.CreatePersonalGDB_management(self.outputDir, self.database)
+            else:
+                arcpy.CreateFileGDB_management(self.outputDir, self.database)
+            arcpy.RefreshCatalog(self.path)
+            arcpy.env.workspace = self.path
+        elif operation.kind == 'createDataset':
+            arcpy.CreateFeatureDataset_management(self.path, operation.element)
+        elif operation.kind == 'defineProjection':
+            arcpy.DefineProjection_management(path, self.coordSystem)
+        elif operation.kind == 'createFeatureClass':
+            where = self.path
+            if operation.dataset:
+                where = self.path+'/'+operation.dataset
+            arcpy.CreateFeatureclass_management(where, operation.element, operation.shapeType)
+        elif operation.kind == 'createTable':
+            arcpy.CreateTable_management(self.path, operation.element)
+        elif operation.kind == 'addField':
+            if len(batch) > 1:
+                # FIELD_NAME FIELD_TYPE FIELD_ALIAS FIELD_LENGTH; AddFields has no
+                #   nullability, so batches hold only nullable fields
+                arcpy.AddFields_management(path, [[op.fieldDef[0], transDict[op.fieldDef[1]], '#', self.fieldSpec(op.fieldDef)[4]]
+                                                  for op in batch])
+            else:
+                spec = self.fieldSpec(operation.fieldDef)
+                arcpy.AddField_management(path, *spec)
+        elif operation.kind == 'createTopology':
+            arcpy.CreateTopology_management(self.path+'/'+operation.dataset, operation.element)
+        elif operation.kind == 'createRelationship':
+            arcpy.CreateRelationshipClass_management(self.path+'/StationData/StationPoints', self.path+'/StationData/SamplePoints',
+                path, 'SIMPLE', 'Sample', 'Station', 'NONE', 'ONE_TO_MANY', 'NONE', 'StationPoints_ID', 'StationID')
+        else:
+            raise ValueError('unknown operation '+operation.kind)
+
+    def exists(self, operation):
+        arcpy = self.arcpy
+        path = self.path+'/'+operation.path()
+        if operation.kind == 'createDatabase':
+            return arcpy.Exists(self.path)
+        if operation.kind == 'defineProjection':
+            return arcpy.Describe(path).spatialReference.name != 'Unknown'
+        if operation.kind == 'addField':
+            return len(arcpy.ListFields(path, operation.fieldDef[0])) > 0
+        return arcpy.Exists(path)
+
+    def begin(self, resume=False):
+        if resume and self.arcpy.Exists(self.path):
+            self.arcpy.env.workspace = self.path
+
+    def abort(self):
+        self.arcpy.env.workspace = ''
+
+    def isTransient(self, error):
+        # the error's own text only; GetMessages may be left from an earlier tool
+        text = str(error)
+        for pattern in self.transientErrors:
+            if text.find(pattern) >= 0:
+                return True
+        return False
+
+class PlanResult(object):
+
+    def __init__(self, database, backend, plan):
+        self.database = database
+        self.backend = backend
+        self.planned = len(plan)
+        self.done = []              # names of the operations done
+        self.unsupported = []       # names of the operations the backend doesn't support
+        self.failed = None          # [operation name, error text], if the run stopped
+        self.template = None        # key of the template the database was copied from, if it was
+        self.resumed = 0            # operations found done by an earlier run
+        self.retries = 0            # batches tried again
+        self.batches = 0            # batches carried out
+        self.estimatedSeconds = 0.0
+        self.seconds = 0.0
+
+    def complete(self):
+        return self.failed is None and len(self.done) + len(self.unsupported) == self.planned
+
+    def asDict(self):
+        return {'database': self.database,
+                'backend': self.backend,
+                'complete': self.complete(),
+                'planned': self.planned,
+                'done': len(self.done),
+                'unsupported': self.unsupported,
+                'failed': self.failed,
+                'template': self.template,
+                'resumed': self.resumed,
+                'retries': self.retries,
+                'batches': self.batches,
+                'estimatedSeconds': round(self.estimatedSeconds, 3),
+                'seconds': round(self.seconds, 3)}
+
+    def write(self, path):
+        outfl = open(path, 'w')
+        outfl.write(json.dumps(self.asDict(), sort_keys=True, indent=2)+'\n')
+        outfl.close()
+
+    def __str__(self):
+        text = str(len(self.done))+' of '+str(self.planned)+' operations done in '+str(self.batches)+' batches, %.1f sec' % self.seconds
+        if self.resumed:
+            text = text+'; '+str(self.resumed)+' of them by an earlier run'
+        if self.unsupported:
+            text = text+'; '+str(len(self.unsupported))+' not supported by '+self.backend
+        if self.failed:
+            text = text+'; FAILED at '+self.failed[0]+': '+self.failed[1]
+        return text
+
+def planSignature(plan):
+    return hashlib.md5('\n'.join([operation.name() for operation in plan]).encode('utf-8')).hexdigest()
+
+class Journal(object):
+    # names of the operations of a plan that are done, one per line, after
+    #   a line with the signature of the plan
+
+    def __init__(self, path):
+        self.path = path
+        self.started = False
+
+    def read(self, signature):
+        # names of the operations done; raises ValueError if the journal is
+        #   of another plan
+        if not os.path.exists(self.path):
+            return []
+        journalFile = open(self.path)
+        lines = journalFile.read().split('\n')
+        journalFile.close()
+        if lines[0] != '# plan '+signature:
+            raise ValueError(self.path+' is the journal of another plan')
+        self.started = True
+        return [line for line in lines[1:] if line]
+
+    def record(self, names, signature):
+        # add names, starting a new journal if this run hasn't read or
+        #   written one; they are on disk when this returns
+        if self.started:
+            journalFile = open(self.path, 'a')
+        else:
+            journalFile = open(self.path, 'w')
+            journalFile.write('# plan '+signature+'\n')
+            self.started = True
+        for name in names:
+            journalFile.write(name+'\n')
+        journalFile.flush()
+        os.fsync(journalFile.fileno())
+        journalFile.close()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def planBatches(plan, backend):
+    # the operations of plan, grouped as backend can carry them out
+    batches = []
+    lastKey = None
+    for operation in plan:
+        key = backend.batchKey(operation)
+        if key is not None and key == lastKey:
+            batches[-1].append(operation)
+        else:
+            batches.append([operation])
+        lastKey = key
+    return batches
+
+def writeReadme(path):
+    # 00readme.txt in file geodatabase path, naming what created it
+    readme = open(os.path.join(path, '00readme.txt'), 'w')
+    try:
+        readme.write('Geodatabase created by '+creatorVersion+'\n')
+    finally:
+        readme.close()
+
+def describePlan(plan, backend):
+    # lines describing the batches of plan and their estimated seconds
+    lines = []
+    total = 0.0
+    batches = planBatches(plan, backend)
+    for i in range(len(batches)):
+        batch = batches[i]
+        seconds = 0.0
+        if backend.supports(batch[0]):
+            seconds = backend.estimate(batch)
+        total = total + seconds
+        text = batch[0].name()
+        if len(batch) > 1:
+            text = text+' and '+str(len(batch) - 1)+' more'
+        if not backend.supports(batch[0]):
+            text = text+' (not supported by '+backend.name+')'
+        lines.append('    %4d  %7.2f sec  %s' % (i + 1, seconds, text))
+    lines.append('  '+str(len(plan))+' operations in '+str(len(batches))+' batches, about %.1f sec' % total)
+    return lines
+
+class PlanRunner(object):
+
+    def __init__(self, backend, progress=None, messageFunc=None, retries=3, retryDelay=1.0):
+        self.backend = backend
+        if progress is None:
+            progress = Progress()
+        self.progress = progress
+        self.messageFunc = messageFunc
+        self.retries = retries
+        self.retryDelay = retryDelay
+
+    def message(self, text):
+        if self.messageFunc is not None:
+            self.messageFunc(text)
+
+    def run(self, plan, database='', journal=None, resume=False):
+        # carry out plan, writing what is done to journal, if given; if
+        #   resume, skip what an earlier run did
+        backend = self.backend
+        result = PlanResult(database, backend.name, plan)
+        startTime = time.time()
+        batches = planBatches(plan, backend)
+        result.estimatedSeconds = sum([backend.estimate(batch) for batch in batches if backend.supports(batch[0])])
+        if backend.transactional:
+            journal = None
+        signature = planSignature(plan)
+        self.progress.phase('create', len(plan), 'operations')
+        done = []
+        try:
+            if resume and journal is not None:
+                done = set(journal.read(signature))
+            backend.begin(resume)
+        except Exception, e:
+            result.failed = ['begin', str(e).strip()]
+            batches = []
+        # still looking for the first operation not done
+        probing = resume
+        for batch in batches:
+            operation = batch[0]
+            self.progress.table(operation.path())
+            if not backend.supports(operation):
+                result.unsupported.extend([op.name() for op in batch])
+                self.progress.rows(len(batch))
+                continue
+            if resume:
+                remaining = []
+                found = []
+                for op in batch:
+                    if op.name() in done:
+                        pass
+                    elif probing and self.exists(op):
+                        found.append(op.name())
+                    else:
+                        probing = False
+                        remaining.append(op)
+                        continue
+                    result.done.append(op.name())
+                    result.resumed = result.resumed + 1
+                if journal is not None and found:
+                    journal.record(found, signature)
+                self.progress.rows(len(batch) - len(remaining))
+                batch = remaining
+                if not batch:
+                    continue
+            if not self.applyBatch(batch, result):
+                break
+            if journal is not None:
+                journal.record([op.name() for op in batch], signature)
+            self.progress.rows(len(batch))
+        if result.failed is None:
+            try:
+                backend.commit()
+            except Exception, e:
+                result.failed = ['commit', str(e).strip()]
+        if result.failed is not None:
+            backend.abort()
+            self.message('Failed at '+result.failed[0]+': '+result.failed[1])
+        elif journal is not None and result.complete():
+            journal.remove()
+        result.seconds = time.time() - startTime
+        self.progress.done()
+        return result
+
+    def exists(self, operation):
+        try:
+            return self.backend.exists(operation)
+        except Exception:
+            return False
+
+    def partlyDone(self, batch):
+        # True if some of the operations of a failed batch were carried out;
+        #   tried again, they would fail as already done and hide the error
+        if len(batch) < 2:
+            return False
+        for operation in batch:
+            if self.exists(operation):
+                return True
+        return False
+
+    def applyBatch(self, batch, result):
+        # True if batch was carried out, perhaps after retries
+        delay = self.retryDelay
+        attempt = 0
+        while True:
+            try:
+                self.backend.apply(batch)
+                result.batches = result.batches + 1
+                result.done.extend([operation.name() for operation in batch])
+                return True
+            except Exception, e:
+                if attempt < self.retries and self.backend.isTransient(e) and not self.partlyDone(batch):
+                    attempt = attempt + 1
+                    result.retries = result.retries + 1
+                    self.message('  '+batch[0].name()+' failed ('+str(e).strip()+'), trying again in %.1f sec' % delay)
+                    time.sleep(delay)
+                    delay = delay * 2
+                else:
+                    result.failed = [batch[0].name(), str(e).strip()]
+                    return False
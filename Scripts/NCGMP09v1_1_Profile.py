@@ -0,0 +1,206 @@
+# NCGMP09v1_1_Profile.py
+#   Timing of the phases of NCGMP09v1_1_Validation.py, to find which
+#   tables and checks take the time on big geodatabases
+#
+#   A Profiler times phases (inventory, required elements, field checks,
+#   content checks, report writing) and, within a phase, steps (each
+#   check of checkContent), recording for each its wall-clock and CPU
+#   seconds, the resident memory of the process when it ended, and how
+#   much that changed while it ran. The process's peak memory is a
+#   high-water mark over the whole run, so it is reported once, not per
+#   phase. Phases are timed with
+#
+#       with profiler.phase('inventory'):
+#           ...
+#
+#   and profiler.step(name) ends the current step of the phase, if there
+#   is one, and starts the next. addTable() records the scan of one table:
+#   rows, seconds and rows per second. Tables are scanned in worker
+#   processes if --jobs is more than 1, so their seconds add up to more
+#   than the inventory phase, and their memory is the workers' peak.
+#
+#   Phases and steps named in cProfilePhases (or every phase and step, if
+#   that holds 'all') are also run under cProfile, and their statistics
+#   written to <statsPrefix><name>.pstats, for pstats or a viewer such as
+#   SnakeViz. Only one runs under cProfile at a time, so a step of a
+#   phase that is being profiled is part of the phase's statistics.
+#
+#   write() saves everything as JSON:
+#     {"database": ..., "seconds": ..., "processPeakMemoryKB": ..., "workerPeakMemoryKB": ...,
+#      "phases": [{"name", "phase", "seconds", "cpuSeconds", "memoryKB", "memoryChangeKB"}, ...],
+#      "tables": [{"table", "dataset", "nrows", "seconds", "rowsPerSecond", "scanned"}, ...],
+#      "profiles": [<.pstats file>, ...]}
+#   "phase" is the name of the enclosing phase of a step, None for a phase.
+#   Memory is None where it can't be found.
+
+import os, sys, time, json
+from contextlib import contextmanager
+
+def peakMemory(children=False):
+    # peak resident memory in KB of this process, or of its finished worker
+    #   processes if children is True, over their lifetime; None where it
+    #   can't be found
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        return _windowsMemory('PeakWorkingSetSize')
+    if children:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+    if sys.platform == 'darwin':
+        # bytes, not KB
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+def currentMemory():
+    # resident memory in KB of this process now; None where it can't be found
+    if sys.platform == 'win32':
+        return _windowsMemory('WorkingSetSize')
+    try:
+        statm = open('/proc/self/statm')
+        try:
+            pages = int(statm.read().split()[1])
+        finally:
+            statm.close()
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except:
+        return None
+
+def _windowsMemory(counter):
+    # counter of GetProcessMemoryInfo, in KB
+    try:
+        import ctypes
+        from ctypes import wintypes
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD),
+                        ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return getattr(counters, counter) // 1024
+    except:
+        pass
+    return None
+
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+class _Timer(object):
+    # a phase or step that has started and not yet ended
+
+    def __init__(self, name, phase):
+        self.name = name
+        self.phase = phase          # enclosing phase of a step; None for a phase
+        self.startTime = time.time()
+        self.startCpu = cpuTime()
+        self.startMemory = currentMemory()
+        self.profile = None         # cProfile.Profile, if this one is profiled
+
+class Profiler(object):
+
+    def __init__(self, database=None, cProfilePhases=None, statsPrefix=''):
+        self.database = database
+        self.cProfilePhases = cProfilePhases or []
+        self.statsPrefix = statsPrefix
+        self.startTime = time.time()
+        self.phases = []            # one record for each phase and step, in the order they ended
+        self.tables = []            # one record for each table and feature class
+        self.statsFiles = []        # .pstats files written
+        self.open = []              # _Timers of the current phase and step
+        self.profiling = False
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name, None)
+        try:
+            yield self
+        finally:
+            if self.open and self.open[-1].phase is not None:
+                self.end()
+            self.end()
+
+    def step(self, name):
+        # end the current step, if any, and start step name of the current phase
+        if self.open and self.open[-1].phase is not None:
+            self.end()
+        if self.open:
+            self.begin(name, self.open[-1].name)
+        else:
+            self.begin(name, None)
+
+    def begin(self, name, phase):
+        timer = _Timer(name, phase)
+        if not self.profiling and (name in self.cProfilePhases or 'all' in self.cProfilePhases):
+            import cProfile
+            timer.profile = cProfile.Profile()
+            self.profiling = True
+            timer.profile.enable()
+        self.open.append(timer)
+
+    def end(self):
+        timer = self.open.pop()
+        if timer.profile is not None:
+            timer.profile.disable()
+            self.profiling = False
+            statsFile = self.statsPrefix+timer.name+'.pstats'
+            timer.profile.dump_stats(statsFile)
+            self.statsFiles.append(statsFile)
+        memory = currentMemory()
+        memoryChange = None
+        if memory is not None and timer.startMemory is not None:
+            memoryChange = memory - timer.startMemory
+        self.phases.append({'name': timer.name,
+                            'phase': timer.phase,
+                            'seconds': time.time() - timer.startTime,
+                            'cpuSeconds': cpuTime() - timer.startCpu,
+                            'memoryKB': memory,
+                            'memoryChangeKB': memoryChange})
+
+    def addTable(self, table, dataset, nrows, seconds, scanned=True):
+        # scanned is False for a table whose inventory was taken from the cache
+        rowsPerSecond = None
+        if seconds > 0:
+            rowsPerSecond = nrows / seconds
+        self.tables.append({'table': table,
+                            'dataset': dataset,
+                            'nrows': nrows,
+                            'seconds': seconds,
+                            'rowsPerSecond': rowsPerSecond,
+                            'scanned': scanned})
+
+    def timings(self):
+        return {'database': self.database,
+                'seconds': time.time() - self.startTime,
+                'processPeakMemoryKB': peakMemory(),
+                'workerPeakMemoryKB': peakMemory(True),
+                'phases': self.phases,
+                'tables': self.tables,
+                'profiles': self.statsFiles}
+
+    def slowest(self, n=5):
+        # the n tables that took longest to scan, slowest first
+        tables = [[table['seconds'], table['table']] for table in self.tables if table['scanned']]
+        tables.sort()
+        tables.reverse()
+        return tables[0:n]
+
+    def write(self, path):
+        outfl = open(path, 'w')
+        try:
+            json.dump(self.timings(), outfl, indent=1, sort_keys=True)
+            outfl.write('\n')
+        finally:
+            outfl.close()
@@ -0,0 +1,219 @@
+# NCGMP09v1_1_Progress.py
+#   Progress of long runs of NCGMP09v1_1_Validation.py and
+#   NCGMP09v1_1-CreateDatabase-Arc10.0.py, for a progress bar, a log or
+#   a toolbox dialog
+#
+#   A run tells its Progress where it is: phase(name) when a phase starts,
+#   expect(n) when it learns how many rows the phase will read, step(name)
+#   when a check of the phase starts, table(name) when it starts on a
+#   table, rows(n) when n more rows are done, and done() at the end. The
+#   Progress sends a ProgressEvent to each of its listeners, functions of
+#   one argument:
+#
+#       def show(event):
+#           print(str(event))
+#       session = ValidationSession(progress=Progress([show]))
+#
+#   or, as an iterator, events() runs a function in a thread and yields
+#   the events it sends as they come:
+#
+#       progress = Progress()
+#       session = ValidationSession(progress=progress)
+#       for event in progress.events(session.validate, gdb):
+#           print(str(event))
+#       result = progress.result
+#
+#   rows() is called once for each batch of rows read, so it must be
+#   cheap: with no listeners it only adds to a count, and 'rows' events
+#   are sent at most once every interval seconds. 'phase', 'step' and
+#   'table' events are always sent. With worker processes (--jobs), the
+#   rows of a table are counted, and its 'table' event sent, when the
+#   worker has read it.
+#
+#   A ProgressEvent has
+#     kind           'phase', 'step', 'table', 'rows' or 'done'
+#     phase          name of the current phase; None for 'done', whose
+#                    rows and seconds are those of the whole run
+#     step           name of the current step of the phase, or None
+#     table          name of the current table, or None
+#     rowsDone       rows done so far in the phase
+#     rowsTotal      rows the phase will do, or None if not known
+#     unit           what is counted: 'rows', or 'elements' when creating
+#     seconds        seconds since the phase started
+#     rowsPerSecond  throughput of the phase, or None
+#     eta            seconds the phase has still to run, or None if not known
+
+import sys, time, threading, Queue
+
+class ProgressEvent(object):
+
+    def __init__(self, kind, phase, step, table, rowsDone, rowsTotal, unit, seconds):
+        self.kind = kind
+        self.phase = phase
+        self.step = step
+        self.table = table
+        self.rowsDone = rowsDone
+        self.rowsTotal = rowsTotal
+        self.unit = unit
+        self.seconds = seconds
+        self.rowsPerSecond = None
+        self.eta = None
+        if seconds > 0 and rowsDone > 0:
+            self.rowsPerSecond = rowsDone / seconds
+            if rowsTotal is not None:
+                self.eta = max(rowsTotal - rowsDone, 0) / self.rowsPerSecond
+
+    def fraction(self):
+        # fraction of the phase done, or None if not known
+        if not self.rowsTotal:
+            return None
+        return min(1.0, self.rowsDone / float(self.rowsTotal))
+
+    def __str__(self):
+        where = self.phase or 'all'
+        if self.step:
+            where = where+', '+self.step
+        if self.table:
+            where = where+', '+self.table
+        text = where+': '+str(self.rowsDone)
+        if self.rowsTotal is not None:
+            text = text+' of '+str(self.rowsTotal)
+        text = text+' '+self.unit
+        if self.fraction() is not None:
+            text = text+' (%.0f%%)' % (100 * self.fraction())
+        if self.rowsPerSecond is not None:
+            text = text+', %.1f %s/sec' % (self.rowsPerSecond, self.unit)
+        if self.eta is not None:
+            text = text+', about %.0f sec left' % self.eta
+        if self.kind == 'done':
+            text = text+', done in %.1f sec' % self.seconds
+        return text
+
+class Progress(object):
+
+    def __init__(self, listeners=None, interval=0.5):
+        self.listeners = list(listeners or [])
+        self.interval = interval    # least seconds between 'rows' events
+        self.result = None          # return value of the function run by events()
+        self.runStart = None        # when the first phase since the last done() started
+        self.runRows = 0            # rows done in the earlier phases of the run
+        self.rowsDone = 0
+        self.reset(None)
+
+    def reset(self, phase, unit='rows'):
+        self.runRows = self.runRows + self.rowsDone
+        self.phaseName = phase
+        self.stepName = None
+        self.tableName = None
+        self.unit = unit
+        self.rowsDone = 0
+        self.rowsTotal = None
+        self.startTime = time.time()
+        self.lastSent = self.startTime
+
+    def listen(self, listener):
+        self.listeners.append(listener)
+
+    def unlisten(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def listening(self):
+        # True if anyone is listening, so it is worth counting rows ahead
+        return len(self.listeners) > 0
+
+    def event(self, kind, now=None):
+        if now is None:
+            now = time.time()
+        return ProgressEvent(kind, self.phaseName, self.stepName, self.tableName,
+                             self.rowsDone, self.rowsTotal, self.unit, now - self.startTime)
+
+    def send(self, kind, now=None):
+        if not self.listeners:
+            return
+        event = self.event(kind, now)
+        self.lastSent = time.time()
+        for listener in list(self.listeners):
+            listener(event)
+
+    def phase(self, name, rowsTotal=None, unit='rows'):
+        self.reset(name, unit)
+        if self.runStart is None:
+            self.runStart = self.startTime
+        self.rowsTotal = rowsTotal
+        self.send('phase')
+
+    def expect(self, rowsTotal):
+        # the current phase will do rowsTotal more rows
+        self.rowsTotal = (self.rowsTotal or 0) + rowsTotal
+
+    def step(self, name):
+        self.stepName = name
+        self.tableName = None
+        self.send('step')
+
+    def table(self, name):
+        self.tableName = name
+        self.send('table')
+
+    def rows(self, n):
+        self.rowsDone = self.rowsDone + n
+        if self.listeners:
+            now = time.time()
+            if now - self.lastSent >= self.interval:
+                self.send('rows', now)
+
+    def done(self):
+        # end of the run: the event has the rows and seconds of all its phases
+        unit = self.unit
+        self.reset(None, unit)
+        if self.runStart is not None:
+            self.startTime = self.runStart
+        self.rowsDone = self.runRows
+        self.send('done')
+        self.runStart = None
+        self.runRows = 0
+        self.rowsDone = 0
+
+    def events(self, func, *args, **kwargs):
+        # run func(*args, **kwargs) in a thread and yield the events it sends;
+        #   afterwards self.result is what func returned, and an exception
+        #   func raised is raised here
+        events = Queue.Queue()
+        listener = events.put
+        self.listen(listener)
+        outcome = []
+        finished = object()
+        def run():
+            try:
+                outcome.append([func(*args, **kwargs), None])
+            except:
+                outcome.append([None, sys.exc_info()[1]])
+            events.put(finished)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                try:
+                    # with a timeout, so Ctrl-C is seen while waiting
+                    event = events.get(True, 0.5)
+                except Queue.Empty:
+                    continue
+                if event is finished:
+                    break
+                yield event
+        finally:
+            self.unlisten(listener)
+        thread.join()
+        self.result, error = outcome[0]
+        if error is not None:
+            raise error
+
+def messageListener(messageFunc, kinds=None, indent='    '):
+    # listener that writes events as messages, e.g. with addMsgAndPrint;
+    #   only events of kinds, if given
+    def listener(event):
+        if kinds is None or event.kind in kinds:
+            messageFunc(indent+str(event))
+    return listener
@@ -0,0 +1,381 @@
+# NCGMP09v1_1_RefIndex.py
+#   Hash-indexed referential-integrity checks used by
+#   NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#
+#   The validator collects references (MapUnit, DataSources, Glossary,
+#   _ID values) as lists of [value, field, table] or [value, table].
+#   Checking each reference against another list is quadratic; here each
+#   collection is indexed once (dictionary or set) and every check is a
+#   single pass over the references, so run time grows linearly with the
+#   number of rows.
+#
+#   Report lines are built exactly as the original sort-and-compare code
+#   built them, so conformance reports do not change.
+#
+#   ReferenceColumns holds a collection of references compactly: each
+#   distinct value and each distinct citation (field and table names) is
+#   stored once, and each reference is a pair of integer codes in typed
+#   arrays, about 8 bytes instead of a list of 3 objects. ReferenceIndex
+#   and findDuplicateIDs work directly on the codes.
+#
+#   Given maxBytes, ReferenceColumns spills to disk whenever its estimated
+#   size passes maxBytes: each distinct value is written, in sorted order,
+#   with its number of references and the number of references from each
+#   citation, to a temporary file, and the columns start again empty. The
+#   checks then merge the sorted runs (an external merge sort), comparing
+#   values in Python as the in-memory checks do, so the results are the
+#   same.
+#
+#   Does not import arcpy.
+
+import sys, tempfile, heapq, marshal
+from array import array
+
+# estimated bytes of the dictionary entry and list slot of a distinct value
+#   (plus the value itself), and of one reference
+valueBytes = 100
+referenceBytes = 8
+# (value, count, citation counts) records read or written at a time
+blockSize = 1000
+
+def asText(value):
+    # same text the validator gets from '    '+value, but tolerates None and numbers
+    return '%s' % (value,)
+
+class ReferenceColumns(object):
+    # references [value, ...citation...], dictionary-encoded
+
+    def __init__(self, maxBytes=None):
+        self.maxBytes = maxBytes        # spill to disk above this estimated size; None never spills
+        self.nBytes = 0
+        self.runs = []                  # temporary files of sorted (value, count, citation counts)
+        self.valueCodes = {}            # value -> code
+        self.values = []                # code -> value, in order of first appearance
+        self.citationCodes = {}         # citation tuple -> code
+        self.citations = []             # code -> citation tuple
+        self.refValues = array('i')     # value code of each reference
+        self.refCitations = array('i')  # citation code of each reference
+
+    def __iter__(self):
+        # [value, ...citation...] for each reference, in order added; once
+        #   spilled, in order of value
+        if self.runs:
+            for value, count, citationCounts in self.aggregates():
+                citations = list(citationCounts.keys())
+                citations.sort()
+                for citation in citations:
+                    for n in range(citationCounts[citation]):
+                        yield [value] + list(citation)
+            return
+        values = self.values
+        citations = self.citations
+        for i in range(len(self.refValues)):
+            yield [values[self.refValues[i]]] + list(citations[self.refCitations[i]])
+
+    def valueCode(self, value):
+        codes = self.valueCodes
+        if value in codes:
+            return codes[value]
+        code = len(self.values)
+        codes[value] = code
+        self.values.append(value)
+        self.nBytes = self.nBytes + valueBytes + sys.getsizeof(value)
+        return code
+
+    def citationCode(self, citation):
+        if citation in self.citationCodes:
+            return self.citationCodes[citation]
+        code = len(self.citations)
+        self.citationCodes[citation] = code
+        self.citations.append(citation)
+        return code
+
+    def append(self, value, *citation):
+        self.refValues.append(self.valueCode(value))
+        self.refCitations.append(self.citationCode(citation))
+        self.nBytes = self.nBytes + referenceBytes
+        if self.maxBytes and self.nBytes > self.maxBytes:
+            self.spill()
+
+    def extend(self, values, *citation):
+        # references to each of values, all with the same citation
+        valueCode = self.valueCode
+        first = 0
+        while first < len(values):
+            # a block at a time, so that a big table can spill part way
+            block = values[first:first + blockSize * 100]
+            self.refValues.extend(array('i', [valueCode(value) for value in block]))
+            self.refCitations.extend(array('i', [self.citationCode(citation)]) * len(block))
+            self.nBytes = self.nBytes + referenceBytes * len(block)
+            if self.maxBytes and self.nBytes > self.maxBytes:
+                self.spill()
+            first = first + len(block)
+
+    def spilled(self):
+        return len(self.runs) > 0
+
+    def spill(self):
+        # write the distinct values in memory, sorted, with their counts, and start again
+        counts = {}
+        nCitations = len(self.citations)
+        for i in range(len(self.refValues)):
+            key = self.refValues[i] * nCitations + self.refCitations[i]
+            counts[key] = counts.get(key, 0) + 1
+        citationCounts = [None] * len(self.values)
+        for key in counts:
+            code = key // nCitations
+            if citationCounts[code] is None:
+                citationCounts[code] = {}
+            citationCounts[code][self.citations[key % nCitations]] = counts[key]
+        counts = None
+        order = list(range(len(self.values)))
+        order.sort(key=self.values.__getitem__)
+        run = tempfile.TemporaryFile()
+        for i in range(0, len(order), blockSize):
+            block = []
+            for code in order[i:i + blockSize]:
+                block.append((self.values[code], sum(citationCounts[code].values()), list(citationCounts[code].items())))
+            marshal.dump(block, run)
+        run.seek(0)
+        self.runs.append(run)
+        self.valueCodes = {}
+        self.values = []
+        self.refValues = array('i')
+        self.refCitations = array('i')
+        self.nBytes = 0
+
+    def readRun(self, run, index):
+        # (value, run index, count, citation counts) of a run, in value order;
+        #   the run index keeps equal values from different runs in the order
+        #   they were first seen
+        run.seek(0)
+        while True:
+            try:
+                block = marshal.load(run)
+            except EOFError:
+                break
+            for value, count, items in block:
+                yield value, index, count, items
+
+    def aggregates(self):
+        # (value, number of references, {citation: number of references})
+        #   for each distinct value, in sorted order
+        if not self.runs:
+            citationCounts = {}
+            for i in range(len(self.refValues)):
+                code = self.refValues[i]
+                citation = self.citations[self.refCitations[i]]
+                if code in citationCounts:
+                    counts = citationCounts[code]
+                    counts[citation] = counts.get(citation, 0) + 1
+                else:
+                    citationCounts[code] = {citation: 1}
+            order = list(range(len(self.values)))
+            order.sort(key=self.values.__getitem__)
+            for code in order:
+                yield self.values[code], sum(citationCounts[code].values()), citationCounts[code]
+            return
+        # the columns still in memory are the last run
+        streams = [self.readRun(self.runs[i], i) for i in range(len(self.runs))]
+        current = []
+        for value, count, counts in self._inMemory().aggregates():
+            current.append((value, len(self.runs), count, list(counts.items())))
+        streams.append(iter(current))
+        value = None
+        total = 0
+        citationCounts = None
+        for nextValue, index, count, items in heapq.merge(*streams):
+            if citationCounts is not None and nextValue == value:
+                total = total + count
+            else:
+                if citationCounts is not None:
+                    yield value, total, citationCounts
+                value = nextValue
+                total = count
+                citationCounts = {}
+            for citation, n in items:
+                citationCounts[citation] = citationCounts.get(citation, 0) + n
+        if citationCounts is not None:
+            yield value, total, citationCounts
+
+    def _inMemory(self):
+        # the unspilled columns, as ReferenceColumns without runs
+        columns = ReferenceColumns()
+        columns.values = self.values
+        columns.citations = self.citations
+        columns.refValues = self.refValues
+        columns.refCitations = self.refCitations
+        return columns
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+    def distinctValues(self):
+        if self.runs:
+            return (value for value, count, citationCounts in self.aggregates())
+        return self.values
+
+    def firstCitations(self):
+        # value -> the citation that sorts lowest among its references
+        order = list(range(len(self.citations)))
+        order.sort(key=lambda code: self.citations[code])
+        rank = array('i', [0]) * len(self.citations)
+        for i in range(len(order)):
+            rank[order[i]] = i
+        best = array('i', [len(order)]) * len(self.values)
+        refValues = self.refValues
+        refCitations = self.refCitations
+        for i in range(len(refValues)):
+            r = rank[refCitations[i]]
+            if r < best[refValues[i]]:
+                best[refValues[i]] = r
+        firsts = {}
+        for code in range(len(self.values)):
+            firsts[self.values[code]] = self.citations[order[best[code]]]
+        return firsts
+
+    def duplicates(self):
+        # (value, table1, table2) as findDuplicateIDs, for references [value, table]
+        if self.runs:
+            duplicates = []
+            for value, count, citationCounts in self.aggregates():
+                if count > 1:
+                    tables = []
+                    for citation in citationCounts:
+                        tables.extend([citation[0]] * citationCounts[citation])
+                    tables.sort()
+                    for n in range(1, len(tables)):
+                        duplicates.append((value, tables[n - 1], tables[n]))
+            return duplicates
+        counts = array('i', [0]) * len(self.values)
+        refValues = self.refValues
+        for code in refValues:
+            counts[code] = counts[code] + 1
+        tablesByCode = {}
+        for i in range(len(refValues)):
+            code = refValues[i]
+            if counts[code] > 1:
+                if code in tablesByCode:
+                    tablesByCode[code].append(self.citations[self.refCitations[i]][0])
+                else:
+                    tablesByCode[code] = [self.citations[self.refCitations[i]][0]]
+        duplicated = [[self.values[code], code] for code in tablesByCode]
+        duplicated.sort()
+        duplicates = []
+        for value, code in duplicated:
+            tables = tablesByCode[code]
+            tables.sort()
+            for n in range(1, len(tables)):
+                duplicates.append((value, tables[n - 1], tables[n]))
+        return duplicates
+
+class ReferenceIndex(object):
+    # Index of references: value -> first citation
+    #   refs is an iterable of [value, ...citation...] lists, e.g.
+    #   [value, field, table] or [value, table]. The "first" citation of a
+    #   value is the one that sorts lowest, which is the one the old code
+    #   reported after sorting the whole reference list.
+
+    def __init__(self, refs, ignore=(None, '')):
+        self.citations = {}
+        self.ignore = ignore
+        self.columns = None     # spilled ReferenceColumns, read in sorted order as needed
+        if isinstance(refs, ReferenceColumns):
+            if refs.spilled():
+                self.columns = refs
+            else:
+                self.citations = refs.firstCitations()
+            return
+        citations = self.citations
+        for ref in refs:
+            value = ref[0]
+            citation = tuple(ref[1:])
+            if value in citations:
+                if citation < citations[value]:
+                    citations[value] = citation
+            else:
+                citations[value] = citation
+
+    def values(self):
+        # distinct referenced values in sorted order, excluding ignored values
+        vals = []
+        if self.columns is not None:
+            for value in self.columns.distinctValues():
+                if value not in self.ignore:
+                    vals.append(value)
+            return vals
+        for value in self.citations:
+            if value not in self.ignore:
+                vals.append(value)
+        vals.sort()
+        return vals
+
+    def missingFrom(self, targets):
+        # [value, citation...] for each distinct referenced value absent from targets
+        #   targets is a set (or anything supporting 'in' in constant time)
+        missing = []
+        if self.columns is not None:
+            for value, count, citationCounts in self.columns.aggregates():
+                if value not in self.ignore and value not in targets:
+                    missing.append([value] + list(min(citationCounts.keys())))
+            return missing
+        for value in self.values():
+            if value not in targets:
+                missing.append([value] + list(self.citations[value]))
+        return missing
+
+    def unreferenced(self, values, convert=None):
+        # values (in their original order, duplicates kept) that are never referenced
+        unused = []
+        if self.columns is not None:
+            # which of the (converted) values are referenced, in one pass
+            wanted = set()
+            for value in values:
+                if convert:
+                    value = convert(value)
+                wanted.add(value)
+            found = set()
+            for value in self.columns.distinctValues():
+                if value in wanted:
+                    found.add(value)
+            for value in values:
+                key = value
+                if convert:
+                    key = convert(value)
+                if key not in found:
+                    unused.append(value)
+            return unused
+        for value in values:
+            key = value
+            if convert:
+                key = convert(value)
+            if key not in self.citations:
+                unused.append(value)
+        return unused
+
+def findDuplicateIDs(idRefs):
+    # idRefs is an iterable of [value, table]. Returns (value, table1, table2)
+    #   for each pair of neighbours in the sorted list that share a value
+    if isinstance(idRefs, ReferenceColumns):
+        return idRefs.duplicates()
+    tablesById = {}
+    duplicated = []
+    for ref in idRefs:
+        value = ref[0]
+        if value in tablesById:
+            tables = tablesById[value]
+            if len(tables) == 1:
+                duplicated.append(value)
+            tables.append(ref[1])
+        else:
+            tablesById[value] = [ref[1]]
+    duplicated.sort()
+    duplicates = []
+    for value in duplicated:
+        tables = tablesById[value]
+        tables.sort()
+        for n in range(1, len(tables)):
+            duplicates.append((value, tables[n - 1], tables[n]))
+    return duplicates
@@ -0,0 +1,148 @@
+# NCGMP09v1_1_Report.py
+#   Sections of the CONTENT ERRORS part of the conformance report written
+#   by NCGMP09v1_1_Validation.py
+#
+#   A ReportSection counts repeated lines as they are added, instead of
+#   keeping every line until the report is written. At most maxLines
+#   distinct lines are held in memory; beyond that they are sorted and
+#   spilled to a temporary file, and the spilled runs are merged when the
+#   section is written. finish() renders a complete section to its own
+#   temporary file and lets go of the lines, so a section's memory is
+#   given back as soon as the check that fills it is done. Either way the
+#   text is the same: the heading, then the distinct lines in sorted
+#   order, each repeated line once with its count. Lines are sorted as
+#   text unless the section is given a key, such as oidOrder, which sorts
+#   lines that name an OBJECTID on the number.
+
+import re, tempfile, heapq, marshal, shutil
+
+# distinct lines of one section held in memory before spilling to disk
+maxLines = 100000
+# (line, count) pairs read or written at a time
+blockSize = 1000
+
+oidPattern = re.compile(r'OBJECTID=(\d+)')
+
+def oidOrder(line):
+    # sorts 'Table T, OBJECTID=10, ...' after 'Table T, OBJECTID=9, ...'
+    match = oidPattern.search(line)
+    if match is None:
+        return (line, -1, '')
+    return (line[:match.start()], int(match.group(1)), line[match.end():])
+
+class ReportSection(object):
+
+    def __init__(self, heading, noErrorString, maxLines=None, key=None):
+        self.heading = heading
+        self.noErrorString = noErrorString
+        self.maxLines = maxLines or globals()['maxLines']
+        self.key = key           # function of a line that lines are sorted on, None for the text
+        self.nLines = 0          # lines added, repeats included
+        self.counts = {}         # line -> number of times added, since the last spill
+        self.runs = []           # temporary files of sorted (order, count), see order()
+        self.rendered = None     # temporary file with the text of the finished section
+
+    def add(self, line):
+        self.nLines = self.nLines + 1
+        counts = self.counts
+        if line in counts:
+            counts[line] = counts[line] + 1
+        else:
+            counts[line] = 1
+            if len(counts) > self.maxLines:
+                self.spill()
+
+    def order(self, line):
+        # what line is sorted on; it holds the line, so equal orders are equal lines
+        if self.key is None:
+            return line
+        return (self.key(line), line)
+
+    def sortedItems(self):
+        # (order, count) of the lines in memory, sorted
+        items = [(self.order(line), self.counts[line]) for line in self.counts]
+        items.sort()
+        return items
+
+    def spill(self):
+        run = tempfile.TemporaryFile()
+        items = self.sortedItems()
+        # in blocks, to keep marshal calls few
+        for i in range(0, len(items), blockSize):
+            marshal.dump(items[i:i+blockSize], run)
+        run.seek(0)
+        self.runs.append(run)
+        self.counts = {}
+
+    def readRun(self, run):
+        run.seek(0)
+        while True:
+            try:
+                block = marshal.load(run)
+            except EOFError:
+                break
+            for item in block:
+                yield item
+
+    def sortedCounts(self):
+        # (line, count) for each distinct line, in sorted order
+        inMemory = self.sortedItems()
+        if self.key is None:
+            text = lambda order: order
+        else:
+            text = lambda order: order[1]
+        if not self.runs:
+            for order, n in inMemory:
+                yield text(order), n
+            return
+        lastOrder = None
+        total = 0
+        for order, n in heapq.merge(inMemory, *[self.readRun(run) for run in self.runs]):
+            if total and order == lastOrder:
+                total = total + n
+            else:
+                if total:
+                    yield text(lastOrder), total
+                lastOrder = order
+                total = n
+        if total:
+            yield text(lastOrder), total
+
+    def render(self, outfl):
+        if self.nLines == 0:
+            outfl.write('  '+self.noErrorString+'\n\n')
+        else:
+            outfl.write(self.heading+'\n')
+            for line, n in self.sortedCounts():
+                outfl.write(line)
+                if n > 1:
+                    outfl.write('--'+str(n+1)+' duplicates\n')
+                else:
+                    outfl.write('\n')
+            outfl.write('\n')
+
+    def finish(self):
+        # no more lines will be added: render now and free the lines
+        if self.rendered is None:
+            self.rendered = tempfile.TemporaryFile('w+')
+            self.render(self.rendered)
+            self.counts = {}
+            self.closeRuns()
+
+    def write(self, outfl):
+        if self.rendered is None:
+            self.render(outfl)
+        else:
+            self.rendered.seek(0)
+            shutil.copyfileobj(self.rendered, outfl)
+
+    def closeRuns(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+    def close(self):
+        self.closeRuns()
+        if self.rendered is not None:
+            self.rendered.close()
+            self.rendered = None
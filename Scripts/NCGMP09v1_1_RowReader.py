@@ -0,0 +1,261 @@
+# NCGMP09v1_1_RowReader.py
+#   Projected, batched row readers for NCGMP09v1_1-ValidateDatabase-Arc10.0.py
+#
+#   A reader is asked for a list of columns and returns the rows of a table
+#   as batches of plain tuples (readBatches) or as column lists
+#   (readColumns). Only the requested columns are read and each value is
+#   read once. Readers never add columns of their own, so geometry is only
+#   fetched if a caller asks for the SHAPE field.
+#
+#   ArcpyReader reads geodatabases. It uses arcpy.da.SearchCursor when it
+#   is available (ArcGIS 10.1 and later) and a projected arcpy.SearchCursor
+#   otherwise. SqliteReader does not need arcpy; it stands in for a
+#   geodatabase when benchmarking on machines without ArcGIS.
+#
+#   Any read can be limited to an OBJECTID range, oidRange = (first, last+1),
+#   so that one large table can be read in pieces by several processes.
+#   oidRange may also be a list of such ranges, in OBJECTID order, which are
+#   read with one cursor. reader.oidRange(table) gives the smallest and
+#   largest OBJECTID.
+#
+#   reader.spec() returns (class, arguments) from which an equivalent reader
+#   can be built in another process.
+#
+#   Readers also list the contents of a workspace: listTables(workspace),
+#   listDatasets(workspace) and listFeatureClasses(workspace, dataset), with
+#   the names that arcpy.ListTables, ListDatasets and ListFeatureClasses give.
+#
+#   Tables are named as the validator names them, e.g. <gdb>/ContactsAndFaults
+#   or <gdb>/GeologicMap/ContactsAndFaults. The sqlite reader only
+#   uses the last part of the name.
+
+import os
+
+defaultBatchSize = 10000
+
+class FieldInfo(object):
+    # field description with the attribute names of an arcpy Field object
+    def __init__(self, name, type, length=0, isNullable=True, required=False):
+        self.name = name
+        self.type = type
+        self.length = length
+        self.isNullable = isNullable
+        self.required = required
+
+def baseName(table):
+    return table.replace('\\', '/').split('/')[-1]
+
+class RowReader(object):
+    # Subclasses provide listFields(table), listTables(workspace) and
+    #   rows(table, fields, oidRange), which yields one tuple per row holding
+    #   the values of fields, in order
+
+    def __init__(self, batchSize=defaultBatchSize):
+        self.batchSize = batchSize
+
+    def spec(self):
+        return (self.__class__, (self.batchSize,))
+
+    def isWorkspace(self, workspace):
+        return True
+
+    def listDatasets(self, workspace):
+        return []
+
+    def listFeatureClasses(self, workspace, dataset):
+        return []
+
+    def readBatches(self, table, fields, oidRange=None):
+        # lists of at most batchSize row tuples
+        batch = []
+        batchSize = self.batchSize
+        for row in self.rows(table, fields, oidRange):
+            batch.append(row)
+            if len(batch) >= batchSize:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def readColumns(self, table, fields, oidRange=None):
+        # dictionary of field name -> list of values
+        columns = []
+        for field in fields:
+            columns.append([])
+        for batch in self.readBatches(table, fields, oidRange):
+            for i in range(len(fields)):
+                columns[i].extend([row[i] for row in batch])
+        return dict(zip(fields, columns))
+
+    def oidField(self, table):
+        for field in self.listFields(table):
+            if field.type == 'OID':
+                return field.name
+        return 'OBJECTID'
+
+    def getCount(self, table):
+        return len(self.readColumns(table, [self.oidField(table)])[self.oidField(table)])
+
+    def oidRange(self, table):
+        # (smallest, largest) OBJECTID, or None if table is empty
+        oids = self.readColumns(table, [self.oidField(table)])[self.oidField(table)]
+        if not oids:
+            return None
+        return (min(oids), max(oids))
+
+class ArcpyReader(RowReader):
+
+    def __init__(self, batchSize=defaultBatchSize):
+        RowReader.__init__(self, batchSize)
+        import arcpy
+        self.arcpy = arcpy
+        self.hasDa = hasattr(arcpy, 'da')
+        arcpy.QualifiedFieldNames = False
+        self.oidFields = {}         # table -> name of its OID field, from Describe
+
+    def isWorkspace(self, workspace):
+        # exists and is plausibly a geodatabase
+        return os.path.exists(workspace) and workspace[-4:].lower() in ('.gdb','.mdb')
+
+    def listTables(self, workspace):
+        self.arcpy.env.workspace = workspace
+        return list(self.arcpy.ListTables())
+
+    def listDatasets(self, workspace):
+        self.arcpy.env.workspace = workspace
+        return list(self.arcpy.ListDatasets())
+
+    def listFeatureClasses(self, workspace, dataset):
+        self.arcpy.env.workspace = workspace
+        self.arcpy.env.workspace = dataset
+        featureClasses = list(self.arcpy.ListFeatureClasses())
+        self.arcpy.env.workspace = workspace
+        return featureClasses
+
+    def listFields(self, table):
+        fields = []
+        for field in self.arcpy.ListFields(table):
+            fields.append(FieldInfo(field.name, field.type, field.length, field.isNullable, field.required))
+        return fields
+
+    def getCount(self, table):
+        return int(self.arcpy.GetCount_management(table).getOutput(0))
+
+    def oidField(self, table):
+        # Describe is slow, and a table is read many times in chunks
+        if table not in self.oidFields:
+            self.oidFields[table] = self.arcpy.Describe(table).OIDFieldName
+        return self.oidFields[table]
+
+    def oidRange(self, table):
+        # first row of cursors sorted on OBJECTID, up and down
+        oid = self.oidField(table)
+        ends = []
+        for order in ('A', 'D'):
+            cursor = self.arcpy.SearchCursor(table, '', '', oid, oid+' '+order)
+            row = cursor.next()
+            if not row:
+                return None
+            ends.append(row.getValue(oid))
+            del row, cursor
+        return (ends[0], ends[1])
+
+    def oidWhere(self, table, oidRange):
+        if oidRange is None:
+            return ''
+        oid = self.arcpy.AddFieldDelimiters(table, self.oidField(table))
+        if isinstance(oidRange, list):
+            return ' OR '.join(['(%s >= %d AND %s < %d)' % (oid, first, oid, end) for first, end in oidRange])
+        return '%s >= %d AND %s < %d' % (oid, oidRange[0], oid, oidRange[1])
+
+    def rows(self, table, fields, oidRange=None):
+        where = self.oidWhere(table, oidRange)
+        if self.hasDa:
+            cursor = self.arcpy.da.SearchCursor(table, fields, where)
+            try:
+                for row in cursor:
+                    yield row
+            finally:
+                del cursor
+        else:
+            cursor = self.arcpy.SearchCursor(table, where, '', ';'.join(fields))
+            row = cursor.next()
+            while row:
+                yield tuple([row.getValue(field) for field in fields])
+                row = cursor.next()
+            del cursor
+
+# SQLite declared types -> geodatabase field types
+sqliteTypes = {'TEXT': 'String', 'REAL': 'Double', 'FLOAT': 'Single', 'DOUBLE': 'Double',
+               'INTEGER': 'Integer', 'INT': 'Integer', 'SMALLINT': 'SmallInteger',
+               'MEDIUMINT': 'Integer', 'DATE': 'Date', 'DATETIME': 'Date', 'BLOB': 'Blob'}
+
+class SqliteReader(RowReader):
+    # reads tables of a SQLite database (or GeoPackage). An INTEGER PRIMARY KEY
+    #   column is reported as the OID field
+
+    def __init__(self, dbPath, batchSize=defaultBatchSize):
+        RowReader.__init__(self, batchSize)
+        import sqlite3
+        self.dbPath = dbPath
+        self.connection = sqlite3.connect(dbPath)
+
+    def spec(self):
+        return (self.__class__, (self.dbPath, self.batchSize))
+
+    def isWorkspace(self, workspace):
+        return os.path.isfile(workspace)
+
+    def listTables(self, workspace):
+        # every table except SQLite's own and the GeoPackage gpkg_ tables
+        tables = []
+        for (name,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY rowid"):
+            if not name.startswith('sqlite_') and not name.startswith('gpkg_'):
+                tables.append(name)
+        return tables
+
+    def listFields(self, table):
+        fields = []
+        for cid, name, declType, notNull, default, pk in self.connection.execute(
+                'PRAGMA table_info("%s")' % baseName(table)):
+            declType = declType.upper()
+            length = 0
+            if '(' in declType:
+                declType, length = declType.split('(')
+                length = int(length.rstrip(')'))
+            if pk and declType == 'INTEGER':
+                fieldType = 'OID'
+            else:
+                fieldType = sqliteTypes.get(declType.strip(), 'Geometry')
+            fields.append(FieldInfo(name, fieldType, length, not (notNull or pk), bool(pk)))
+        return fields
+
+    def getCount(self, table):
+        return self.connection.execute('SELECT COUNT(*) FROM "%s"' % baseName(table)).fetchone()[0]
+
+    def oidRange(self, table):
+        first, last = self.connection.execute('SELECT MIN("%s"), MAX("%s") FROM "%s"' % (
+            self.oidField(table), self.oidField(table), baseName(table))).fetchone()
+        if first is None:
+            return None
+        return (first, last)
+
+    def readBatches(self, table, fields, oidRange=None):
+        sql = 'SELECT %s FROM "%s"' % (','.join(['"%s"' % field for field in fields]), baseName(table))
+        if oidRange is None:
+            cursor = self.connection.execute(sql)
+        else:
+            oid = self.oidField(table)
+            if not isinstance(oidRange, list):
+                oidRange = [oidRange]
+            where = ' OR '.join(['("%s" >= %d AND "%s" < %d)' % (oid, first, oid, end) for first, end in oidRange])
+            cursor = self.connection.execute(sql + ' WHERE %s ORDER BY "%s"' % (where, oid))
+        batch = cursor.fetchmany(self.batchSize)
+        while batch:
+            yield batch
+            batch = cursor.fetchmany(self.batchSize)
+
+    def rows(self, table, fields, oidRange=None):
+        for batch in self.readBatches(table, fields, oidRange):
+            for row in batch:
+                yield row
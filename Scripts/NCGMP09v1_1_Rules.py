@@ -0,0 +1,117 @@
+# NCGMP09v1_1_Rules.py
+#   The checks of NCGMP09v1_1_Validation.py as named rules, and a plan
+#   of what to read for a selection of them
+#
+#   Each Rule declares what it needs and what it does:
+#     kinds      kinds of column it reads from every table (see columnKinds
+#                in NCGMP09v1_1_Inventory.py)
+#     values     {table: (column, ...)}, columns it reads from certain tables
+#     steps      checks of checkContent it runs
+#     sections   sections of the report it fills
+#     schema     True if it checks required elements and field definitions,
+#                which needs field lists but no rows
+#
+#   A RulePlan for some rules, e.g. RulePlan(['glossary','datasources']),
+#   or RulePlan() for all of them, joins their needs into one ColumnNeeds.
+#   Tables none of the rules read from are not scanned at all, only
+#   counted, and the others are scanned for the columns the rules need,
+#   so a run of the cheap rules takes seconds where a full validation
+#   takes minutes. Checks and report sections of rules that are not
+#   selected are left out. The selected rules give the same lines as in
+#   a full report.
+
+from NCGMP09v1_1_Inventory import ColumnNeeds
+
+class Rule(object):
+
+    def __init__(self, name, description, kinds=(), values=None, steps=(), sections=(), schema=False):
+        self.name = name
+        self.description = description
+        self.kinds = kinds
+        self.values = values or {}
+        self.steps = steps
+        self.sections = sections
+        self.schema = schema
+
+# in the order they run
+rules = [Rule('ids','Duplicate _ID values; OwnerIDs and ValueLinkIDs of ExtendedAttributes that are not _IDs',
+              kinds=('ids',), values={'ExtendedAttributes': ('OwnerID','ValueLinkID')},
+              steps=('uniqueIDs','extendedAttributes'), sections=('duplicateIDs','unreferencedIds')),
+         Rule('datasources','References to DataSources, and DataSources not referenced',
+              kinds=('sources',), values={'DataSources': ('DataSources_ID',)},
+              steps=('dataSources',), sections=('missingSourceIDs','unusedDataSources')),
+         Rule('mapunits','MapUnits of the map, DMU, StandardLithology, CMU and cross sections',
+              kinds=('mapUnits',), values={'DescriptionOfMapUnits': ('MapUnit',), 'StandardLithology': ('MapUnit',)},
+              steps=('mapUnits','unitEquivalence','standardLithology','dmuMapUnits'),
+              sections=('missingDmuMapUnits','missingStandardLithMapUnits','unreferencedDmuMapUnits',
+                        'unreferencedStandardLithMapUnits','equivalenceErrors')),
+         Rule('glossary','References to Glossary, and Glossary terms not used',
+              kinds=('glossary',), values={'Glossary': ('Term',)},
+              steps=('glossary',), sections=('missingGlossaryTerms','unusedGlossaryTerms')),
+         Rule('geologicevents','GeologicEvents not cited in ExtendedAttributes',
+              values={'GeologicEvents': ('GeologicEvents_ID',), 'ExtendedAttributes': ('ValueLinkID',)},
+              steps=('geologicEvents',), sections=('unusedGeologicEvents',)),
+         Rule('hierarchykey','Format and structure of HierarchyKey, and ParagraphStyle, in DescriptionOfMapUnits',
+              values={'DescriptionOfMapUnits': ('HierarchyKey','MapUnit','ParagraphStyle')},
+              steps=('hierarchyKey',), sections=('hKeyErrors',)),
+         Rule('domains','Numbers outside their domains (azimuths, inclinations, ages, confidences, ...); PartType and PropertyValue not in Glossary',
+              kinds=('domains',), values={'Glossary': ('Term',), 'StandardLithology': ('PartType',),
+                                          'ExtendedAttributes': ('PropertyValue',)},
+              steps=('domains',), sections=('domainErrors',)),
+         Rule('pseudonulls','Pseudonulls, leading and trailing spaces in non-nullable String fields',
+              kinds=('strings',), sections=('allBadNulls',)),
+         Rule('schema','Required tables, feature datasets, feature classes and field definitions',
+              sections=('schemaErrors','schemaExtensions'), schema=True)]
+
+ruleNames = [rule.name for rule in rules]
+
+def getRule(name):
+    for rule in rules:
+        if rule.name == name:
+            return rule
+    raise ValueError('no rule '+name+'; rules are '+', '.join(ruleNames))
+
+def parseRules(text):
+    # rule names from a comma-separated list such as 'glossary,datasources';
+    #   None, for all rules, if text is empty or 'all'
+    names = [name.strip().lower() for name in text.split(',') if name.strip()]
+    if not names or 'all' in names:
+        return None
+    for name in names:
+        getRule(name)
+    return names
+
+class RulePlan(object):
+
+    def __init__(self, names=None):
+        # names of the rules to run, None for all
+        if names is None:
+            names = ruleNames
+        for name in names:
+            getRule(name)
+        self.rules = [rule for rule in rules if rule.name in names]
+        self.names = [rule.name for rule in self.rules]
+        kinds = []
+        values = {}
+        self.steps = set()
+        self.sections = set()
+        self.schema = False
+        for rule in self.rules:
+            for kind in rule.kinds:
+                if kind not in kinds:
+                    kinds.append(kind)
+            for table in rule.values:
+                values[table] = tuple(values.get(table, ())) + tuple(rule.values[table])
+            self.steps.update(rule.steps)
+            self.sections.update(rule.sections)
+            self.schema = self.schema or rule.schema
+        self.needs = ColumnNeeds(kinds, values)
+
+    def isFull(self):
+        return len(self.rules) == len(rules)
+
+    def runs(self, step):
+        return step in self.steps
+
+    def reports(self, section):
+        return section in self.sections
@@ -0,0 +1,284 @@
+# NCGMP09v1_1_Sample.py
+#   Quick, approximate content check of a geodatabase from a random sample
+#   of its rows, for NCGMP09v1_1-ValidateDatabase-Arc10.0.py --sample
+#
+#   DataSources, Glossary and DescriptionOfMapUnits, which every other
+#   table refers to, are read whole, as are tables of no more than
+#   sampleRows rows. Bigger tables are sampled by OBJECTID: the span of
+#   OBJECTIDs is cut into sampleRows / blockRows strata of equal width,
+#   and from each stratum one block of about blockRows consecutive
+#   OBJECTIDs, starting at a random place, is chosen. The blocks of a
+#   table are read together, with one cursor whose where clause ORs their
+#   OBJECTID ranges, and the rows are then sorted into their blocks and
+#   inventoried with inventoryRows. So the sample covers the whole table
+#   at the cost of one query. The random places come from seed and the
+#   table name, so the same seed samples the same rows.
+#
+#   Each sampled row gets the row checks of a full validation:
+#     missingGlossaryTerms   references to terms not in Glossary
+#     missingSourceIDs       references to DataSources_IDs not in DataSources
+#     missingDmuMapUnits     MapUnits not in DescriptionOfMapUnits
+#     allBadNulls            rows with pseudonulls, leading or trailing spaces
+#   and the number of problems in each table is estimated as
+#   (problems in sample / rows in sample) * rows in table. The 95%
+#   confidence bounds treat the blocks as clusters of a ratio estimate;
+#   a sampled table with no problems in its sample gets the rule-of-three
+#   upper bound, 3 * rows / rows sampled. Estimates are numbers of
+#   references (or rows), not of the distinct missing values listed in a
+#   full report. Checks that need every row, such as duplicate _IDs or
+#   unreferenced Glossary terms, are not made.
+
+import time, math, random, hashlib, bisect
+
+from NCGMP09v1_1_Inventory import inventoryTable, inventoryRows, ColumnPlan, valueText
+
+# tables that other tables are checked against, read whole
+lookupTables = ('DataSources','Glossary','DescriptionOfMapUnits')
+# normal deviate of the two-sided 95% confidence bounds
+z = 1.96
+
+categories = [['missingGlossaryTerms','References to terms missing from Glossary'],
+              ['missingSourceIDs','References to DataSources_IDs missing from DataSources'],
+              ['missingDmuMapUnits','MapUnit values missing from DescriptionOfMapUnits'],
+              ['allBadNulls','Rows with pseudonulls, leading spaces or trailing spaces']]
+
+def tableRandom(seed, table):
+    # random numbers for one table, the same for the same seed and table
+    return random.Random(int(hashlib.md5((str(seed)+'/'+table).encode('utf-8')).hexdigest()[0:8], 16))
+
+def sampleRanges(bounds, nRows, sampleRows, blockRows, rng):
+    # OBJECTID ranges (first, last+1) of a stratified sample of about
+    #   sampleRows of nRows rows, or None if the table should be read whole
+    if bounds is None or nRows <= sampleRows:
+        return None
+    first, last = bounds
+    span = last - first + 1
+    blockRows = min(blockRows, sampleRows)
+    nStrata = max(2, sampleRows // blockRows)
+    width = span / float(nStrata)
+    # OBJECTIDs per block; more than blockRows if rows have been deleted
+    blockOids = max(1, int(round(blockRows * span / float(nRows))))
+    ranges = []
+    for i in range(nStrata):
+        start = first + int(i * width)
+        end = first + int((i + 1) * width)
+        if end <= start:
+            continue
+        blockStart = start + rng.randint(0, max(end - start - blockOids, 0))
+        ranges.append((blockStart, min(blockStart + blockOids, end)))
+    return ranges
+
+class Estimate(object):
+    # problems of one category in one table, from the blocks read
+
+    def __init__(self, table, nRows):
+        self.table = table
+        self.nRows = nRows          # rows in the table
+        self.clusters = []          # [rows read, problems found] for each block
+        self.whole = False          # True if every row was read
+
+    def add(self, nRead, nFound):
+        self.clusters.append([nRead, nFound])
+
+    def nRead(self):
+        return sum([cluster[0] for cluster in self.clusters])
+
+    def found(self):
+        return sum([cluster[1] for cluster in self.clusters])
+
+    def total(self):
+        nRead = self.nRead()
+        if self.whole or nRead == 0:
+            return float(self.found())
+        return self.nRows * self.found() / float(nRead)
+
+    def standardError(self):
+        nRead = self.nRead()
+        if self.whole or nRead == 0:
+            return 0.0
+        if self.found() == 0:
+            # rule of three: the 95% upper bound is 3 * nRows / nRead
+            return 3.0 * self.nRows / nRead / z
+        m = len(self.clusters)
+        if m < 2:
+            return 0.0
+        ratio = self.found() / float(nRead)
+        meanRead = nRead / float(m)
+        squares = sum([(found - ratio * read) ** 2 for read, found in self.clusters])
+        fraction = min(1.0, nRead / float(self.nRows))
+        variance = (1.0 - fraction) * squares / (m * (m - 1) * meanRead * meanRead)
+        return self.nRows * math.sqrt(variance)
+
+def bounds(estimates):
+    # (estimate, lower, upper) of the sum of estimates; the lower bound is
+    #   never less than the number of problems actually found
+    total = sum([estimate.total() for estimate in estimates])
+    error = math.sqrt(sum([estimate.standardError() ** 2 for estimate in estimates]))
+    found = sum([estimate.found() for estimate in estimates])
+    return total, max(found, total - z * error), total + z * error
+
+class SampleValidation(object):
+
+    def __init__(self, reader, database, sampleRows=2000, blockRows=20, seed=0, messageFunc=None):
+        self.reader = reader
+        self.database = database
+        self.sampleRows = sampleRows
+        self.blockRows = blockRows
+        self.seed = seed
+        self.addMsgAndPrint = messageFunc
+        self.estimates = {}         # category -> list of Estimate, one per table
+        self.examples = {}          # category -> set of missing values seen
+        for category, heading in categories:
+            self.estimates[category] = []
+            self.examples[category] = set()
+        self.glossaryTerms = set()
+        self.sourceIDs = set()
+        self.dmuMapUnits = set()
+        self.nSampled = 0           # tables sampled, not read whole
+        self.rowsRead = 0
+        self.rowsTotal = 0
+
+    def jobs(self):
+        # [path, table] of every table and feature class
+        database = self.database
+        jobs = []
+        for table in self.reader.listTables(database):
+            jobs.append([database+'/'+table, table])
+        for dataset in self.reader.listDatasets(database):
+            for featureClass in self.reader.listFeatureClasses(database, dataset):
+                jobs.append([database+'/'+dataset+'/'+featureClass, featureClass])
+        return jobs
+
+    def run(self):
+        jobs = self.jobs()
+        # the tables checked against first, whole
+        lookups = {}
+        for path, table in jobs:
+            if table in lookupTables:
+                lookups[table] = inventoryTable(self.reader, path, table)
+        if 'Glossary' in lookups:
+            self.glossaryTerms = set(lookups['Glossary'].values.get('Term', []))
+        if 'DataSources' in lookups:
+            self.sourceIDs = set(lookups['DataSources'].values.get('DataSources_ID', []))
+        if 'DescriptionOfMapUnits' in lookups:
+            self.dmuMapUnits = set(lookups['DescriptionOfMapUnits'].values.get('MapUnit', []))
+        for path, table in jobs:
+            nRows = self.reader.getCount(path)
+            self.rowsTotal = self.rowsTotal + nRows
+            tableEstimates = {}
+            for category, heading in categories:
+                tableEstimates[category] = Estimate(table, nRows)
+                self.estimates[category].append(tableEstimates[category])
+            if table in lookups:
+                invs = [lookups[table]]
+                ranges = None
+            else:
+                ranges = sampleRanges(self.reader.oidRange(path), nRows, self.sampleRows, self.blockRows,
+                                      tableRandom(self.seed, table))
+                if ranges is None:
+                    invs = [inventoryTable(self.reader, path, table)]
+                else:
+                    invs = self.readBlocks(path, table, ranges)
+            if ranges is None:
+                for category in tableEstimates:
+                    tableEstimates[category].whole = True
+            else:
+                self.nSampled = self.nSampled + 1
+            nRead = 0
+            for inv in invs:
+                self.checkBlock(inv, tableEstimates)
+                nRead = nRead + inv.nrows
+            self.rowsRead = self.rowsRead + nRead
+            if self.addMsgAndPrint:
+                self.addMsgAndPrint('    '+table+', '+str(nRead)+' of '+str(nRows)+' rows')
+
+    def readBlocks(self, path, table, ranges):
+        # an inventory of each of ranges of table, all read with one cursor
+        fields = self.reader.listFields(path)
+        plan = ColumnPlan(fields, table)
+        starts = [first for first, end in ranges]
+        blocks = [[] for oidRange in ranges]
+        try:
+            for batch in self.reader.readBatches(path, plan.columns, ranges):
+                for row in batch:
+                    # OBJECTID is the first column
+                    i = bisect.bisect_right(starts, row[0]) - 1
+                    if i >= 0 and row[0] < ranges[i][1]:
+                        blocks[i].append(row)
+        except Exception, e:
+            # the blocks hold the rows read before the failure
+            if self.addMsgAndPrint:
+                self.addMsgAndPrint('    failed to read rows of '+table+': '+valueText(e))
+        return [inventoryRows(table, fields, plan, [block]) for block in blocks]
+
+    def checkBlock(self, inv, tableEstimates):
+        # the row checks of a full validation, on one block of rows
+        missingTerms = 0
+        for field in inv.glossaryRefs:
+            for value in inv.glossaryRefs[field]:
+                if value not in (None, '', 'None') and value not in self.glossaryTerms:
+                    missingTerms = missingTerms + 1
+                    self.examples['missingGlossaryTerms'].add(value)
+        tableEstimates['missingGlossaryTerms'].add(inv.nrows, missingTerms)
+        missingSources = 0
+        for field in inv.sourceRefs:
+            for value in inv.sourceRefs[field]:
+                if value not in (None, '') and value not in self.sourceIDs:
+                    missingSources = missingSources + 1
+                    self.examples['missingSourceIDs'].add(value)
+        tableEstimates['missingSourceIDs'].add(inv.nrows, missingSources)
+        missingUnits = 0
+        if inv.table != 'DescriptionOfMapUnits' and inv.table != 'StandardLithology':
+            for mu in inv.mapUnits:
+                if mu not in self.dmuMapUnits:
+                    missingUnits = missingUnits + 1
+                    self.examples['missingDmuMapUnits'].add(mu)
+        tableEstimates['missingDmuMapUnits'].add(inv.nrows, missingUnits)
+        tableEstimates['allBadNulls'].add(inv.nrows, len(inv.badNulls))
+
+    def results(self):
+        # [category, estimate, lower, upper] for each category
+        results = []
+        for category, heading in categories:
+            total, lower, upper = bounds(self.estimates[category])
+            results.append([category, total, lower, upper])
+        return results
+
+    def writeReport(self, outFile, versionString=''):
+        outfl = open(outFile, 'w')
+        outfl.write('Geodatabase '+self.database+'\n')
+        outfl.write('  APPROXIMATE: estimated from a random sample of rows. This is not a full\n')
+        outfl.write('  validation; run without --sample for the conformance report.\n')
+        outfl.write('  This file written by '+versionString+'\n')
+        outfl.write('  '+time.asctime(time.localtime(time.time()))+'\n')
+        outfl.write('  Read '+str(self.rowsRead)+' of '+str(self.rowsTotal)+' rows; '+str(self.nSampled)+
+                    ' tables sampled in blocks of about '+str(self.blockRows)+' rows, up to '+
+                    str(self.sampleRows)+' rows each, seed '+str(self.seed)+'\n')
+        outfl.write('\n\nESTIMATED CONTENT ERRORS, with 95% confidence bounds\n\n')
+        for category, heading in categories:
+            estimates = self.estimates[category]
+            total, lower, upper = bounds(estimates)
+            found = sum([estimate.found() for estimate in estimates])
+            outfl.write('  '+heading+'\n')
+            outfl.write('    about %.0f (%.0f to %.0f); %d found in the rows read\n' % (total, lower, upper, found))
+            for estimate in estimates:
+                if estimate.found() > 0:
+                    if estimate.whole:
+                        outfl.write('      %s: %d, all rows read\n' % (estimate.table, estimate.found()))
+                    else:
+                        tableTotal, tableLower, tableUpper = bounds([estimate])
+                        outfl.write('      %s: about %.0f (%.0f to %.0f), %d in %d of %d rows\n' %
+                                    (estimate.table, tableTotal, tableLower, tableUpper,
+                                     estimate.found(), estimate.nRead(), estimate.nRows))
+            examples = [str(value) for value in self.examples.get(category, [])]
+            if examples:
+                examples.sort()
+                more = ''
+                if len(examples) > 10:
+                    more = ', ... ('+str(len(examples))+' distinct)'
+                outfl.write('    missing values seen: '+', '.join(examples[0:10])+more+'\n')
+            outfl.write('\n')
+        outfl.write('  Not checked in a sample: schema, duplicate _IDs, unreferenced entries in\n')
+        outfl.write('  DataSources, Glossary and DescriptionOfMapUnits, map/DMU/CMU/cross section\n')
+        outfl.write('  units, ExtendedAttributes, GeologicEvents and HierarchyKey.\n')
+        outfl.close()
@@ -0,0 +1,121 @@
+# NCGMP09v1_1_Suggest.py
+#   Suggestions for missing Glossary terms and MapUnits: the existing
+#   values closest to a missing one, for the report of
+#   NCGMP09v1_1_Validation.py
+#
+#   Most missing terms and units are typos or case and space variants of
+#   values that are there. SuggestionIndex is built once over the values
+#   (Glossary Term, DMU MapUnit) and indexes each by its trigrams, the
+#   3-letter pieces of its text with a space added at either end. A
+#   lookup counts, for each value, the trigrams it shares with the
+#   missing value and computes the edit distance only to values that
+#   share enough of them to be within maxDistance edits (a string within
+#   d edits of another shares all but at most 3*d of its trigrams), so a
+#   lookup takes about the same time with tens of thousands of values as
+#   with a hundred. A suggestion shares at least one trigram with the
+#   missing value; for values of a few letters with two or three edits
+#   spread through them, which may share none, a suggestion would be
+#   little more than a guess.
+#
+#   Values are compared lowercased and with runs of spaces made one, so a
+#   case or space variant is at distance 0 and comes first. Suggestions
+#   are the original values, closest first, at most maxSuggestions of them.
+#
+#   Does not import arcpy.
+
+# length of the indexed pieces of text
+gramLength = 3
+# suggestions given for a missing value
+maxSuggestions = 3
+# edits allowed between a long missing value and a suggestion
+mostEdits = 3
+
+def normalize(value):
+    return ' '.join(str(value).lower().split())
+
+def trigrams(text):
+    padded = ' '+text+' '
+    if len(padded) < gramLength:
+        return set([padded])
+    return set([padded[i:i+gramLength] for i in range(len(padded) - gramLength + 1)])
+
+def maxDistance(length):
+    # edits allowed between a missing value of length characters and a suggestion
+    return min(mostEdits, 1 + length // 5)
+
+def editDistance(a, b, limit):
+    # Levenshtein distance of a and b, or limit + 1 if it is more than limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 1
+            if a[i - 1] == b[j - 1]:
+                cost = 0
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class SuggestionIndex(object):
+
+    def __init__(self, values):
+        self.keys = []          # distinct normalized values
+        self.originals = []     # for each key, the values that normalize to it
+        self.keyNumbers = {}    # key -> its number in keys
+        self.nGrams = []        # for each key, the number of its trigrams
+        self.postings = {}      # trigram -> numbers of the keys that have it
+        for value in values:
+            if value in (None, '', 'None'):
+                continue
+            key = normalize(value)
+            if key in self.keyNumbers:
+                originals = self.originals[self.keyNumbers[key]]
+                if value not in originals:
+                    originals.append(value)
+                continue
+            number = len(self.keys)
+            self.keyNumbers[key] = number
+            self.keys.append(key)
+            self.originals.append([value])
+            grams = trigrams(key)
+            self.nGrams.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(number)
+
+    def suggest(self, value, nSuggestions=None):
+        # the values closest to value, closest first
+        if nSuggestions is None:
+            nSuggestions = maxSuggestions
+        key = normalize(value)
+        limit = maxDistance(len(key))
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for number in self.postings.get(gram, ()):
+                shared[number] = shared.get(number, 0) + 1
+        ranked = []
+        for number in shared:
+            # count filter: too few shared trigrams to be within limit edits
+            if shared[number] < max(len(grams), self.nGrams[number]) - gramLength * limit:
+                continue
+            candidate = self.keys[number]
+            distance = editDistance(key, candidate, limit)
+            if distance <= limit:
+                ranked.append((distance, candidate, number))
+        ranked.sort()
+        suggestions = []
+        for distance, candidate, number in ranked:
+            for original in self.originals[number]:
+                if original != value and len(suggestions) < nSuggestions:
+                    suggestions.append(original)
+        return suggestions
+
+def didYouMean(suggestions):
+    # text to add to a report line
+    if not suggestions:
+        return ''
+    return ' (did you mean '+', '.join([str(suggestion) for suggestion in suggestions])+'?)'
@@ -0,0 +1,136 @@
+# NCGMP09v1_1_Template.py
+#   Cache of empty template geodatabases for
+#   NCGMP09v1_1-CreateDatabase-Arc10.0.py
+#
+#   Creating an NCGMP09 geodatabase makes one arcpy call for each feature
+#   dataset, feature class and table and one for each of their fields, and
+#   takes minutes. Every geodatabase made from the same inputs is the
+#   same, so the first one is built once, as a template, and later ones
+#   are copies of it, which take seconds.
+#
+#   A template is keyed by an md5 hash of everything that goes into it:
+#   the tableDict schema, the optional elements, the coordinate system
+#   (the text of the file, if it names a .prj file), the number of cross
+#   sections, the kind of geodatabase (.gdb or .mdb) and the version of the
+#   script. A change to any of them gives another key, so an old template
+#   is never used for new inputs. Templates are kept as
+#   <cacheDir>/<key>/template.gdb (or .mdb); cacheDir is
+#   $NCGMP09_TEMPLATE_CACHE, or ~/.ncgmp09/templates.
+#
+#   A template is built in a temporary directory in cacheDir and renamed
+#   to <key> only when it is complete, so a run that dies part way leaves
+#   no template behind, and two runs that build the same template at once
+#   keep only one of them.
+#
+#   A file geodatabase is a directory named for the geodatabase, so a copy
+#   of the directory under another name is a geodatabase of that name;
+#   lock files are not copied. A personal geodatabase is a single file.
+#
+#   Does not import arcpy.
+
+import os, shutil, hashlib, tempfile
+
+templateName = 'template'
+
+def defaultCacheDir():
+    cacheDir = os.environ.get('NCGMP09_TEMPLATE_CACHE')
+    if not cacheDir:
+        cacheDir = os.path.join(os.path.expanduser('~'), '.ncgmp09', 'templates')
+    return cacheDir
+
+def coordSystemText(coordSystem):
+    # the text a coordinate system is hashed by: the definition, if it
+    #   names a file, so an edited .prj file gives another key
+    if coordSystem != '#' and os.path.isfile(coordSystem):
+        prjFile = open(coordSystem)
+        text = prjFile.read()
+        prjFile.close()
+        return text
+    return coordSystem
+
+def templateKey(tableDict, optionalElements, coordSystem, nCrossSections, extension, version=''):
+    tables = list(tableDict.keys())
+    tables.sort()
+    schema = [[table, tableDict[table]] for table in tables]
+    options = list(set(optionalElements))
+    options.sort()
+    text = repr([schema, options, coordSystemText(coordSystem), int(nCrossSections), extension.lower(), version])
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+class TemplateCache(object):
+
+    def __init__(self, cacheDir=None):
+        if cacheDir is None:
+            cacheDir = defaultCacheDir()
+        self.cacheDir = cacheDir
+
+    def path(self, key, extension):
+        return os.path.join(self.cacheDir, key, templateName+extension)
+
+    def get(self, key, extension):
+        # path of the template for key, or None if there isn't one
+        path = self.path(key, extension)
+        if os.path.exists(path):
+            return path
+        return None
+
+    def build(self, key, extension, buildFunc):
+        # buildFunc(directory, name) creates geodatabase <directory>/<name>
+        #   and returns True if it succeeded. Returns the path of the new
+        #   template, or None if buildFunc failed
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+        buildDir = tempfile.mkdtemp('', key+'-', self.cacheDir)
+        try:
+            if not buildFunc(buildDir, templateName+extension):
+                return None
+            try:
+                os.rename(buildDir, os.path.join(self.cacheDir, key))
+            except OSError:
+                # built by another run meanwhile
+                if self.get(key, extension) is None:
+                    raise
+            else:
+                buildDir = None
+        finally:
+            if buildDir is not None:
+                shutil.rmtree(buildDir, True)
+        return self.get(key, extension)
+
+    def clone(self, templatePath, outputDir, name):
+        # copy the template to geodatabase <outputDir>/<name>
+        newPath = os.path.join(outputDir, name)
+        if os.path.exists(newPath):
+            raise IOError(newPath+' already exists')
+        if os.path.isdir(templatePath):
+            shutil.copytree(templatePath, newPath, ignore=shutil.ignore_patterns('*.lock'))
+        else:
+            shutil.copyfile(templatePath, newPath)
+        return newPath
+
+    def keys(self):
+        # keys of the templates in the cache
+        if not os.path.isdir(self.cacheDir):
+            return []
+        keys = [name for name in os.listdir(self.cacheDir) if len(name) == 32
+                and os.path.isdir(os.path.join(self.cacheDir, name))]
+        keys.sort()
+        return keys
+
+    def clear(self, key=None):
+        # remove the template for key, or all templates and unfinished
+        #   builds; returns the number of templates removed
+        if not os.path.isdir(self.cacheDir):
+            return 0
+        if key is not None:
+            names = [name for name in [key] if os.path.isdir(os.path.join(self.cacheDir, name))]
+        else:
+            names = os.listdir(self.cacheDir)
+        nRemoved = 0
+        for name in names:
+            path = os.path.join(self.cacheDir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, True)
+                if len(name) == 32:
+                    nRemoved = nRemoved + 1
+        return nRemoved
@@ -0,0 +1,863 @@
+# NCGMP09v1_1_Validation.py
+#   Conformance checks of NCGMP09v1_1-ValidateDatabase-Arc10.0.py as a
+#   reusable object.
+#
+#   A ValidationSession holds the options and the warm parts of a run:
+#   arcpy (imported once, by the first ArcpyReader), the schema in
+#   NCGMP09v1_1_Definition and the worker settings. session.validate(gdb)
+#   inventories and checks one geodatabase, writes its conformance report
+#   and returns a ValidationResult. All per-database lists are rebuilt at
+#   the start of each validate(), so one process can validate any number
+#   of geodatabases in turn:
+#
+#       session = ValidationSession(nJobs=4)
+#       for gdb in gdbs:
+#           result = session.validate(gdb, outputWorkspace)
+#           print(result.database+' '+str(result.errorCount()))
+#
+#   openReader(database) returns the row reader for a database (see
+#   NCGMP09v1_1_RowReader.py). By default one ArcpyReader serves every
+#   geodatabase; SqliteReader can be passed instead to validate SQLite
+#   stand-ins without arcpy.
+#
+#   With findings='jsonl' or 'sqlite', every problem found and every table
+#   inventoried is also written, as it is found, to a machine-readable
+#   <outputWorkspace>/<gdb>-findings.jsonl or .sqlite; see
+#   NCGMP09v1_1_Findings.py.
+#
+#   Each phase of validate(), each check of checkContent and each table
+#   scan is timed by a Profiler (NCGMP09v1_1_Profile.py). With timing=True
+#   the timings are written to <outputWorkspace>/<gdb>-timing.json, and
+#   phases named in cProfilePhases are run under cProfile.
+#
+#   With sampleRows > 0, validate() instead makes the quick, approximate
+#   check of NCGMP09v1_1_Sample.py on a random sample of about sampleRows
+#   rows of each table, and writes <outputWorkspace>/<gdb>-sample.txt.
+#
+#   memoryBudget (MB) bounds the memory of the database-wide _ID, Glossary,
+#   DataSources and MapUnit references: each collection spills to sorted
+#   runs on disk once it passes a quarter of the budget, and the checks
+#   that use it become merges of those runs. The report is the same.
+#
+#   progress, a Progress (NCGMP09v1_1_Progress.py), is told of each phase,
+#   check and table and of the rows read, for a progress display.
+#
+#   rules, a list of the rule names of NCGMP09v1_1_Rules.py (None for all),
+#   picks the checks to make. Only the columns those rules need are read,
+#   tables none of them needs are only counted, and the report has only
+#   their sections.
+
+import time, os.path
+
+from NCGMP09v1_1_Definition import tableDict
+from NCGMP09v1_1_RefIndex import ReferenceIndex, ReferenceColumns, findDuplicateIDs, asText
+from NCGMP09v1_1_Inventory import TableInventory, inventoryTables, termDomainFields
+from NCGMP09v1_1_Cache import incrementalInventory
+from NCGMP09v1_1_Report import ReportSection, oidOrder
+from NCGMP09v1_1_Findings import openFindings
+from NCGMP09v1_1_Profile import Profiler
+from NCGMP09v1_1_Sample import SampleValidation
+from NCGMP09v1_1_Progress import Progress
+from NCGMP09v1_1_Rules import RulePlan
+from NCGMP09v1_1_Domains import isNumber
+from NCGMP09v1_1_HierarchyKey import HierarchyIndex
+from NCGMP09v1_1_Suggest import SuggestionIndex, didYouMean
+
+versionString = 'NCGMP09v1.1-ValidateDatabase-Arc10.0.py, version of 22 May 2012'
+
+# [step, method] of each check of checkContent, in the order they run
+contentChecks = [['uniqueIDs','checkUniqueIDs'],
+                 ['extendedAttributes','checkExtendedAttributes'],
+                 ['dataSources','checkDataSources'],
+                 ['mapUnits','checkMapUnits'],
+                 ['unitEquivalence','checkUnitEquivalence'],
+                 ['standardLithology','checkStandardLithology'],
+                 ['dmuMapUnits','checkDmuMapUnits'],
+                 ['glossary','checkGlossary'],
+                 ['geologicEvents','checkGeologicEvents'],
+                 ['hierarchyKey','checkHierarchyKey'],
+                 ['domains','checkDomains']]
+
+# fields we don't want listed or described when inventorying dataset:
+standardFields = ('OBJECTID','SHAPE','Shape','SHAPE_Length','SHAPE_Area','ZOrder',
+                  'AnnotationClassID','Status','TextString','FontName','FontSize','Bold',
+                  'Italic','Underline','VerticalAlignment','HorizontalAlignment',
+                  'XOffset','YOffset','Angle','FontLeading','WordSpacing','CharacterWidth',
+                  'CharacterSpacing','FlipAngle','Override','Shape_Length','Shape_Area')
+
+def addMsgAndPrint(msg, severity=0):
+    # prints msg to screen and adds msg to the geoprocessor (in case this is run as a tool)
+    # print msg
+    try:
+        import arcpy
+        for string in msg.split('\n'):
+            # Add appropriate geoprocessing message
+            if severity == 0:
+                arcpy.AddMessage(string)
+            elif severity == 1:
+                arcpy.AddWarning(string)
+            elif severity == 2:
+                arcpy.AddError(string)
+    except:
+        pass
+
+class ValidationResult(object):
+    # what validate() found in one database; the full report is in outFile
+
+    def __init__(self, database, outFile):
+        self.database = database
+        self.outFile = outFile
+        self.completed = False    # False if the inputs were bad or the workspace would not load
+        self.nTables = 0          # tables and feature classes inventoried
+        self.schemaErrors = []
+        self.schemaExtensions = []
+        self.contentErrors = []   # [section name, number of lines] for each CONTENT ERRORS section written
+        self.messages = []        # problems met while reading tables
+        self.readErrors = []      # tables whose rows could not all be read; their checks are incomplete
+        self.findingsFile = None  # machine-readable findings, if asked for
+        self.timingFile = None    # timings of phases and tables, if asked for
+        self.timings = None       # the same, as returned by Profiler.timings()
+        self.approximate = False  # True for a --sample check
+        self.estimates = []       # [category, estimate, lower, upper] of a --sample check
+        self.rules = []           # names of the rules checked
+        self.seconds = 0.0
+
+    def errorCount(self):
+        n = len(self.schemaErrors) + len(self.readErrors)
+        for name, count in self.contentErrors:
+            n = n + count
+        return n
+
+class ValidationSession(object):
+
+    def __init__(self, openReader=None, nJobs=1, chunkRows=0, incremental=False, findings=None,
+                 timing=False, cProfilePhases=None, sampleRows=0, sampleBlockRows=20, sampleSeed=0, memoryBudget=0,
+                 progress=None, rules=None, debug=True, messageFunc=addMsgAndPrint):
+        self.openReader = openReader
+        self.nJobs = nJobs              # worker processes that scan tables
+        self.chunkRows = chunkRows      # OBJECTID range scanned by one worker (0 = whole table)
+        self.incremental = incremental  # keep inventories in <outputWorkspace>/<gdb>-validation-cache.pickle
+        self.findingsFormat = findings  # None, or 'jsonl' or 'sqlite' to write <outputWorkspace>/<gdb>-findings.*
+        self.timing = timing            # write <outputWorkspace>/<gdb>-timing.json
+        self.cProfilePhases = cProfilePhases or []   # phases and checks to run under cProfile, or ['all']
+        self.sampleRows = sampleRows    # > 0 for an approximate check of about this many rows of each table
+        self.sampleBlockRows = sampleBlockRows   # consecutive rows read at each sampled place
+        self.sampleSeed = sampleSeed    # the same seed samples the same rows
+        self.memoryBudget = memoryBudget    # MB for the reference collections before they spill to disk; 0 for no limit
+        self.progress = progress or Progress()   # told of phases, checks, tables and rows
+        self.rulePlan = RulePlan(rules) # the checks to make, and the columns they read
+        self.debug = debug
+        self.addMsgAndPrint = messageFunc
+        self.arcpyReader = None
+        self.resetState(None)
+
+    def getReader(self, database):
+        if self.openReader is not None:
+            return self.openReader(database)
+        if self.arcpyReader is None:
+            from NCGMP09v1_1_RowReader import ArcpyReader
+            self.arcpyReader = ArcpyReader()
+        return self.arcpyReader
+
+    def resetState(self, database):
+        # everything collected from one database
+        self.thisDatabase = database
+        self.reader = None
+        self.cacheFile = None
+        self.findings = None     # FindingsWriter, if findings are written
+        self.profiler = Profiler(database)
+        self.scannedTables = []  # tables read, not taken from the incremental cache
+        self.reportedCategories = None   # names of the CONTENT ERRORS sections the report will have
+        self.tables = []
+        self.inventories = {}    # table or feature class name -> TableInventory, one scan each
+        self.fdsfc = []
+        # references are kept as ReferenceColumns (see NCGMP09v1_1_RefIndex.py)
+        maxBytes = None
+        if self.memoryBudget:
+            maxBytes = self.memoryBudget * 1024 * 1024 // 4
+        self.all_IDs = ReferenceColumns(maxBytes)               # should-be unique identifiers, [value, table]
+        self.allMapUnitRefs = ReferenceColumns(maxBytes)        # MapUnit references (from various Poly feature data sets), [value, table]
+        self.allGlossaryRefs = ReferenceColumns(maxBytes)       # references to Glossary, [value, field, table]
+        self.allDataSourcesRefs = ReferenceColumns(maxBytes)    # references to DataSources, [value, field, table]
+        self.allBadNulls = ReportSection("""  Pseudonulls (value = <space>) commonly result from loading empty data into
+  string fields in which nulls are not allowed. Trailing spaces are commonly
+  produced by hand-correction of pseudonulls. The following fields contain
+  pseudonulls, leading spaces or trailing spaces""",'No pseudonulls, leading spaces or trailing spaces')
+        self.gdbDescription = []
+        self.readErrors = []
+        self.schemaErrors = []
+        self.schemaExtensions = []
+        self.duplicateIDs = ReportSection('  Duplicate _ID values','No duplicate _IDs')
+        self.unreferencedIds = ReportSection('  OwnerIDs and ValueLinkIDs in ExtendedAttributes that are absent elsewhere in the database',
+                                             'No rows in ExtendedAttributes that reference nonexistent OwnerIDs or ValueLinkIDs')
+        self.extendedAttribIDs = []
+        self.missingSourceIDs = ReportSection('  Missing DataSources entries. Only one reference to each missing source is cited',
+                                              'No missing entries in DataSources')
+        self.unusedDataSources = ReportSection('  Entries in DataSources that are not otherwise referenced in database',
+                                               'No unreferenced entries in DataSources')
+        self.dataSourcesIDs = []
+        self.missingDmuMapUnits = ReportSection('  MapUnits missing from DMU. Only one reference to each missing unit is cited',
+                                                'No missing MapUnits in DescriptionOfMapUnits')
+        self.missingStandardLithMapUnits = ReportSection('  MapUnits missing from StandardLithology. Only one reference to each missing unit is cited',
+                                                         'No missing MapUnits in StandardLithology')
+        self.unreferencedDmuMapUnits = ReportSection('  MapUnits in DMU that are not present on map or in CMU',
+                                                     'No unreferenced MapUnits in Description of MapUnits')
+        self.unreferencedStandardLithMapUnits = ReportSection('  MapUnits in StandardLithology that are not present on map',
+                                                              'No unreferenced MapUnits in StandardLithology')
+        self.equivalenceErrors = ReportSection('  Units present in map, DMU, CMU, and cross sections',
+                                               'CMU matches DMU matches units on map')
+        self.nEquivalenceErrors = 0     # units missing from map, DMU, CMU or cross sections
+        self.dmuMapUnits = []
+        self.mapUnitIndex = None        # ReferenceIndex of allMapUnitRefs
+        self.suggestionIndexes = {}     # name -> SuggestionIndex, built when first needed
+        self.cmuMapUnits = set()
+        self.gmapMapUnits = set()
+        self.csMapUnits = set()
+        self.standardLithMapUnits = []
+        self.missingGlossaryTerms = ReportSection('  Missing terms in Glossary. Only one reference to each missing term is cited',
+                                                  'No missing terms in Glossary')
+        self.unusedGlossaryTerms = ReportSection('  Terms in Glossary that are not otherwise used in geodatabase',
+                                                 'No unreferenced terms in Glossary')
+        self.glossaryTerms = []
+        self.unusedGeologicEvents = ReportSection('  Events in GeologicEvents that are not cited in ExtendedAttributes',
+                                                  'No rows in GeologicEvents not referenced in ExtendedAttributes')
+        self.hKeyErrors = ReportSection('  HierarchyKey errors, DescriptionOfMapUnits','No format or structure errors in HierarchyKeys')
+        self.domainErrors = ReportSection('  Values outside their domains','No values outside their domains',key=oidOrder)
+        self.reportSections = [self.duplicateIDs,self.unreferencedIds,self.missingSourceIDs,self.unusedDataSources,
+                               self.missingDmuMapUnits,self.missingStandardLithMapUnits,self.unreferencedDmuMapUnits,
+                               self.unreferencedStandardLithMapUnits,self.equivalenceErrors,self.missingGlossaryTerms,
+                               self.unusedGlossaryTerms,self.unusedGeologicEvents,self.hKeyErrors,self.domainErrors,
+                               self.allBadNulls]
+
+    def validate(self, database, outputWorkspace=None):
+        # check database and write <outputWorkspace>/<database>-conformance.txt;
+        #   outputWorkspace defaults to the directory that holds database
+        startTime = time.time()
+        database = os.path.abspath(database)
+        if outputWorkspace is None:
+            outputWorkspace = os.path.dirname(database)
+        if not outputWorkspace[-1:] in ('/','\\'):
+            outputWorkspace = outputWorkspace+'/'
+        if self.sampleRows:
+            return self.validateSample(database,outputWorkspace,startTime)
+        outFile = outputWorkspace + os.path.basename(database)+'-conformance.txt'
+        result = ValidationResult(database, outFile)
+        self.resetState(database)
+        prefix = outputWorkspace + os.path.basename(database)
+        self.profiler = Profiler(database,self.cProfilePhases,prefix+'-profile-')
+        if self.incremental:
+            self.cacheFile = outputWorkspace + os.path.basename(database)+'-validation-cache.pickle'
+        self.reader = self.getReader(database)
+        try:
+            if self.validInputs(database,outFile):
+                try:
+                    self.tables = self.reader.listTables(database)
+                except:
+                    self.addMsgAndPrint('  Unable to load workspace '+database+'. Not an ESRI geodatabase?')
+                else:
+                    if self.findingsFormat:
+                        self.findings = openFindings(self.findingsFormat,outputWorkspace,database)
+                        result.findingsFile = self.findings.path
+                    self.addMsgAndPrint('  '+versionString)
+                    self.addMsgAndPrint('  geodatabase '+database+' loaded')
+                    self.addMsgAndPrint('  output will be written to file '+outFile)
+                    profiler = self.profiler
+                    progress = self.progress
+                    progress.phase('inventory')
+                    with profiler.phase('inventory'):
+                        self.inventoryWorkspace()
+                    if self.rulePlan.schema:
+                        progress.phase('requiredElements')
+                        with profiler.phase('requiredElements'):
+                            self.checkRequiredElements()
+                    progress.phase('fieldChecks')
+                    with profiler.phase('fieldChecks'):
+                        self.checkFieldsAndFieldDefinitions()
+                    progress.phase('content')
+                    with profiler.phase('content'):
+                        self.checkContent()
+                    progress.phase('report')
+                    with profiler.phase('report'):
+                        self.writeOutput(outFile)
+                    progress.done()
+                    result.completed = True
+                    result.rules = list(self.rulePlan.names)
+                    result.timings = profiler.timings()
+                    if self.timing:
+                        result.timingFile = prefix+'-timing.json'
+                        profiler.write(result.timingFile)
+                        self.addMsgAndPrint('  timings written to file '+result.timingFile)
+                        for seconds, table in profiler.slowest():
+                            self.addMsgAndPrint('    '+table+' '+"%.1f" % seconds+' sec')
+                    result.nTables = len(self.inventories)
+                    result.schemaErrors = list(self.schemaErrors)
+                    result.readErrors = list(self.readErrors)
+                    result.schemaExtensions = list(self.schemaExtensions)
+                    for name, section in self.contentSections():
+                        result.contentErrors.append([name, self.countErrors(name, section)])
+                    for inv in self.inventories.values():
+                        result.messages.extend(inv.messages)
+        finally:
+            # let go of the database and the report's temporary files
+            for section in self.reportSections:
+                section.close()
+            for refs in (self.all_IDs,self.allMapUnitRefs,self.allGlossaryRefs,self.allDataSourcesRefs):
+                refs.close()
+            if self.findings is not None:
+                self.findings.close()
+            self.resetState(None)
+        result.seconds = time.time() - startTime
+        return result
+
+    def validateSample(self,database,outputWorkspace,startTime):
+        # approximate check of a sample of rows, written to <database>-sample.txt
+        outFile = outputWorkspace + os.path.basename(database)+'-sample.txt'
+        result = ValidationResult(database, outFile)
+        result.approximate = True
+        self.resetState(database)
+        self.reader = self.getReader(database)
+        try:
+            if self.validInputs(database,outFile):
+                try:
+                    self.tables = self.reader.listTables(database)
+                except:
+                    self.addMsgAndPrint('  Unable to load workspace '+database+'. Not an ESRI geodatabase?')
+                else:
+                    self.addMsgAndPrint('  '+versionString)
+                    self.addMsgAndPrint('  APPROXIMATE check of a sample of rows of '+database)
+                    self.addMsgAndPrint('  output will be written to file '+outFile)
+                    sample = SampleValidation(self.reader,database,self.sampleRows,self.sampleBlockRows,
+                                              self.sampleSeed,self.addMsgAndPrint)
+                    self.progress.phase('sample')
+                    sample.run()
+                    sample.writeReport(outFile,versionString)
+                    self.progress.done()
+                    result.completed = True
+                    result.nTables = len(sample.estimates['allBadNulls'])
+                    result.estimates = sample.results()
+        finally:
+            self.resetState(None)
+        result.seconds = time.time() - startTime
+        return result
+
+    def validInputs(self,thisDatabase,outFile):
+        # does input database exist? Is it plausibly a geodatabase?
+        if self.reader.isWorkspace(thisDatabase):
+            # is output workspace writable?
+            try:
+                outfl = open(outFile,'w')
+                outfl.write('A test')
+                outfl.close()
+                return True
+            except:
+                self.addMsgAndPrint('  Cannot open and write file '+outFile)
+                return False
+        else:
+            self.addMsgAndPrint('  Object '+thisDatabase+' does not exist or is not a geodatabase')
+            return False
+
+    def listDataSet(self,dataSet,featureDataSet=None):
+        self.addMsgAndPrint('    '+dataSet)
+        inv = self.inventories[dataSet]
+        if self.findings is not None:
+            self.findings.addTable(dataSet,featureDataSet,inv.nrows,inv.seconds,inv.fields)
+        self.profiler.addTable(dataSet,featureDataSet,inv.nrows,inv.seconds,dataSet in self.scannedTables)
+        if self.debug: self.addMsgAndPrint('      '+str(inv.nrows)+' rows, '+str(len(inv.fields))+' fields '+ "%.1f" % inv.seconds +' sec')
+        self.gdbDescription.append('    '+dataSet+', '+str(inv.nrows)+' records')
+        for field in inv.fields:
+            if not (field.name in standardFields):
+                self.gdbDescription.append('      '+field.name+' '+field.type+':'+str(field.length)+'  '+str(field.required))
+
+    def checkMapFeatureClasses(self,fds,prefix,fcs):
+        self.addMsgAndPrint('  Checking for required feature classes...')
+        requiredFeatureClasses = []
+        for fc in ['ContactsAndFaults','MapUnitPolys','DataSourcePolys']:
+            requiredFeatureClasses.append(prefix+fc)
+        for fc in requiredFeatureClasses:
+            if not (fc in fcs):
+                self.schemaError('Feature data set '+fds+', feature class '+fc+' is missing',fc)
+
+    def checkTableFields(self,dBTable,defTable):
+        # build dictionary of required fields
+        requiredFields = {}
+        requiredFieldDefs = tableDict[defTable]
+        for fieldDef in requiredFieldDefs:
+            requiredFields[fieldDef[0]] = fieldDef
+        # build dictionary of existing fields
+        existingFields = {}
+        for field in self.inventories[dBTable].fields:
+            existingFields[field.name] = field
+        # now check to see what is excess / missing
+        for field in requiredFields.keys():
+            if field not in existingFields:
+                self.schemaError(dBTable+', field '+field+' is missing',dBTable,field)
+        for field in existingFields.keys():
+            if not (field in standardFields) and not (field in requiredFields):
+                self.schemaExtension(dBTable+', field '+field+' is not required',dBTable,field)
+            # check field definition
+            if field in requiredFields.keys():
+                # field type
+                if existingFields[field].type != requiredFields[field][1]:
+                    self.schemaError(dBTable+', field '+field+', type should be '+requiredFields[field][1],dBTable,field)
+                # field nullable?
+                if existingFields[field].isNullable:
+                    nullStatus = 'NullsOK'
+                else:
+                    nullStatus = 'NoNulls'
+                if nullStatus != requiredFields[field][2]:
+                    self.schemaError(dBTable+', field '+field+' should be '+requiredFields[field][2],dBTable,field)
+
+    def step(self,name):
+        # start check name of checkContent
+        self.profiler.step(name)
+        self.progress.step(name)
+
+    def readError(self,line,table=None):
+        self.readErrors.append(line)
+        self.recordFinding('readErrors',line,table)
+
+    def schemaError(self,line,table=None,field=None):
+        self.schemaErrors.append(line)
+        self.recordFinding('schemaErrors',line,table,field)
+
+    def schemaExtension(self,line,table=None,field=None):
+        self.schemaExtensions.append(line)
+        self.recordFinding('schemaExtensions',line,table,field)
+
+    def contentError(self,category,line,table=None,field=None,objectid=None,value=None,severity=None,suggestions=None):
+        # add line to the CONTENT ERRORS section named category, and record it
+        getattr(self,category).add(line)
+        self.recordFinding(category,line.strip(),table,field,objectid,value,severity,suggestions)
+
+    def recordFinding(self,category,message,table=None,field=None,objectid=None,value=None,severity=None,suggestions=None):
+        # findings of sections that won't be in the report are not recorded
+        if self.findings is not None:
+            if self.reportedCategories is None or category in self.reportedCategories:
+                self.findings.addFinding(category,message,table,field,objectid,value,severity,suggestions)
+
+    def suggest(self,name,values,value):
+        # values closest to value, a missing term or unit (see NCGMP09v1_1_Suggest.py);
+        #   values are indexed, under name, the first time
+        if not name in self.suggestionIndexes:
+            self.suggestionIndexes[name] = SuggestionIndex(values)
+        return self.suggestionIndexes[name].suggest(value)
+
+    def loadTableValues(self,tableName,fieldName,valueList):
+        # values were collected when the table was inventoried; nothing is read here
+        if not tableName in self.inventories or not fieldName in self.inventories[tableName].values:
+            return False
+        valueList.extend(self.inventories[tableName].values[fieldName])
+        return True
+
+    def mergeInventory(self,inv):
+        # add the references found in one table to the database-wide lists
+        table = inv.table
+        for msg in inv.messages:
+            self.addMsgAndPrint(msg)
+        self.all_IDs.extend(inv.ids,table)
+        for field in inv.glossaryRefs:
+            self.allGlossaryRefs.extend(inv.glossaryRefs[field],field,table)
+        if table != 'DescriptionOfMapUnits' and table != 'StandardLithology':
+            self.allMapUnitRefs.extend(inv.mapUnits,table)
+        if table == 'MapUnitPolys':
+            self.gmapMapUnits.update(inv.mapUnits)
+        if table[0:2] == 'CS' and table[3:] == 'MapUnitPolys':
+            self.csMapUnits.update(inv.mapUnits)
+        if table == 'CMUMapUnitPolys' or table == 'CMUMapUnitPoints':
+            self.cmuMapUnits.update(inv.mapUnits)
+        if table == 'DescriptionOfMapUnits':
+            for mu in inv.mapUnits:
+                if mu != 'None':
+                    self.dmuMapUnits.append(mu)
+        for field in inv.sourceRefs:
+            self.allDataSourcesRefs.extend(inv.sourceRefs[field],field,table)
+        if not self.rulePlan.reports('allBadNulls'):
+            # an inventory from the incremental cache has every column
+            inv.badNulls = []
+        if not self.rulePlan.reports('domainErrors'):
+            inv.domainErrors = []
+        for oid,field,value,domain in inv.domainErrors:
+            self.domainErrors.add('    Table '+table+', OBJECTID='+str(oid)+', '+field+' = '+str(value)+', should be '+domain)
+            self.recordFinding('domainErrors',field+' = '+str(value)+', should be '+domain,table,field,oid,value)
+        for oid,problems in inv.badNulls:
+            self.allBadNulls.add('    Table '+table+',row OBJECTID='+str(oid)+', field '+' '.join([problem[0] for problem in problems]))
+            for field,problem in problems:
+                self.recordFinding('allBadNulls',problem,table,field,oid)
+        # the references are in the database-wide columns now
+        inv.ids = []
+        inv.glossaryRefs = {}
+        inv.mapUnits = []
+        inv.sourceRefs = {}
+        inv.badNulls = []
+        inv.domainErrors = []
+        self.addMsgAndPrint('      Finished '+table)
+
+    def inventoryWorkspace(self):
+        self.addMsgAndPrint('  Inventorying geodatabase...')
+        thisDatabase = self.thisDatabase
+        featureDataSets = self.reader.listDatasets(thisDatabase)
+        # list everything, then read each table and feature class once,
+        # in nJobs worker processes if nJobs > 1
+        jobs = []
+        for table in self.tables:
+            jobs.append([thisDatabase+'/'+table,table])
+        for featureDataSet in featureDataSets:
+            featureClassList = self.reader.listFeatureClasses(thisDatabase,featureDataSet)
+            for featureClass in featureClassList:
+                jobs.append([thisDatabase+'/'+featureDataSet+'/'+featureClass,featureClass])
+            self.fdsfc.append([featureDataSet,featureClassList])
+        # tables that no selected rule reads rows of are only counted
+        needs = self.rulePlan.needs
+        for job in jobs:
+            if not needs.readsTable(job[1]):
+                inv = TableInventory(job[1])
+                inv.fields = self.reader.listFields(job[0])
+                inv.nrows = self.reader.getCount(job[0])
+                self.inventories[inv.table] = inv
+        jobs = [job for job in jobs if needs.readsTable(job[1])]
+        startTime = time.time()
+        if self.cacheFile:
+            invs,scanned = incrementalInventory(self.reader,thisDatabase,jobs,self.cacheFile,self.nJobs,self.chunkRows,self.progress,needs)
+            self.addMsgAndPrint('    '+str(len(jobs)-len(scanned))+' unchanged tables and feature classes taken from '+self.cacheFile)
+        else:
+            invs = inventoryTables(self.reader,jobs,self.nJobs,self.chunkRows,progress=self.progress,needs=needs)
+            scanned = [job[1] for job in jobs]
+        self.scannedTables = set(scanned)
+        for inv in invs:
+            self.inventories[inv.table] = inv
+            if inv.readError is not None:
+                self.readError('Table '+inv.table+': reading its rows failed ('+inv.readError+'), '+str(inv.nrows)+
+                               ' rows were read; checks of this table are incomplete',inv.table)
+        if self.debug: self.addMsgAndPrint('    read '+str(len(scanned))+' tables and feature classes in '+"%.1f" % (time.time()-startTime)+' sec')
+        self.gdbDescription.append('Tables: ')
+        for table in self.tables:
+            self.listDataSet(table)
+        for fds in self.fdsfc:
+            self.gdbDescription.append('Feature data set: '+fds[0])
+            for featureClass in fds[1]:
+                self.listDataSet(featureClass,fds[0])
+
+    def checkFieldsAndFieldDefinitions(self):
+        self.addMsgAndPrint( '  Checking fields and field definitions, inventorying special fields...')
+        for table in self.tables:
+            if self.debug: self.addMsgAndPrint('    Table = '+table)
+            if not self.rulePlan.schema:
+                pass
+            elif not table in tableDict:
+                self.schemaExtension('Table '+table+' is not required',table)
+            else:
+                self.checkTableFields(table,table)
+            self.mergeInventory(self.inventories[table])
+        for fds in self.fdsfc:
+            if self.rulePlan.schema and not fds[0] in ('GeologicMap','CorrelationOfMapUnits') and fds[0:12] != 'CrossSection':
+                self.schemaExtension('Feature dataset '+fds[0]+' is not required')
+            for featureClass in fds[1]:
+                if self.debug: self.addMsgAndPrint('    Feature class = '+featureClass)
+                if not self.rulePlan.schema:
+                    pass
+                elif not featureClass in tableDict:
+                    self.schemaExtension('Feature class '+featureClass+' is not required',featureClass)
+                else:
+                    self.checkTableFields(featureClass,featureClass)
+                self.mergeInventory(self.inventories[featureClass])
+        self.allBadNulls.finish()
+
+    def checkRequiredElements(self):
+        self.addMsgAndPrint( '  Checking for required elements...')
+        requiredFeatureDataSets = ['GeologicMap']
+        requiredTables = ['DescriptionOfMapUnits','Glossary','DataSources']
+        for tb1 in requiredTables:
+            isPresent = False
+            for tb2 in self.tables:
+                if tb1 == tb2:
+                    isPresent = True
+            if not isPresent:
+                self.schemaError('Table '+tb1+' is missing',tb1)
+        for fds1 in requiredFeatureDataSets:
+            isPresent = False
+            for fds2 in self.fdsfc:
+                if fds2[0] == fds1:
+                    isPresent = True
+            if not isPresent:
+                self.schemaError('Feature data set '+fds1+' is missing')
+        for xx in self.fdsfc:
+            fds = xx[0]
+            fcs = xx[1]
+            if fds[0:12] == 'CrossSection':
+                self.checkMapFeatureClasses(fds,'CS'+fds[12:],fcs)
+            if fds == 'GeologicMap':
+                self.checkMapFeatureClasses(fds,'',fcs)
+            if fds == 'CorrelationOfMapUnits':
+                if not ('CMULines' in fcs):
+                    self.schemaError('Feature data set '+fds+', feature class CMULines is missing','CMULines')
+                if not ('CMUMapUnitPolys' in fcs):
+                    self.schemaError('Feature data set '+fds+', feature class CMUMapUnitPolys is missing','CMUMapUnitPolys')
+                if not ('CMUText' in fcs):
+                    self.schemaError('Feature data set '+fds+', feature class CMUText is missing','CMUText')
+
+    def checkContent(self):
+        self.addMsgAndPrint( '  Checking content...')
+        self.reportedCategories = set([name for name, section in self.contentSections()])
+        for step, check in contentChecks:
+            if self.rulePlan.runs(step):
+                self.step(step)
+                getattr(self,check)()
+
+    def checkUniqueIDs(self):
+        # Check for uniqueness of _ID values
+        self.addMsgAndPrint('    Checking uniqueness of ID values')
+        for dup in findDuplicateIDs(self.all_IDs):
+            self.contentError('duplicateIDs','    '+asText(dup[0])+', tables '+dup[1]+' '+dup[2],dup[1],dup[1]+'_ID',None,dup[0])
+        self.duplicateIDs.finish()
+
+    def checkExtendedAttributes(self):
+        # Check for OwnerIDs and ValueLinkIDs in ExtendedAttributes that don't match an existing _ID
+        if not self.loadTableValues('ExtendedAttributes','OwnerID',self.extendedAttribIDs):
+            self.contentError('unreferencedIds','    Error: did not find field OwnerID in table ExtendedAttributes','ExtendedAttributes','OwnerID',severity='error')
+        if not self.loadTableValues('ExtendedAttributes','ValueLinkID',self.extendedAttribIDs):
+            self.contentError('unreferencedIds','    Error: did not find field ValueLinkID in table ExtendedAttributes','ExtendedAttributes','ValueLinkID',severity='error')
+        #compare
+        self.extendedAttribIDs.sort()
+        # which of them are _IDs, reading the _IDs once
+        linkedIDs = set(self.extendedAttribIDs)
+        all_IDs0 = set()
+        for id in self.all_IDs.distinctValues():
+            if str(id) in linkedIDs:
+                all_IDs0.add(str(id))
+        for id in self.extendedAttribIDs:
+            if id != None and not id in all_IDs0:
+                self.contentError('unreferencedIds','    '+id,'ExtendedAttributes',None,None,id)
+        self.unreferencedIds.finish()
+
+    def checkDataSources(self):
+        # Check allDataSourcesRefs against DataSources
+        self.addMsgAndPrint('    Comparing DataSources_IDs with DataSources')
+        if self.loadTableValues('DataSources','DataSources_ID',self.dataSourcesIDs):
+            # compare
+            dataSourcesIndex = ReferenceIndex(self.allDataSourcesRefs)
+            for id in dataSourcesIndex.missingFrom(set(self.dataSourcesIDs)):
+                self.contentError('missingSourceIDs','    '+id[0]+', cited in field '+id[1]+' table '+id[2],id[2],id[1],None,id[0])
+            # compare other way
+            for id in dataSourcesIndex.unreferenced(self.dataSourcesIDs):
+                self.contentError('unusedDataSources','    '+id,'DataSources','DataSources_ID',None,id)
+        else:
+            self.contentError('missingSourceIDs','    Error: did not find field DataSources_ID in table DataSources','DataSources','DataSources_ID',severity='error')
+            self.contentError('unusedDataSources','    Error: did not find field DataSources_ID in table DataSources','DataSources','DataSources_ID',severity='error')
+        self.missingSourceIDs.finish()
+        self.unusedDataSources.finish()
+
+    def checkMapUnits(self):
+        # Check MapUnits against DescriptionOfMapUnits and StandardLithology
+        self.addMsgAndPrint('    checking MapUnits against DMU and StandardLithology')
+        if not self.loadTableValues('DescriptionOfMapUnits','MapUnit',self.dmuMapUnits):
+            self.contentError('missingDmuMapUnits','    Error: did not find field MapUnit in table DescriptionOfMapUnits','DescriptionOfMapUnits','MapUnit',severity='error')
+            self.contentError('unreferencedDmuMapUnits','    Error: did not find field MapUnit in table DescriptionOfMapUnits','DescriptionOfMapUnits','MapUnit',severity='error')
+        if not self.loadTableValues('StandardLithology','MapUnit',self.standardLithMapUnits):
+            self.contentError('missingStandardLithMapUnits','    Error: did not find field MapUnit in table StandardLithology','StandardLithology','MapUnit',severity='error')
+            self.contentError('unreferencedStandardLithMapUnits','    Error: did not find field MapUnit in table StandardLithology','StandardLithology','MapUnit',severity='error')
+        # compare
+        self.mapUnitIndex = ReferenceIndex(self.allMapUnitRefs)
+        self.addMsgAndPrint('    Checking for missing map units in DMU and StandardLithology')
+        for mu in self.mapUnitIndex.missingFrom(set(self.dmuMapUnits)):
+            suggestions = self.suggest('DescriptionOfMapUnits',self.dmuMapUnits,mu[0])
+            self.contentError('missingDmuMapUnits','    '+str(mu[0])+', cited in '+str(mu[1])+didYouMean(suggestions),
+                              mu[1],'MapUnit',None,mu[0],suggestions=suggestions)
+        for mu in self.mapUnitIndex.missingFrom(set(self.standardLithMapUnits)):
+            self.contentError('missingStandardLithMapUnits','    '+str(mu[0])+', cited in '+str(mu[1]),mu[1],'MapUnit',None,mu[0])
+        self.missingDmuMapUnits.finish()
+        self.missingStandardLithMapUnits.finish()
+
+    def checkUnitEquivalence(self):
+        # compare map, DMU, CMU, and cross-sections
+        self.addMsgAndPrint('    Comparing units present in map, DMU, CMU, and cross sections')
+        muSets = [set(self.gmapMapUnits),set(self.dmuMapUnits),set(self.cmuMapUnits),set(self.csMapUnits)]
+        muSetNames = ['map','DMU','CMU','cross sections']
+        allMapUnits = list(set().union(*muSets))
+        allMapUnits.sort()
+        #                              1234567890123456789012345678901234567890
+        self.equivalenceErrors.add('    Unit       Map  DMU  CMU  XS')
+        for mu in allMapUnits:
+            line = '    '+mu.ljust(10)
+            for muSet in muSets:
+                if mu in muSet:
+                    line = line+'  X  '
+                else:
+                    line = line+' --- '
+            if line.find(' --- ') >= 0:
+                self.nEquivalenceErrors = self.nEquivalenceErrors+1
+                missingFrom = [muSetNames[i] for i in range(len(muSets)) if not mu in muSets[i]]
+                self.recordFinding('equivalenceErrors',mu+' is missing from '+', '.join(missingFrom),None,'MapUnit',None,mu)
+            self.equivalenceErrors.add(line)
+        self.equivalenceErrors.finish()
+
+    def checkStandardLithology(self):
+        # look for excess map units in StandardLithology
+        self.addMsgAndPrint('    Checking for excess map units in StandardLithology')
+        unreferencedStandardLith = list(set(self.mapUnitIndex.unreferenced(self.standardLithMapUnits)))
+        unreferencedStandardLith.sort()
+        for mu in unreferencedStandardLith:
+            if mu != '':
+                self.contentError('unreferencedStandardLithMapUnits','    '+mu,'StandardLithology','MapUnit',None,mu)
+        self.unreferencedStandardLithMapUnits.finish()
+
+    def checkDmuMapUnits(self):
+        # look for unreferenced map units in DMU
+        self.addMsgAndPrint('    Checking for excess map units in DMU')
+        for mu in self.mapUnitIndex.unreferenced(self.dmuMapUnits):
+            if mu != '':
+                self.contentError('unreferencedDmuMapUnits','    '+mu,'DescriptionOfMapUnits','MapUnit',None,mu)
+        self.unreferencedDmuMapUnits.finish()
+
+    def checkGlossary(self):
+        # Check allGlossaryRefs against Glossary
+        self.addMsgAndPrint('    Checking glossary references')
+        if self.loadTableValues('Glossary','Term',self.glossaryTerms):
+            # compare
+            glossaryIndex = ReferenceIndex(self.allGlossaryRefs,(None,'','None'))
+            for term in glossaryIndex.missingFrom(set(self.glossaryTerms)):
+                if len(term[0]) < 40:
+                    thisTerm = term[0]
+                else:
+                    thisTerm = term[0][0:37]+'...'
+                suggestions = self.suggest('Glossary',self.glossaryTerms,term[0])
+                self.contentError('missingGlossaryTerms','    '+thisTerm+', cited in field '+term[1]+', table '+term[2]+didYouMean(suggestions),
+                                  term[2],term[1],None,term[0],suggestions=suggestions)
+            # compare other direction
+            for term in glossaryIndex.unreferenced(self.glossaryTerms,str):
+                self.contentError('unusedGlossaryTerms','    '+term,'Glossary','Term',None,term)
+        else:
+            self.contentError('missingGlossaryTerms','    Error: did not find field Term in table Glossary','Glossary','Term',severity='error')
+            self.contentError('unusedGlossaryTerms','    Error: did not find field Term in table Glossary','Glossary','Term',severity='error')
+        self.missingGlossaryTerms.finish()
+        self.unusedGlossaryTerms.finish()
+
+    def checkGeologicEvents(self):
+        # Check GeologicEvents against ValueLinkID in ExtendedAttributes
+        geologicEvents = []
+        if not self.loadTableValues('GeologicEvents','GeologicEvents_ID',geologicEvents):
+            self.contentError('unusedGeologicEvents','    Error: did not find field GeologicEvents_ID in table GeologicEvents','GeologicEvents','GeologicEvents_ID',severity='error')
+        valueLinks = []
+        if not self.loadTableValues('ExtendedAttributes','ValueLinkID',valueLinks):
+            self.contentError('unusedGeologicEvents','    Error: did not find field ValueLink in table ExtendedAttributes','ExtendedAttributes','ValueLinkID',severity='error')
+        #compare
+        valueLinks = set(valueLinks)
+        for ge in geologicEvents:
+            if ge not in valueLinks:
+                self.contentError('unusedGeologicEvents','    '+ge,'GeologicEvents','GeologicEvents_ID',None,ge)
+        self.unusedGeologicEvents.finish()
+
+    def checkHierarchyKey(self):
+        # Check formatting and structure of HierarchyKey in DescriptionOfMapUnits
+        #   (see NCGMP09v1_1_HierarchyKey.py)
+        self.addMsgAndPrint('    Checking HierarchyKey (DMU) formatting and structure')
+        hKeys = []
+        if self.loadTableValues('DescriptionOfMapUnits','HierarchyKey',hKeys):
+            for oid,hKey,problem in HierarchyIndex(self.inventories['DescriptionOfMapUnits'].rows).check():
+                if problem is None:
+                    line = '    '+hKey
+                elif hKey == '':
+                    line = '    OBJECTID='+str(oid)+', '+problem
+                else:
+                    line = '    '+hKey+', '+problem
+                self.contentError('hKeyErrors',line,'DescriptionOfMapUnits','HierarchyKey',oid,hKey)
+        else:
+            self.contentError('hKeyErrors','    Error: did not find field HierarchyKey in table DescriptionOfMapUnits','DescriptionOfMapUnits','HierarchyKey',severity='error')
+        self.hKeyErrors.finish()
+
+    def checkDomains(self):
+        # numeric domains were checked as tables were inventoried; here the
+        #   text values of termDomainFields are compared with Glossary
+        self.addMsgAndPrint('    Checking values against their domains')
+        glossaryTerms = []
+        if self.loadTableValues('Glossary','Term',glossaryTerms):
+            glossaryTerms = set(glossaryTerms)
+            tables = list(self.inventories.keys())
+            tables.sort()
+            for table in tables:
+                for field in termDomainFields:
+                    values = []
+                    if not self.loadTableValues(table,field,values):
+                        continue
+                    # empty values and pseudonulls are left to the other checks
+                    missing = list(set([value for value in values if value not in (None,'None') and str(value).strip() != ''
+                                        and not isNumber(value) and value not in glossaryTerms]))
+                    missing.sort()
+                    for value in missing:
+                        suggestions = self.suggest('Glossary',glossaryTerms,value)
+                        self.contentError('domainErrors','    Table '+table+', '+field+' = '+str(value)+', not a number or a term in Glossary'+
+                                          didYouMean(suggestions),table,field,None,value,suggestions=suggestions)
+        else:
+            self.contentError('domainErrors','    Error: did not find field Term in table Glossary','Glossary','Term',severity='error')
+        self.domainErrors.finish()
+
+    def contentSections(self):
+        # [name, ReportSection] for each section of CONTENT ERRORS, in report order
+        tables = self.tables
+        sections = [['duplicateIDs',self.duplicateIDs],
+                    ['missingSourceIDs',self.missingSourceIDs],
+                    ['unusedDataSources',self.unusedDataSources],
+                    ['missingDmuMapUnits',self.missingDmuMapUnits],
+                    ['equivalenceErrors',self.equivalenceErrors]]
+        if 'StandardLithology' in tables:
+            sections.append(['missingStandardLithMapUnits',self.missingStandardLithMapUnits])
+            sections.append(['unreferencedStandardLithMapUnits',self.unreferencedStandardLithMapUnits])
+        sections.append(['unreferencedDmuMapUnits',self.unreferencedDmuMapUnits])
+        sections.append(['missingGlossaryTerms',self.missingGlossaryTerms])
+        sections.append(['unusedGlossaryTerms',self.unusedGlossaryTerms])
+        if 'ExtendedAttributes' in tables:
+            sections.append(['unreferencedIds',self.unreferencedIds])
+            if 'GeologicEvents' in tables:
+                sections.append(['unusedGeologicEvents',self.unusedGeologicEvents])
+        sections.append(['hKeyErrors',self.hKeyErrors])
+        sections.append(['domainErrors',self.domainErrors])
+        sections.append(['allBadNulls',self.allBadNulls])
+        return [section for section in sections if self.rulePlan.reports(section[0])]
+
+    def countErrors(self,name,section):
+        # lines of a section that report a problem
+        if name == 'equivalenceErrors':
+            # a table of all units; only those missing somewhere are errors
+            return self.nEquivalenceErrors
+        return section.nLines
+
+    def writeOutput(self,outFile):
+        self.addMsgAndPrint( '  Writing output...')
+        outfl = open(outFile,'w')
+        outfl.write('Geodatabase '+self.thisDatabase+'\n')
+        outfl.write('  Testing for compliance with NCGMP09v1.1 database schema\n')
+        outfl.write('  This file written by '+versionString+'\n')
+        outfl.write('  '+time.asctime(time.localtime(time.time()))+'\n')
+        if not self.rulePlan.isFull():
+            outfl.write('  Rules checked: '+', '.join(self.rulePlan.names)+'. Other checks were not made\n')
+        # tables that could not be read, only if there are any
+        if self.readErrors:
+            outfl.write('\n\nTABLES THAT COULD NOT BE READ, the checks below are incomplete\n\n')
+            for aline in self.readErrors:
+                outfl.write('  '+aline+'\n')
+        #  Schema errors
+        outfl.write('\n\nSCHEMA ERRORS\n\n')
+        if not self.rulePlan.schema:
+            outfl.write('  Not checked\n')
+        elif len(self.schemaErrors) == 0:
+            outfl.write('  None\n')
+        else:
+            for aline in self.schemaErrors:
+                outfl.write('  '+aline+'\n')
+        # Extensions to schema
+        outfl.write('\n\nEXTENSIONS TO SCHEMA, may indicate errors\n\n')
+        if not self.rulePlan.schema:
+            outfl.write('  Not checked\n')
+        elif len(self.schemaExtensions) == 0:
+            outfl.write('  None\n')
+        else:
+            for aline in self.schemaExtensions:
+                outfl.write('  '+aline+'\n')
+        # Content errors
+        outfl.write('\n\nCONTENT ERRORS\n\n')
+        for name, section in self.contentSections():
+            section.write(outfl)
+        # Database description
+        outfl.write('\nGEODATABASE DESCRIPTION\n\n')
+        for aline in self.gdbDescription:
+            outfl.write(aline+'\n')
+        outfl.close()